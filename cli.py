@@ -0,0 +1,357 @@
+"""Headless entry point (no Tk). One job per process, JSON lines on stdout.
+
+    SPOD_TENANT=... SPOD_CLIENT=... SPOD_SECRET=... \\
+        python cli.py --spec job.json
+    python cli.py --src-drive b!.. --dest-drive b!.. --dest-parent 01AB.. --root-name Finance
+    python cli.py --wave wave.json --max-jobs 6 --workers 24
+    python cli.py --spec job.json --shard-queue /mnt/shared/job.sqlite --shard-procs 4
+    python cli.py --src-drive local:/mnt/share/Finance --dest-drive b!.. --dest-parent 01AB..
+
+A wave file is {"name": "...", "jobs": [spec, ...]} (or a bare list); each
+spec may carry NAME and PRIORITY (lower runs first). A job without NAME is
+known by its source and destination, so a rerun skips it once it finished.
+
+Profiling (single job / shard worker): `kill -USR1 <pid>` starts a cProfile
+capture and a second USR1 writes it; USR2 does the same for tracemalloc.
+--profile / --profile-mem capture the whole job. Output goes to
+<state dir>/profiles; a per-span timing table is logged at job end.
+
+Exit codes: 0 audit clean, 1 audit found mismatched/missing files,
+2 job failed, 3 cancelled, 64 bad usage.
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+from threading import Event, Lock, Thread
+
+EXIT_OK        = 0
+EXIT_AUDIT     = 1
+EXIT_FAILED    = 2
+EXIT_CANCELLED = 3
+EXIT_USAGE     = 64
+
+_out_lk = Lock()
+
+
+def emit(event: str, **fields):
+    rec = {"ts": round(time.time(), 3), "event": event, **fields}
+    line = json.dumps(rec, ensure_ascii=False, separators=(",", ":"))
+    with _out_lk:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+
+def load_spec(args) -> dict:
+    spec = {}
+    if args.spec:
+        with open(args.spec, "r", encoding="utf-8") as f:
+            spec = json.load(f)
+    # flags override the spec file
+    for key, val in (
+        ("SRC_DRIVE",   args.src_drive),
+        ("SRC_PARENT",  args.src_parent),
+        ("DEST_DRIVE",  args.dest_drive),
+        ("DEST_PARENT", args.dest_parent),
+        ("ROOT_NAME",   args.root_name),
+    ):
+        if val is not None:
+            spec[key] = val
+    if args.execute_plan:
+        # the plan pins source/destination
+        from ui.planner import load_plan
+        plan = load_plan(args.execute_plan)
+        spec.update({"SRC_DRIVE": plan["src_drive"], "SRC_PARENT": plan["src_parent"],
+                     "DEST_DRIVE": plan["dest_drive"], "DEST_PARENT": plan["dest_parent"],
+                     "ROOT_NAME": plan["root_name"], "PLAN_FILE": args.execute_plan})
+    # filter flags add to / override the spec's FILTERS
+    flt = dict(spec.get("FILTERS") or {})
+    for key, val in (
+        ("include",            args.include),
+        ("exclude",            args.exclude),
+        ("extensions",         args.ext),
+        ("exclude_extensions", args.exclude_ext),
+        ("min_size",           args.min_size),
+        ("max_size",           args.max_size),
+        ("modified_since",     args.modified_since),
+    ):
+        if val and isinstance(val, list):
+            cur = flt.get(key) or []
+            flt[key] = (cur.split(",") if isinstance(cur, str) else list(cur)) + val
+        elif val:
+            flt[key] = val
+    if flt:
+        spec["FILTERS"] = flt
+    if args.skip_mode:
+        spec["SKIP_MODE"] = args.skip_mode
+    if args.hedge is not None:
+        spec["HEDGE"] = args.hedge
+    for key, val in (("AUDIT", args.audit), ("AUDIT_SAMPLE", args.audit_sample),
+                     ("AUDIT_MARGIN", args.audit_margin), ("AUDIT_CONFIDENCE", args.audit_confidence)):
+        if val is not None:
+            spec[key] = val
+    if args.audit_recheck:
+        spec["AUDIT_RECORDS"] = False
+    for key, val in (("SPOOL_MB", args.spool_mb), ("SPOOL_DIR", args.spool_dir)):
+        if val is not None:
+            spec[key] = val
+    if args.dedup:
+        spec["DEDUP"] = True
+    for key, val in (("AUTOTUNE", args.autotune), ("AUTOTUNE_PATH", args.autotune_path),
+                     ("AUTOTUNE_MB", args.autotune_mb)):
+        if val is not None:
+            spec[key] = val
+    for val in args.extra_dest or ():
+        drive, _, rest = val.partition(":")
+        parent, sep, root = rest.partition(":")
+        spec.setdefault("EXTRA_DESTS", []).append(
+            {"DEST_DRIVE": drive, "DEST_PARENT": parent, **({"ROOT_NAME": root} if sep else {})})
+    # credentials only from the environment
+    spec["TENANT"] = os.environ.get("SPOD_TENANT", "")
+    spec["CLIENT"] = os.environ.get("SPOD_CLIENT", "")
+    spec["SECRET"] = os.environ.get("SPOD_SECRET", "")
+    return spec
+
+
+def exit_code_for(result) -> int:
+    if not result:
+        return EXIT_FAILED
+    status = result.get("status")
+    if status == "planned":
+        return EXIT_OK
+    if status == "cancelled":
+        return EXIT_CANCELLED
+    if status != "done":
+        return EXIT_FAILED
+    audit = result.get("audit") or {}
+    if audit.get("mismatched", 0) or audit.get("missing", 0):
+        return EXIT_AUDIT
+    return EXIT_OK
+
+
+def build_parser():
+    ap = argparse.ArgumentParser(prog="spodcopy-cli", description="Headless SharePoint/OneDrive copy job")
+    ap.add_argument("--spec", help="JSON job spec (SRC_DRIVE, SRC_PARENT, DEST_DRIVE, DEST_PARENT, ROOT_NAME)")
+    ap.add_argument("--src-drive")
+    ap.add_argument("--src-parent")
+    ap.add_argument("--dest-drive")
+    ap.add_argument("--dest-parent")
+    ap.add_argument("--root-name")
+    ap.add_argument("--delete-extras", action="store_true")
+    ap.add_argument("--extras-dry-run", action="store_true", help="with --delete-extras: report extras, delete nothing")
+    ap.add_argument("--chunk-mb", type=int, default=8)
+    ap.add_argument("--verbosity", choices=("all", "sample", "quiet"), default="sample")
+    ap.add_argument("--stats-every", type=float, default=10.0, help="seconds between stats lines (0 = off)")
+    ap.add_argument("--wave", help="JSON wave file: run many jobs over one shared HTTP layer")
+    ap.add_argument("--max-jobs", type=int, default=4, help="wave: jobs running at once")
+    ap.add_argument("--workers", type=int, default=16, help="wave: global transfer worker budget")
+    ap.add_argument("--shard-queue", help="sharded mode: SQLite work queue on a path every worker can reach")
+    ap.add_argument("--shard-procs", type=int, default=1, help="sharded mode: worker processes on this machine")
+    ap.add_argument("--plan", action="store_true", help="dry run: write a plan to the state dir, transfer nothing")
+    ap.add_argument("--execute-plan", metavar="FILE", help="run a saved plan instead of walking the source again")
+    ap.add_argument("--shard-gb", type=float, default=50.0, help="sharded mode: max subtree size per shard")
+    ap.add_argument("--skip-mode", choices=("hash", "mtime"),
+                    help="unchanged-file check: size + quickXorHash (default) or size + lastModifiedDateTime")
+    ap.add_argument("--audit", choices=("full", "sample"),
+                    help="post-job audit: every file (default) or a stratified random sample")
+    ap.add_argument("--audit-sample", type=int, metavar="N", help="sample audit: files to check (default: from --audit-margin)")
+    ap.add_argument("--audit-margin", type=float, metavar="PCT", help="sample audit: +/- margin on the rates (default 2)")
+    ap.add_argument("--audit-confidence", type=float, metavar="PCT", help="sample audit: confidence level (default 95)")
+    ap.add_argument("--audit-recheck", action="store_true",
+                    help="audit every file against Graph, not against what the copy recorded")
+    ap.add_argument("--extra-dest", action="append", metavar="DRIVE:PARENT[:ROOT]",
+                    help="also copy to this destination, reading the source once (repeatable)")
+    ap.add_argument("--spool-mb", type=int, metavar="MB",
+                    help="keep downloaded source ranges on disk, up to MB, so retries don't download again")
+    ap.add_argument("--spool-dir", help="where the spool lives (default: <state dir>/spool)")
+    ap.add_argument("--dedup", action="store_true",
+                    help="place files whose content is already at the destination by server-side copy")
+    ap.add_argument("--autotune", choices=("off", "auto", "calibrate"),
+                    help="measure chunk size, small-file threshold and workers at job start "
+                         "(auto: reuse a recent calibration for this tenant + destination)")
+    ap.add_argument("--autotune-path", metavar="ITEM_ID", help="autotune: source folder to sample (default: --src-parent)")
+    ap.add_argument("--autotune-mb", type=int, metavar="MB", help="autotune: data copied per trial (default 64)")
+    ap.add_argument("--hedge", type=float, metavar="PCT",
+                    help="re-send metadata GETs slower than their p95, up to PCT%% extra requests (0 = off)")
+    ap.add_argument("--include", action="append", metavar="RULE",
+                    help="copy only matching files: glob on the name (*.docx), on the path (Finance/**) or re:<regex>")
+    ap.add_argument("--exclude", action="append", metavar="RULE",
+                    help="skip matching files/folders (same rule forms); excluded folders are never listed")
+    ap.add_argument("--ext", action="append", metavar="EXT", help="copy only these extensions")
+    ap.add_argument("--exclude-ext", action="append", metavar="EXT")
+    ap.add_argument("--min-size", help="e.g. 1KB")
+    ap.add_argument("--max-size", help="e.g. 2GB")
+    ap.add_argument("--modified-since", metavar="ISO_DATE", help="only files modified at/after, e.g. 2024-01-01")
+    ap.add_argument("--profile", action="store_true", help="cProfile the whole job into <state>/profiles")
+    ap.add_argument("--profile-mem", action="store_true", help="tracemalloc the whole job into <state>/profiles")
+    return ap
+
+
+def run_shard_procs(args, argv) -> int:
+    import subprocess
+    child_argv = [a for a in (argv if argv is not None else sys.argv[1:])]
+    i = child_argv.index("--shard-procs") if "--shard-procs" in child_argv else -1
+    if i >= 0:
+        del child_argv[i:i + 2]
+    child_argv = [a for a in child_argv if not a.startswith("--shard-procs=")]
+    procs = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), *child_argv, "--shard-procs", "1"])
+        for _ in range(args.shard_procs)
+    ]
+    codes = [p.wait() for p in procs]
+    emit("result", exit_code=max(codes), workers=len(codes))
+    return max(codes)
+
+
+def run_wave(args) -> int:
+    with open(args.wave, "r", encoding="utf-8") as f:
+        wave = json.load(f)
+    jobs = wave.get("jobs", []) if isinstance(wave, dict) else wave
+    name = wave.get("name", "wave") if isinstance(wave, dict) else "wave"
+    creds = {k: os.environ.get(f"SPOD_{k}", "") for k in ("TENANT", "CLIENT", "SECRET")}
+    if not all(creds.values()) or not jobs:
+        emit("error", msg="wave needs SPOD_TENANT/SPOD_CLIENT/SPOD_SECRET and at least one job")
+        return EXIT_USAGE
+
+    from ui.scheduler import JobScheduler
+
+    sched = JobScheduler(
+        tenant=creds["TENANT"], client=creds["CLIENT"], secret=creds["SECRET"],
+        chunk=args.chunk_mb * 1024 * 1024, delete_extras=args.delete_extras,
+        max_jobs=args.max_jobs, workers=args.workers, wave_name=name, hedge=args.hedge or 0.0,
+        log=lambda msg: emit("log", msg=msg.rstrip("\n")),
+    )
+    try:
+        for spec in jobs:
+            sched.submit(spec, priority=spec.get("PRIORITY", 0))
+    except ValueError as e:
+        emit("error", msg=str(e))
+        return EXIT_USAGE
+
+    def _on_signal(signum, _frame):
+        emit("signal", signum=signum)
+        Thread(target=sched.cancel, daemon=True).start()
+    signal.signal(signal.SIGINT, _on_signal)
+
+    stop = Event()
+    def _ticker():
+        while args.stats_every > 0 and not stop.wait(args.stats_every):
+            emit("stats", **sched.get_stats())
+    Thread(target=_ticker, daemon=True).start()
+
+    results = sched.run()
+    stop.set()
+    codes = {job_id: exit_code_for(res) for job_id, res in results.items()}
+    for job_id, res in results.items():
+        emit("job_result", job=job_id, exit_code=codes[job_id], **res)
+    code = max(codes.values(), default=EXIT_FAILED)
+    emit("result", exit_code=code, jobs=len(results))
+    return code
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.wave:
+        return run_wave(args)
+    if args.shard_queue and args.shard_procs > 1:
+        return run_shard_procs(args, argv)
+    spec = load_spec(args)
+
+    # local:/path on both sides never talks to Graph
+    from graph_client.local_drive import is_local
+    offline = all(is_local(spec.get(k)) for k in ("SRC_DRIVE", "DEST_DRIVE")) and \
+        all(is_local(d.get("DEST_DRIVE")) for d in spec.get("EXTRA_DESTS") or ())
+    need = ("SRC_DRIVE", "DEST_DRIVE", "DEST_PARENT") + (() if offline else ("TENANT", "CLIENT", "SECRET"))
+    missing = [k for k in need if not spec.get(k)]
+    if missing:
+        emit("error", msg=f"missing job fields: {', '.join(missing)}")
+        return EXIT_USAGE
+    try:
+        from graph_client.filters import ItemFilter
+        ItemFilter.from_spec(spec.get("FILTERS"))
+    except ValueError as e:
+        emit("error", msg=f"bad FILTERS: {e}")
+        return EXIT_USAGE
+    if spec.get("SKIP_MODE") not in (None, "", "hash", "mtime"):
+        emit("error", msg=f"bad SKIP_MODE: {spec['SKIP_MODE']!r} (hash or mtime)")
+        return EXIT_USAGE
+    if spec.get("AUDIT") not in (None, "", "full", "sample"):
+        emit("error", msg=f"bad AUDIT: {spec['AUDIT']!r} (full or sample)")
+        return EXIT_USAGE
+    extra = spec.get("EXTRA_DESTS") or []
+    if any(not (d.get("DEST_DRIVE") and d.get("DEST_PARENT")) for d in extra):
+        emit("error", msg="each extra destination needs a drive and a parent (DRIVE:PARENT[:ROOT])")
+        return EXIT_USAGE
+    if extra and (args.shard_queue or args.plan or spec.get("PLAN_FILE")):
+        emit("error", msg="extra destinations work with plain jobs only (no --shard-queue / --plan / --execute-plan)")
+        return EXIT_USAGE
+
+    from ui.controller import Controller
+
+    controller = Controller(
+        timeout=(10, 300),
+        chunk=args.chunk_mb * 1024 * 1024,
+        min_chunk=1 * 1024 * 1024,
+        max_single=4 * 1024 * 1024,
+        delete_extras=bool(spec.get("DELETE_EXTRAS", args.delete_extras)),
+    )
+    controller.set_callbacks(
+        log=lambda msg: emit("log", msg=msg.rstrip("\n")),
+        set_stage=lambda text: emit("stage", stage=text),
+    )
+    controller.set_verbosity(args.verbosity)
+    controller.EXTRAS_DRY_RUN = args.extras_dry_run
+
+    def _on_signal(signum, _frame):
+        emit("signal", signum=signum)
+        controller.cancel_job()
+    signal.signal(signal.SIGINT, _on_signal)
+    try:
+        signal.signal(signal.SIGTERM, _on_signal)
+    except (AttributeError, ValueError):
+        pass
+
+    # runtime profiling toggles; stopping a capture waits on busy threads, so not in the handler
+    def _on_profile_signal(signum, _frame):
+        fn = controller.toggle_cpu_profile if signum == signal.SIGUSR1 else controller.toggle_mem_profile
+        Thread(target=lambda: emit("profile", kind="cpu" if signum == signal.SIGUSR1 else "mem", on=fn()),
+               daemon=True).start()
+    for sig in ("SIGUSR1", "SIGUSR2"):
+        if hasattr(signal, sig):  # POSIX only
+            signal.signal(getattr(signal, sig), _on_profile_signal)
+    if args.profile:
+        controller.prof.start_cpu()
+    if args.profile_mem:
+        controller.prof.start_mem()
+
+    if args.shard_queue:
+        from ui.sharding import run_shard_worker
+        res = run_shard_worker(controller, spec, args.shard_queue,
+                               max_shard_bytes=int(args.shard_gb * 1024 ** 3))
+        emit("stats", **controller.get_stats())
+        status = "cancelled" if controller.CANCEL_EV.is_set() else ("failed" if res["queue"]["failed"] else "done")
+        code = exit_code_for({"status": status, "audit": res["audit"]})
+        emit("result", exit_code=code, **res)
+        return code
+
+    if args.plan:
+        controller.plan_job(spec)
+    else:
+        controller.start_job(spec)
+    every = args.stats_every if args.stats_every > 0 else None
+    while True:
+        result = controller.wait_job(timeout=every)
+        if result is not None or not controller._job_thread.is_alive():
+            break
+        emit("stats", **controller.get_stats())
+
+    emit("stats", **controller.get_stats())
+    code = exit_code_for(result)
+    emit("result", exit_code=code, **(result or {"status": "failed"}))
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -61,6 +61,21 @@ class DirectoryClient:
             "name": u.get("displayName") or u.get("userPrincipalName"),
         } for u in j.get("value", [])]
 
+    def list_users(self):
+        # whole directory, for the local index (paged 999 at a time)
+        url = f"{GRAPH}/users?$select=id,displayName,userPrincipalName&$top=999"
+        users = []
+        while url:
+            j = self.RH.get(url).json()
+            for u in j.get("value", []):
+                users.append({
+                    "id": u["id"],
+                    "upn": u.get("userPrincipalName"),
+                    "name": u.get("displayName") or u.get("userPrincipalName"),
+                })
+            url = j.get("@odata.nextLink")
+        return users
+
     def resolve_user_drive(self, upn_or_id: str):
         r = self.RH.get(f"{GRAPH}/users/{upn_or_id}/drive", ok_extra=(404,))
         if r.status_code == 200:
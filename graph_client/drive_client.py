@@ -1,11 +1,165 @@
 from __future__ import annotations
 import json
-from .graph_common import GRAPH, _enc, _clean
+import time
+from .graph_common import GRAPH, _enc, _clean, _qxh, _mtime
+
+BATCH_MAX = 20          # Graph's limit of sub-requests per $batch
+
+
+def _enc_path(path: str) -> str:
+    return "/".join(_enc(seg) for seg in path.split("/"))
+
 
 class DriveClient:
     def __init__(self, http):
         self.RH = http
 
+    def batch(self, requests):
+        """POST one /$batch (<= BATCH_MAX sub-requests); returns {id: response}."""
+        r = self.RH.post(
+            f"{GRAPH}/$batch",
+            headers={"Content-Type": "application/json"},
+            data=json.dumps({"requests": requests}),
+        )
+        r.raise_for_status()
+        return {x["id"]: x for x in r.json().get("responses", [])}
+
+    def ensure_folders_by_paths(self, drive, parent_id, paths, *, known=None):
+        """Create every folder in `paths` ("a/b/c", relative to parent_id) plus
+        missing ancestors, 20 per $batch. Returns {path: id} for all of them.
+
+        A child whose parent is created in the same batch is path-addressed
+        and chained with dependsOn. 409 means it already exists: those ids
+        come from one batched GET. 424 (parent failed in the batch) and
+        throttled sub-requests go to the next round. `known` ({path: id})
+        skips folders resolved by an earlier call.
+        """
+        ids = dict(known or {})
+        ids[""] = parent_id
+        todo = set()
+        for p in paths:
+            parts = [seg for seg in p.split("/") if seg]
+            for i in range(1, len(parts) + 1):
+                q = "/".join(parts[:i])
+                if q not in ids:
+                    todo.add(q)
+
+        pending = sorted(todo, key=lambda q: (q.count("/"), q))
+        # rounds without progress back off under the HTTP retry policy ("write" deadline)
+        policy = self.RH.policy
+        pst = policy.begin("write")
+        while pending:
+            before = len(ids)
+            retry, delay = [], 0.0
+            i = 0
+            while i < len(pending):
+                chunk, in_batch = [], {}
+                while i < len(pending) and len(chunk) < BATCH_MAX:
+                    q = pending[i]; i += 1
+                    parent, _, name = q.rpartition("/")
+                    req = {
+                        "id": str(len(chunk) + 1), "method": "POST",
+                        "headers": {"Content-Type": "application/json"},
+                        "body": {"name": _clean(name), "folder": {}, "@microsoft.graph.conflictBehavior": "fail"},
+                    }
+                    if parent in ids:
+                        req["url"] = f"/drives/{drive}/items/{ids[parent]}/children"
+                    elif parent in in_batch:
+                        req["url"] = f"/drives/{drive}/items/{parent_id}:/{_enc_path(parent)}:/children"
+                        req["dependsOn"] = [in_batch[parent]]
+                    else:
+                        retry.append(q)  # parent failed/throttled this round
+                        continue
+                    in_batch[q] = req["id"]
+                    chunk.append((q, req))
+                if not chunk:
+                    continue
+
+                res = self.batch([req for _, req in chunk])
+                exists = []
+                for q, req in chunk:
+                    x = res.get(req["id"]) or {}
+                    st = x.get("status")
+                    if st in (200, 201):
+                        ids[q] = x["body"]["id"]
+                    elif st == 409:
+                        exists.append(q)
+                    elif st in (424, 429, 500, 502, 503, 504) or st is None:
+                        retry.append(q)
+                        ra = (x.get("headers") or {}).get("Retry-After")
+                        if ra:
+                            try: delay = max(delay, float(ra))
+                            except ValueError: pass
+                    else:
+                        raise RuntimeError(f"Create folder '{q}' failed: HTTP {st} {x.get('body')}")
+                if exists:
+                    retry += self._resolve_existing(drive, parent_id, exists, ids)
+
+            pending = sorted({q for q in retry if q not in ids}, key=lambda q: (q.count("/"), q))
+            if pending:
+                if len(ids) > before:
+                    pst.progress()
+                    if delay:
+                        time.sleep(delay)
+                else:
+                    why = pst.retry("batch", delay or None)
+                    if why:
+                        raise policy.give_up(pst, why, f"Folder batch made no progress; "
+                                                       f"{len(pending)} folders left (first: {pending[0]})")
+
+        ids.pop("", None)
+        return ids
+
+    def _resolve_existing(self, drive, parent_id, paths, ids):
+        # batched GET for folders that answered 409; returns the ones to retry
+        retry = []
+        for k in range(0, len(paths), BATCH_MAX):
+            part = paths[k:k + BATCH_MAX]
+            res = self.batch([
+                {"id": str(n + 1), "method": "GET",
+                 "url": f"/drives/{drive}/items/{parent_id}:/{_enc_path(q)}:?$select=id,name,folder"}
+                for n, q in enumerate(part)
+            ])
+            for n, q in enumerate(part):
+                x = res.get(str(n + 1)) or {}
+                if x.get("status") == 200:
+                    if "folder" not in (x.get("body") or {}):
+                        raise RuntimeError(f"Path collision: a file named '{q}' exists at the destination.")
+                    ids[q] = x["body"]["id"]
+                else:
+                    retry.append(q)  # throttled, or removed since the 409
+        return retry
+
+    def delete_items(self, drive, ids):
+        """DELETE items (<= BATCH_MAX) in one $batch; {item_id: status}."""
+        res = self.batch([
+            {"id": str(n + 1), "method": "DELETE", "url": f"/drives/{drive}/items/{item_id}"}
+            for n, item_id in enumerate(ids)
+        ])
+        return {item_id: (res.get(str(n + 1)) or {}).get("status") for n, item_id in enumerate(ids)}
+
+    def set_items_times(self, drive, items):
+        """PATCH fileSystemInfo onto items [(item_id, fsi)] (<= BATCH_MAX) in one $batch;
+        {item_id: (status, driveItem or None)}."""
+        res = self.batch([
+            {"id": str(n + 1), "method": "PATCH", "url": f"/drives/{drive}/items/{item_id}",
+             "headers": {"Content-Type": "application/json"}, "body": {"fileSystemInfo": fsi}}
+            for n, (item_id, fsi) in enumerate(items)
+        ])
+        out = {}
+        for n, (item_id, _) in enumerate(items):
+            sub = res.get(str(n + 1)) or {}
+            out[item_id] = (sub.get("status"), sub.get("body"))
+        return out
+
+    def try_get_folder(self, drive, parent_id, name):
+        """Id of the folder `name` under parent_id, or None."""
+        r = self.RH.get(f"{GRAPH}/drives/{drive}/items/{parent_id}:/{_enc(name)}:?$select=id,folder",
+                        ok_extra=(404,))
+        if r.status_code == 200 and "folder" in r.json():
+            return r.json()["id"]
+        return None
+
     def ensure_folder_by_path(self, drive, parent_id, name):
         get_url = f"{GRAPH}/drives/{drive}/items/{parent_id}:/{_enc(name)}:?$select=id,name,folder"
         r = self.RH.get(get_url, ok_extra=(404,))
@@ -31,32 +185,60 @@ class DriveClient:
         return r.json()["id"]
 
     def try_get_dest_file_fast(self, drive, parent_id, name):
-        url = f"{GRAPH}/drives/{drive}/items/{parent_id}:/{_enc(name)}:?$select=id,name,size,file,hashes"
+        """(id, size, quickXorHash, mtime) of a destination file, or None."""
+        url = f"{GRAPH}/drives/{drive}/items/{parent_id}:/{_enc(name)}:?$select=id,name,size,file,hashes,fileSystemInfo"
         r = self.RH.get(url, ok_extra=(404,))
         if r.status_code == 200:
             j = r.json()
             if "file" in j:
-                h = (j.get("hashes") or {}).get("quickXorHash")
-                return j["id"], j.get("size", 0) or 0, h
+                return j["id"], j.get("size", 0) or 0, _qxh(j), _mtime(j)
+        elif r.status_code != 404:
+            r.raise_for_status()
+        return None
+
+    def try_get_dest_file_by_path(self, drive, parent_id, rel_path):
+        """Same as try_get_dest_file_fast, for a file some folders below parent_id."""
+        url = (f"{GRAPH}/drives/{drive}/items/{parent_id}:/{_enc_path(rel_path)}:"
+               f"?$select=id,name,size,file,hashes,fileSystemInfo")
+        r = self.RH.get(url, ok_extra=(404,))
+        if r.status_code == 200:
+            j = r.json()
+            if "file" in j:
+                return j["id"], j.get("size", 0) or 0, _qxh(j), _mtime(j)
         elif r.status_code != 404:
             r.raise_for_status()
         return None
 
     def list_files_map(self, drive, parent):
-        url = (f"{GRAPH}/drives/{drive}/root/children?$top=200&$select=id,name,size,folder,file,hashes"
+        url = (f"{GRAPH}/drives/{drive}/root/children?$top=200&$select=id,name,size,folder,file,hashes,fileSystemInfo"
                if parent == "root" else
-               f"{GRAPH}/drives/{drive}/items/{parent}/children?$top=200&$select=id,name,size,folder,file,hashes")
+               f"{GRAPH}/drives/{drive}/items/{parent}/children?$top=200&$select=id,name,size,folder,file,hashes,fileSystemInfo")
         out = {}
         while url:
             j = self.RH.get(url).json()
             for v in j.get("value", []):
                 if "folder" in v:
                     continue
-                h = (v.get("hashes") or {}).get("quickXorHash")
-                out[v["name"]] = (v["id"], v.get("size", 0) or 0, h)
+                out[v["name"]] = (v["id"], v.get("size", 0) or 0, _qxh(v), _mtime(v))
             url = j.get("@odata.nextLink")
         return out
 
+    def list_children_maps(self, drive, parent):
+        """One listing, split: ({name: (id, size, hash, mtime)} files, {name: (id, size)} folders)."""
+        url = (f"{GRAPH}/drives/{drive}/root/children?$top=200&$select=id,name,size,folder,file,hashes,fileSystemInfo"
+               if parent == "root" else
+               f"{GRAPH}/drives/{drive}/items/{parent}/children?$top=200&$select=id,name,size,folder,file,hashes,fileSystemInfo")
+        files, folders = {}, {}
+        while url:
+            j = self.RH.get(url).json()
+            for v in j.get("value", []):
+                if "folder" in v:
+                    folders[v["name"]] = (v["id"], v.get("size", 0) or 0)
+                else:
+                    files[v["name"]] = (v["id"], v.get("size", 0) or 0, _qxh(v), _mtime(v))
+            url = j.get("@odata.nextLink")
+        return files, folders
+
     def list_folders(self, drive_id: str, parent_id: str | None = "root"):
         url = (f"{GRAPH}/drives/{drive_id}/root/children?$top=200&$select=id,name,folder"
                if parent_id in (None, "root") else
@@ -70,6 +252,55 @@ class DriveClient:
             url = j.get("@odata.nextLink")
         return out
 
+    def set_file_times(self, drive, item_id, fsi):
+        """PATCH fileSystemInfo (createdDateTime/lastModifiedDateTime) onto an item."""
+        r = self.RH.patch(
+            f"{GRAPH}/drives/{drive}/items/{item_id}",
+            headers={"Content-Type": "application/json"},
+            data=json.dumps({"fileSystemInfo": fsi}),
+        )
+        r.raise_for_status()
+        return r
+
+    def copy_item(self, drive, item_id, parent_id, name):
+        """Server-side copy of a file into parent_id (same drive) as `name`, replacing one
+        already there; polls the copy monitor and returns the new item's id."""
+        r = self.RH.post(
+            f"{GRAPH}/drives/{drive}/items/{item_id}/copy?@microsoft.graph.conflictBehavior=replace",
+            headers={"Content-Type": "application/json"},
+            data=json.dumps({"parentReference": {"driveId": drive, "id": parent_id}, "name": _clean(name)}),
+        )
+        monitor = r.headers.get("Location")
+        if not monitor:
+            raise RuntimeError(f"copy of {item_id}: no monitor URL (status {r.status_code})")
+        # the monitor URL is pre-authorized and not on Graph: no token, plain session.
+        # Progress (percentageComplete moving) renews the deadline, like an upload session
+        policy = self.RH.policy
+        st = policy.begin("session")
+        last, delay = None, 0.5
+        while True:
+            try:
+                m = self.RH.S.get(monitor, timeout=self.RH.timeout, allow_redirects=False)
+                j = m.json() if m.status_code < 300 else {}
+            except Exception as e:
+                m, j = None, {"status": "error", "error": str(e)}
+            status = j.get("status")
+            if status == "completed" and j.get("resourceId"):
+                return j["resourceId"]
+            if status == "failed":
+                raise RuntimeError(f"copy of {item_id} failed: {j.get('error') or j}")
+            if m is not None and m.status_code == 303:
+                # some monitors redirect to the new item once done
+                return m.headers.get("Location", "").rstrip("/").rsplit("/", 1)[-1]
+            pct = j.get("percentageComplete")
+            if pct != last:
+                last = pct
+                st.progress()
+            if time.monotonic() + delay > st.deadline:
+                raise policy.give_up(st, "deadline", f"copy of {item_id}: {status or 'no answer'}")
+            time.sleep(delay)
+            delay = min(5.0, delay * 2)
+
     def get_drive_root_id(self, drive_id: str) -> str:
         r = self.RH.get(f"{GRAPH}/drives/{drive_id}/root?$select=id")
         r.raise_for_status()
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+
+__all__ = ["ItemFilter", "parse_size"]
+
+_UNITS = {"": 1, "B": 1, "K": 1024, "KB": 1024, "M": 1024 ** 2, "MB": 1024 ** 2,
+          "G": 1024 ** 3, "GB": 1024 ** 3, "T": 1024 ** 4, "TB": 1024 ** 4}
+
+
+def parse_size(val) -> Optional[int]:
+    """500, "500", "20MB", "1.5 GB" -> bytes (None for empty)."""
+    if val is None or val == "":
+        return None
+    if isinstance(val, (int, float)):
+        return int(val)
+    m = re.fullmatch(r"\s*([\d.]+)\s*([A-Za-z]*)\s*", str(val))
+    if not m or m.group(2).upper() not in _UNITS:
+        raise ValueError(f"bad size: {val!r}")
+    return int(float(m.group(1)) * _UNITS[m.group(2).upper()])
+
+
+def _since(val) -> Optional[str]:
+    # -> "YYYY-MM-DDTHH:MM:SS" in UTC, the prefix Graph timestamps compare on
+    if not val:
+        return None
+    dt = datetime.fromisoformat(str(val).strip().replace("Z", "+00:00"))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _glob_re(pat: str) -> str:
+    # ** spans folders, * and ? stay inside one name, [...] as in fnmatch
+    out, i = [], 0
+    while i < len(pat):
+        if pat.startswith("**/", i):
+            out.append("(?:.*/)?"); i += 3; continue
+        if pat.startswith("**", i):
+            out.append(".*"); i += 2; continue
+        c = pat[i]
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[" and pat.find("]", i + 2) > 0:
+            j = pat.find("]", i + 2)
+            cls = pat[i + 1:j].replace("\\", "\\\\")
+            out.append("[" + ("^" + cls[1:] if cls.startswith("!") else cls) + "]")
+            i = j
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "^" + "".join(out) + "$"
+
+
+def _compile(rules: Iterable[str]):
+    """Split rules into one name regex and one path regex (None when unused).
+
+    "*.tmp", ".DS_Store"      no slash: the item name, at any depth
+    "Archive/Video/**"        with a slash: the path under the source folder
+    "re:<regex>"              searched in that path
+    Case-insensitive, like SharePoint names.
+    """
+    names, paths = [], []
+    for r in rules:
+        r = (r or "").strip()
+        if not r:
+            continue
+        if r.startswith("re:"):
+            try:
+                re.compile(r[3:])
+            except re.error as e:
+                raise ValueError(f"bad filter rule {r!r}: {e}") from None
+            paths.append(f"(?:{r[3:]})")
+        elif "/" in r.strip("/"):
+            paths.append(_glob_re(r.strip("/")))
+        else:
+            names.append(_glob_re(r.strip("/")))
+    mk = lambda parts: re.compile("|".join(parts), re.IGNORECASE).search if parts else None
+    return mk(names), mk(paths)
+
+
+def _exts(vals) -> frozenset:
+    return frozenset(v.strip().lstrip(".").lower() for v in (vals or ()) if v and v.strip())
+
+
+def _listish(val):
+    # spec values may be a list or one comma-separated string (GUI field, env)
+    if isinstance(val, str):
+        return [v for v in val.split(",") if v.strip()]
+    return list(val or ())
+
+
+class ItemFilter:
+    """Include/exclude rules checked while the source is enumerated.
+
+    Rules are compiled once into a couple of regexes and sets, so a check
+    is a few dict/regex lookups per item. Paths are relative to the copied
+    folder (`root`, the ROOT_NAME prefix the walkers put on paths, is
+    stripped). Excluded folders are pruned before they are listed; include
+    rules only ever apply to files, so folders are still walked for them.
+    Counters (excluded_files/bytes, pruned_dirs) are for the phase logs.
+    """
+
+    KEYS = ("include", "exclude", "extensions", "exclude_extensions", "min_size", "max_size", "modified_since")
+
+    def __init__(self, *, include=(), exclude=(), extensions=(), exclude_extensions=(),
+                 min_size=None, max_size=None, modified_since=None, root=""):
+        self.spec = {
+            "include": sorted(_listish(include)), "exclude": sorted(_listish(exclude)),
+            "extensions": sorted(_exts(_listish(extensions))), "exclude_extensions": sorted(_exts(_listish(exclude_extensions))),
+            "min_size": parse_size(min_size), "max_size": parse_size(max_size), "modified_since": _since(modified_since),
+        }
+        self._inc_name, self._inc_path = _compile(self.spec["include"])
+        self._exc_name, self._exc_path = _compile(self.spec["exclude"])
+        self._has_inc = bool(self._inc_name or self._inc_path)
+        self._ext = frozenset(self.spec["extensions"])
+        self._xext = frozenset(self.spec["exclude_extensions"])
+        self._min = self.spec["min_size"]
+        self._max = self.spec["max_size"]
+        self._since = self.spec["modified_since"]
+        self._root = (root or "").strip("/") + "/"
+        self._rootlen = len(self._root) if self._root != "/" else 0
+        self.reset_counts()
+
+    @classmethod
+    def from_spec(cls, spec: Optional[Dict[str, Any]], root: str = "") -> Optional["ItemFilter"]:
+        """None when the spec has no rule, so unfiltered jobs pay nothing."""
+        spec = {k: v for k, v in (spec or {}).items() if k in cls.KEYS and v not in (None, "", [], ())}
+        return cls(**spec, root=root) if spec else None
+
+    @property
+    def needs_mtime(self) -> bool:
+        # listings must $select lastModifiedDateTime/fileSystemInfo
+        return self._since is not None
+
+    def signature(self) -> Dict[str, Any]:
+        return {k: v for k, v in self.spec.items() if v not in (None, [])}
+
+    def reset_counts(self):
+        self.excluded_files = 0
+        self.excluded_bytes = 0
+        self.pruned_dirs = 0
+
+    def _rel(self, path: str) -> str:
+        if self._rootlen and path.startswith(self._root):
+            return path[self._rootlen:]
+        return path
+
+    def excluded(self, path: str, name: str) -> bool:
+        """Name/path exclude rules only (also what keeps a destination item out of DELETE_EXTRAS)."""
+        if self._exc_name and self._exc_name(name):
+            return True
+        return bool(self._exc_path) and bool(self._exc_path(self._rel(path)))
+
+    def want_dir(self, path: str, name: str) -> bool:
+        if self._exc_name and self._exc_name(name):
+            self.pruned_dirs += 1
+            return False
+        if self._exc_path:
+            rel = self._rel(path)
+            if self._exc_path(rel) or self._exc_path(rel + "/"):  # "Archive/**" covers Archive itself
+                self.pruned_dirs += 1
+                return False
+        return True
+
+    def want_file(self, path: str, name: str, size: int = 0, item: Optional[dict] = None) -> bool:
+        ok = self._check(path, name, size, item)
+        if not ok:
+            self.excluded_files += 1
+            self.excluded_bytes += size or 0
+        return ok
+
+    def _check(self, path, name, size, item) -> bool:
+        if self._min is not None and size < self._min:
+            return False
+        if self._max is not None and size > self._max:
+            return False
+        if self._ext or self._xext:
+            ext = name.rpartition(".")[2].lower() if "." in name else ""
+            if ext in self._xext or (self._ext and ext not in self._ext):
+                return False
+        if self._since is not None and item is not None:
+            ts = (item.get("fileSystemInfo") or {}).get("lastModifiedDateTime") or item.get("lastModifiedDateTime") or ""
+            if ts[:19] < self._since:
+                return False
+        if self.excluded(path, name):
+            return False
+        if self._has_inc:
+            if self._inc_name and self._inc_name(name):
+                return True
+            return bool(self._inc_path) and bool(self._inc_path(self._rel(path)))
+        return True
+
+    def summary(self) -> str:
+        return (f"[FILTER] excluded {self.excluded_files:,} files ({self.excluded_bytes:,} bytes), "
+                f"pruned {self.pruned_dirs:,} folders")
@@ -12,8 +12,8 @@ class GraphClient:
         http, reset_token,
         timeout=(10,300), chunk=8*1024*1024, min_chunk=1*1024*1024, max_single=4*1024*1024,
         delete_extras=False,
-        get_cursor=None, set_cursor=None, clear_cursor=None, should_cancel=None,
-        on_discover_file=None, on_file_done=None,
+        ledger_get=None, ledger_put=None, should_cancel=None,
+        on_discover_file=None, on_file_done=None, budget=None, max_concurrency=4,
     ):
         self.RH = http
         self.reset_token = reset_token
@@ -26,10 +26,12 @@ class GraphClient:
             http=self.RH,
             drive_client=self.drive,
             chunk=chunk, min_chunk=min_chunk, max_single=max_single,
-            get_cursor=get_cursor, set_cursor=set_cursor, clear_cursor=clear_cursor,
+            ledger_get=ledger_get, ledger_put=ledger_put,
             should_cancel=should_cancel,
             on_discover_file=on_discover_file,
             on_file_done=on_file_done,
+            budget=budget,
+            max_concurrency=max_concurrency,
         )
         self.xfer.DELETE_EXTRAS = delete_extras
 
@@ -39,16 +41,23 @@ class GraphClient:
     def list_site_libraries(self, *a, **k):      return self.dir.list_site_libraries(*a, **k)
     def search_sites(self, *a, **k):             return self.dir.search_sites(*a, **k)
     def search_users(self, *a, **k):             return self.dir.search_users(*a, **k)
+    def list_users(self, *a, **k):               return self.dir.list_users(*a, **k)
     def resolve_user_drive(self, *a, **k):       return self.dir.resolve_user_drive(*a, **k)
 
-    #Drive primitives passthrough
-    def ensure_folder_by_path(self, *a, **k): return self.drive.ensure_folder_by_path(*a, **k)
-    def list_folders(self, *a, **k):          return self.drive.list_folders(*a, **k)
-    def list_files_map(self, *a, **k):        return self.drive.list_files_map(*a, **k)
-    def get_drive_root_id(self, *a, **k):     return self.drive.get_drive_root_id(*a, **k)
-    def try_get_dest_file_fast(self, *a, **k):return self.drive.try_get_dest_file_fast(*a, **k)
+    #Drive primitives passthrough (Graph, or a LocalDrive for "local:/path" drive ids)
+    def ensure_folder_by_path(self, d, *a, **k): return self.xfer._dc(d).ensure_folder_by_path(d, *a, **k)
+    def list_folders(self, d, *a, **k):          return self.xfer._dc(d).list_folders(d, *a, **k)
+    def list_files_map(self, d, *a, **k):        return self.xfer._dc(d).list_files_map(d, *a, **k)
+    def list_children_maps(self, d, *a, **k):    return self.xfer._dc(d).list_children_maps(d, *a, **k)
+    def get_drive_root_id(self, d, *a, **k):     return self.xfer._dc(d).get_drive_root_id(d, *a, **k)
+    def try_get_dest_file_fast(self, d, *a, **k):return self.xfer._dc(d).try_get_dest_file_fast(d, *a, **k)
+    def try_get_dest_file_by_path(self, d, *a, **k): return self.xfer._dc(d).try_get_dest_file_by_path(d, *a, **k)
 
     #transfer passthrough
     def upload_stream_replace(self, *a, **k): return self.xfer.upload_stream_replace(*a, **k)
     def mirror_files_exact(self, *a, **k):    return self.xfer.mirror_files_exact(*a, **k)
     def mirror_folders_only(self, *a, **k):   return self.xfer.mirror_folders_only(*a, **k)
+    def plan_shards(self, *a, **k):           return self.xfer.plan_shards(*a, **k)
+    def plan_files_exact(self, *a, **k):      return self.xfer.plan_files_exact(*a, **k)
+    def execute_plan(self, *a, **k):          return self.xfer.execute_plan(*a, **k)
+    def reconcile_extras(self, *a, **k):      return self.xfer.reconcile_extras(*a, **k)
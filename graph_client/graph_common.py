@@ -1,6 +1,8 @@
+import os
 from urllib.parse import quote, urlparse
 
-GRAPH = "https://graph.microsoft.com/v1.0"
+# SPOD_GRAPH_URL points the whole tool at another endpoint (tools/fake_graph.py)
+GRAPH = (os.environ.get("SPOD_GRAPH_URL") or "https://graph.microsoft.com/v1.0").rstrip("/")
 
 def _clean(name: str) -> str:
     return name.replace("/", "_").strip() or "_"
@@ -8,6 +10,33 @@ def _clean(name: str) -> str:
 def _enc(name: str) -> str:
     return quote(_clean(name), safe="")
 
+def _qxh(item: dict):
+    # quickXorHash sits under the file facet; older code selected a top-level "hashes"
+    return (((item.get("file") or {}).get("hashes") or item.get("hashes") or {}).get("quickXorHash")) or None
+
+def _fsi(item: dict):
+    """fileSystemInfo timestamps as {createdDateTime, lastModifiedDateTime} (None if absent)."""
+    fsi = item.get("fileSystemInfo") or {}
+    out = {k: fsi[k] for k in ("createdDateTime", "lastModifiedDateTime") if fsi.get(k)}
+    return out or None
+
+def _mtime(item: dict):
+    # second precision: what SharePoint keeps and what we set on upload
+    ts = (item.get("fileSystemInfo") or {}).get("lastModifiedDateTime")
+    return ts[:19] if ts else None
+
+def _item_rec(r):
+    # (id, size, quickXorHash, mtime) of the driveItem a final upload/PATCH answered with, else None
+    try:
+        if r is None or r.status_code not in (200, 201):
+            return None
+        j = r.json()
+    except Exception:
+        return None
+    if not j.get("id") or "size" not in j:
+        return None
+    return j["id"], j.get("size", 0) or 0, _qxh(j), _mtime(j)
+
 def _parse_site_url(url: str):
     u = urlparse(url)
     host = u.netloc
@@ -16,4 +45,3 @@ def _parse_site_url(url: str):
         raise ValueError("Invalid SharePoint site URL (missing host)")
     return host, path.rstrip("/")
 #
-
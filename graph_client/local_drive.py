@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import mmap
+import os
+import shutil
+from datetime import datetime, timezone
+from itertools import count
+from threading import Lock
+
+from .graph_common import _clean
+
+__all__ = ["LOCAL_PREFIX", "LocalDrive", "LocalResponse", "MmapChunk", "is_local"]
+
+# drive ids of the form "local:/srv/export" (or "local:D:\\export") are directories
+LOCAL_PREFIX = "local:"
+PART_SUFFIX = ".spodpart"   # upload in progress; renamed over the target when complete
+
+
+def is_local(drive) -> bool:
+    return isinstance(drive, str) and drive.startswith(LOCAL_PREFIX)
+
+
+def _iso(ts: float) -> str:
+    # second precision, like SharePoint keeps fileSystemInfo
+    return datetime.fromtimestamp(int(ts), timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _ts(iso: str) -> float:
+    return datetime.fromisoformat(iso.replace("Z", "+00:00")).timestamp()
+
+
+def _pwrite(fd, view, off):
+    view = memoryview(view)
+    done = 0
+    while done < len(view):
+        if hasattr(os, "pwrite"):
+            done += os.pwrite(fd, view[done:], off + done)
+        else:  # Windows
+            os.lseek(fd, off + done, os.SEEK_SET)
+            done += os.write(fd, view[done:])
+
+
+class LocalResponse:
+    """Stands in for a requests.Response where TransferManager reads one."""
+    __slots__ = ("status_code", "_body")
+
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self._body = body
+
+    def json(self):
+        return self._body
+
+    @property
+    def content(self):
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"local: HTTP-equivalent {self.status_code}: {self._body}")
+
+    def close(self):
+        pass
+
+
+class MmapChunk:
+    """Read-only, rewindable file object over a memoryview of an mmap slice.
+
+    Used as a request body it is streamed to the socket in slices of the
+    mapping, never copied into a bytes object; RobustHTTP seeks it back to
+    0 before every try. The mapping goes away with the last reference.
+    """
+    __slots__ = ("view", "_pos")
+
+    def __init__(self, view):
+        self.view = view
+        self._pos = 0
+
+    def __len__(self):
+        return len(self.view)
+
+    def read(self, n=-1):
+        end = len(self.view) if n is None or n < 0 else min(len(self.view), self._pos + n)
+        out = self.view[self._pos:end]
+        self._pos = end
+        return out
+
+    def seek(self, pos, whence=0):
+        base = (0, self._pos, len(self.view))[whence]
+        self._pos = max(0, min(len(self.view), base + pos))
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def __bytes__(self):
+        return bytes(self.view)
+
+
+class LocalDrive:
+    """A directory tree answering the calls TransferManager makes on a Graph drive.
+
+    Item ids are "/"-joined paths below the root ("root" for the root
+    itself); items come back shaped like driveItems (name, size, eTag,
+    fileSystemInfo, file/folder facet, no hashes). As a source it lists
+    folders and serves ranges as mmap slices (MmapChunk). As a destination
+    it has DriveClient's folder/probe/listing calls, and upload "sessions"
+    that write each range in place into a file preallocated to its full
+    size, renamed over the target when the last range lands.
+    """
+
+    def __init__(self, drive_id: str):
+        self.drive_id = drive_id
+        self.root = os.path.abspath(os.path.expanduser(drive_id[len(LOCAL_PREFIX):]))
+        self._lk = Lock()
+        self._sessions = {}   # url -> [parent_id, name, fsi, next_expected]
+        self._seq = count(1)
+
+    def _path(self, item_id):
+        if item_id in (None, "", "root"):
+            return self.root
+        return os.path.join(self.root, *item_id.split("/"))
+
+    @staticmethod
+    def _id(parent_id, name):
+        return name if parent_id in (None, "", "root") else f"{parent_id}/{name}"
+
+    def _item(self, item_id, name, st, is_dir):
+        mtime, ctime = _iso(st.st_mtime), _iso(getattr(st, "st_birthtime", st.st_mtime))
+        j = {"id": item_id, "name": name, "eTag": f'"{st.st_mtime_ns:x}-{st.st_size:x}"',
+             "lastModifiedDateTime": mtime,
+             "fileSystemInfo": {"createdDateTime": ctime, "lastModifiedDateTime": mtime}}
+        if is_dir:
+            j["folder"] = {}
+            j["size"] = 0
+        else:
+            j["file"] = {}
+            j["size"] = st.st_size
+        return j
+
+    def _file_rec(self, item_id):
+        # (id, size, hash, mtime) like DriveClient.try_get_dest_file_fast; no hash here
+        try:
+            st = os.stat(self._path(item_id))
+        except FileNotFoundError:
+            return None
+        if not os.path.isfile(self._path(item_id)):
+            return None
+        return item_id, st.st_size, None, _iso(st.st_mtime)[:19]
+
+    # source
+    def children(self, item_id):
+        out = []
+        with os.scandir(self._path(item_id)) as it:
+            for e in it:
+                if e.name.endswith(PART_SUFFIX):
+                    continue
+                try:
+                    is_dir = e.is_dir()
+                    st = e.stat()
+                except OSError:
+                    continue  # vanished or unreadable; the walk goes on
+                out.append(self._item(self._id(item_id, e.name), e.name, st, is_dir))
+        out.sort(key=lambda j: j["name"])
+        return out
+
+    def read_all(self, item_id) -> bytes:
+        with open(self._path(item_id), "rb") as f:
+            return f.read()
+
+    def read_range(self, item_id, start, length) -> MmapChunk:
+        with open(self._path(item_id), "rb") as f:
+            off = start - start % mmap.ALLOCATIONGRANULARITY
+            mm = mmap.mmap(f.fileno(), length + start - off, offset=off, access=mmap.ACCESS_READ)
+        if hasattr(mm, "madvise"):
+            try: mm.madvise(mmap.MADV_SEQUENTIAL)
+            except (AttributeError, OSError): pass
+        return MmapChunk(memoryview(mm)[start - off:])
+
+    # destination: DriveClient's calls
+    def get_drive_root_id(self, drive_id=None):
+        return "root"
+
+    def ensure_folder_by_path(self, drive, parent_id, name):
+        item_id = self._id(parent_id, _clean(name))
+        p = self._path(item_id)
+        if os.path.isfile(p):
+            raise RuntimeError(f"Path collision: a file named '{name}' exists at the destination.")
+        os.makedirs(p, exist_ok=True)
+        return item_id
+
+    def ensure_folders_by_paths(self, drive, parent_id, paths, *, known=None):
+        ids = dict(known or {})
+        for q in paths:
+            parts = [seg for seg in q.split("/") if seg]
+            cur = parent_id
+            for i, seg in enumerate(parts):
+                key = "/".join(parts[:i + 1])
+                cur = ids.get(key) or self.ensure_folder_by_path(drive, cur, seg)
+                ids[key] = cur
+        return ids
+
+    def try_get_folder(self, drive, parent_id, name):
+        item_id = self._id(parent_id, _clean(name))
+        return item_id if os.path.isdir(self._path(item_id)) else None
+
+    def try_get_dest_file_fast(self, drive, parent_id, name):
+        return self._file_rec(self._id(parent_id, _clean(name)))
+
+    def try_get_dest_file_by_path(self, drive, parent_id, rel_path):
+        return self._file_rec(self._id(parent_id, "/".join(_clean(s) for s in rel_path.split("/"))))
+
+    def list_children_maps(self, drive, parent):
+        files, folders = {}, {}
+        for j in self.children(parent):
+            if "folder" in j:
+                folders[j["name"]] = (j["id"], 0)
+            else:
+                files[j["name"]] = (j["id"], j["size"], None, j["lastModifiedDateTime"][:19])
+        return files, folders
+
+    def list_files_map(self, drive, parent):
+        return self.list_children_maps(drive, parent)[0]
+
+    def list_folders(self, drive_id, parent_id="root"):
+        return [(j["name"], j["id"]) for j in self.children(parent_id) if "folder" in j]
+
+    def set_file_times(self, drive, item_id, fsi):
+        p = self._path(item_id)
+        mt = (fsi or {}).get("lastModifiedDateTime")
+        if mt:
+            t = _ts(mt)
+            os.utime(p, (t, t))
+        return LocalResponse(200, self._item(item_id, os.path.basename(p), os.stat(p), False))
+
+    def copy_item(self, drive, item_id, parent_id, name):
+        new_id = self._id(parent_id, _clean(name))
+        part = self._path(new_id) + PART_SUFFIX
+        shutil.copyfile(self._path(item_id), part)
+        os.replace(part, self._path(new_id))
+        return new_id
+
+    def delete_items(self, drive, ids):
+        """{item_id: status} like the $batch DELETE answers: 204, 404 or 500."""
+        out = {}
+        for item_id in ids:
+            p = self._path(item_id)
+            try:
+                if os.path.isdir(p):
+                    shutil.rmtree(p)
+                else:
+                    os.remove(p)
+                out[item_id] = 204
+            except FileNotFoundError:
+                out[item_id] = 404
+            except OSError:
+                out[item_id] = 500
+        return out
+
+    # destination: uploads
+    def _done(self, item_id, part, fsi):
+        final = self._path(item_id)
+        os.replace(part, final)
+        if fsi:
+            return self.set_file_times(None, item_id, fsi)
+        return LocalResponse(201, self._item(item_id, os.path.basename(final), os.stat(final), False))
+
+    def put_small(self, parent_id, name, data):
+        item_id = self._id(parent_id, _clean(name))
+        part = self._path(item_id) + PART_SUFFIX
+        with open(part, "wb") as f:
+            f.write(getattr(data, "view", data))
+        return self._done(item_id, part, None)
+
+    def create_upload_session(self, parent_id, name, fsi=None):
+        url = f"{self.drive_id}#upload-{next(self._seq)}"
+        with self._lk:
+            self._sessions[url] = [parent_id, _clean(name), fsi, 0]
+        return url
+
+    def session_status(self, url):
+        with self._lk:
+            ses = self._sessions.get(url)
+        return None if ses is None else {"nextExpectedRanges": [f"{ses[3]}-"]}
+
+    def session_put(self, url, chunk, start, total):
+        with self._lk:
+            ses = self._sessions.get(url)
+        if ses is None:
+            return LocalResponse(404, {"error": "upload session not found"})
+        parent_id, name, fsi, _ = ses
+        item_id = self._id(parent_id, name)
+        part = self._path(item_id) + PART_SUFFIX
+        # the first range allocates the whole file, so later ones never grow it
+        fd = os.open(part, os.O_RDWR | os.O_CREAT | (os.O_TRUNC if start == 0 else 0) | getattr(os, "O_BINARY", 0))
+        try:
+            if start == 0 and total:
+                if hasattr(os, "posix_fallocate"):
+                    try: os.posix_fallocate(fd, 0, total)
+                    except OSError: os.ftruncate(fd, total)
+                else:
+                    os.ftruncate(fd, total)
+            _pwrite(fd, getattr(chunk, "view", chunk), start)
+        finally:
+            os.close(fd)
+        end = start + len(chunk)
+        if end < total:
+            ses[3] = end
+            return LocalResponse(202, {"nextExpectedRanges": [f"{end}-"]})
+        with self._lk:
+            self._sessions.pop(url, None)
+        return self._done(item_id, part, fsi)
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+from collections import OrderedDict
+from threading import Lock
+
+from .local_drive import MmapChunk
+
+__all__ = ["ChunkSpool"]
+
+
+def _key(item_id, etag):
+    return hashlib.sha1(f"{item_id}\0{etag or ''}".encode("utf-8")).hexdigest()[:24]
+
+
+class ChunkSpool:
+    """Disk cache of downloaded source ranges, so a retry doesn't download again.
+
+    Entries are keyed by (item id, eTag, start, length): a changed source
+    has a new eTag and never sees old bytes. Each range is one file under
+    `root` (<key>.<start>.<length>); hits come back as mmap slices
+    (MmapChunk), misses are stored by put(). The total is capped at
+    max_bytes and the least recently used ranges go first. drop() forgets a
+    file once every destination has it. Entries left from an earlier run
+    are picked up at start, oldest first, so a resumed job reuses them.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        os.makedirs(root, exist_ok=True)
+        self._lk = Lock()
+        self._lru = OrderedDict()   # file name -> size
+        self.bytes = 0
+        self.hits = self.misses = self.evicted = 0
+        self.bytes_saved = 0
+        ents = []
+        for e in os.scandir(root):
+            if e.is_file() and not e.name.endswith(".tmp"):
+                st = e.stat()
+                ents.append((st.st_mtime, e.name, st.st_size))
+            elif e.name.endswith(".tmp"):
+                try: os.remove(e.path)
+                except OSError: pass
+        for _, name, size in sorted(ents):
+            self._lru[name] = size
+            self.bytes += size
+        self._evict()
+
+    def get(self, item_id, etag, start, length):
+        name = f"{_key(item_id, etag)}.{start}.{length}"
+        with self._lk:
+            if name not in self._lru:
+                self.misses += 1
+                return None
+            self._lru.move_to_end(name)
+        try:
+            with open(os.path.join(self.root, name), "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            with self._lk:
+                self.bytes -= self._lru.pop(name, 0)
+                self.misses += 1
+            return None
+        if len(mm) != length:
+            with self._lk:
+                self.misses += 1
+            return None
+        with self._lk:
+            self.hits += 1
+            self.bytes_saved += length
+        return MmapChunk(memoryview(mm))
+
+    def put(self, item_id, etag, start, data):
+        length = len(data)
+        if not length or length > self.max_bytes:
+            return
+        name = f"{_key(item_id, etag)}.{start}.{length}"
+        path = os.path.join(self.root, name)
+        tmp = f"{path}.{os.getpid()}.{id(data):x}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(getattr(data, "view", data))
+            os.replace(tmp, path)
+        except OSError:
+            try: os.remove(tmp)
+            except OSError: pass
+            return  # a full disk costs the cache, not the copy
+        with self._lk:
+            self.bytes += length - self._lru.pop(name, 0)
+            self._lru[name] = length
+            self._evict()
+
+    def drop(self, item_id, etag):
+        prefix = f"{_key(item_id, etag)}."
+        with self._lk:
+            names = [n for n in self._lru if n.startswith(prefix)]
+            for n in names:
+                self.bytes -= self._lru.pop(n)
+        for n in names:
+            try: os.remove(os.path.join(self.root, n))
+            except OSError: pass
+
+    def _evict(self):
+        # under self._lk
+        while self.bytes > self.max_bytes and self._lru:
+            name, size = self._lru.popitem(last=False)
+            self.bytes -= size
+            self.evicted += 1
+            try: os.remove(os.path.join(self.root, name))
+            except OSError: pass  # still mapped (Windows); indexed again at the next start
+
+    def stats(self):
+        with self._lk:
+            return {"spool_hits": self.hits, "spool_misses": self.misses, "spool_bytes": self.bytes,
+                    "spool_saved_bytes": self.bytes_saved, "spool_evicted": self.evicted}
@@ -1,32 +1,117 @@
 from __future__ import annotations
 
 import json
+from contextlib import nullcontext
 from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
-from threading import BoundedSemaphore
-from graph_client.graph_common import GRAPH, _enc
+from threading import BoundedSemaphore, Lock
+from graph_client.graph_common import GRAPH, _enc, _clean, _qxh, _fsi, _mtime, _item_rec
+from http_utils.retry_policy import RetryError
+from graph_client.local_drive import LocalDrive, LocalResponse, is_local
+
+LEDGER_DONE = "d"   # copied (files) / whole subtree finished (folders)
+LEDGER_SKIP = "s"   # destination already matched
+LEDGER_FAIL = "f"   # copy failed; retried on the next run
+
+_NOSPAN = nullcontext()
+
+
+def _tkey(item_id, k):
+    # ledger key of a file at destination k of a fan-out job; DEST keeps the plain id
+    return f"{item_id}@{k}" if k else item_id
+
+
+class _Session:
+    """One destination's upload session while a file fans out."""
+    __slots__ = ("drive", "parent", "url", "sent", "pst")
+
+    def __init__(self, drive, parent, url):
+        self.drive = drive
+        self.parent = parent
+        self.url = url
+        self.sent = 0
+        self.pst = None
+
+
+SKIP_MODES = ("hash", "mtime")
+
+
+def skip_reason(src_size, src_hash, ex, src_mtime=None, mode="hash"):
+    """Why the destination copy `ex` (id, size, hash, mtime) can be kept, or None to copy.
+    Shared by the copy pass, the dry-run planner and the audit.
+
+    mode "hash": size plus quickXorHash, size only when neither side has a hash.
+    mode "mtime": size plus fileSystemInfo.lastModifiedDateTime (uploads copy
+    the source's onto the destination); equal hashes still count, differing
+    ones always copy, and there is no size-only fallback.
+    """
+    if not ex:
+        return None
+    _, dst_size, dst_hash = ex[:3]
+    same_size = (dst_size == src_size)
+    hashes_known_and_equal = bool(src_hash) and bool(dst_hash) and (src_hash == dst_hash)
+    hashes_both_missing = (not src_hash) and (not dst_hash)
+    if mode == "mtime":
+        if not same_size or (src_hash and dst_hash and not hashes_known_and_equal):
+            return None
+        dst_mtime = ex[3] if len(ex) > 3 else None
+        if src_mtime and dst_mtime and src_mtime == dst_mtime:
+            return "size + mtime"
+        return "size + hash" if hashes_known_and_equal else None
+    if same_size and (hashes_known_and_equal or hashes_both_missing):
+        return "size + hash" if hashes_known_and_equal else "size only"
+    return None
+
 
 class TransferManager:
     def __init__(self, http, drive_client, *,
                  chunk=8*1024*1024, min_chunk=1*1024*1024, max_single=4*1024*1024,
-                 get_cursor=None, set_cursor=None, clear_cursor=None, should_cancel=None,
+                 ledger_get=None, ledger_put=None, should_cancel=None,
                  on_discover_file=None, on_file_done=None,
-                 start_concurrency=2, max_concurrency=4, min_concurrency=1):
+                 start_concurrency=2, max_concurrency=4, min_concurrency=1,
+                 budget=None):
 
         self.RH = http
         self.drive = drive_client
+        # "local:/path" drives (graph_client.local_drive), one LocalDrive each
+        self._locals = {}
+        self._locals_lk = Lock()
         self.CHUNK = int(chunk)
         self.MIN_CHUNK = int(min_chunk)
         self.MAX_SINGLE = int(max_single)
 
-        # resume/cancel
-        self.get_cursor = get_cursor or (lambda folder_id: None)
-        self.set_cursor = set_cursor or (lambda folder_id, name: None)
-        self.clear_cursor = clear_cursor or (lambda folder_id: None)
+        # resume/cancel: completion ledger keyed by source item id
+        #   ledger_get(item_id) -> (etag, status[, dst]) | None ; status LEDGER_DONE/SKIP/FAIL
+        #   dst: destination (id, size, hash, mtime) as the copy/skip left it; the audit checks against it
+        self.ledger_get = ledger_get or (lambda item_id: None)
+        self.ledger_put = ledger_put or (lambda item_id, etag, status, dst=None: None)
         self.should_cancel = should_cancel or (lambda: False)
+        self._failed_dirs = set()
+
+        # DELETE_EXTRAS: destination-only items are collected during the walk
+        # and removed afterwards by reconcile_extras()
+        #   extra_put(item_id, path, kind, size, target=0) ; extra_done(item_id)
+        self.extras = {}
+        self.extra_put = lambda item_id, path, kind, size, target=0: self.extras.__setitem__(item_id, [path, kind, size])
+        self.extra_done = lambda item_id: self.extras.pop(item_id, None)
 
         # stats hooks
         self.on_discover_file = on_discover_file or (lambda size=0: None)
         self.on_file_done     = on_file_done     or (lambda size=0: None)
+        # profiling hook: span(name) -> context manager timing one step (ui.profiler)
+        self.span = lambda name: _NOSPAN
+        # optional spool.ChunkSpool: downloaded ranges on disk, so retries and
+        # restarted sessions (this run or the next) don't download them again
+        self.spool = None
+        # content dedup: (dest drive, size, quickXorHash) -> a destination item with
+        # that content; a later duplicate becomes a server-side copy of it
+        self.DEDUP = False
+        self.DEDUP_MIN = 256 * 1024     # below this a plain upload is as cheap as copy + monitor
+        self._dedup = {}
+        self._dedup_lk = Lock()
+        self.dedup_stats = [0, 0, 0]    # copies, bytes not transferred, copies that fell back
+        # fan-out jobs: per destination [copied, bytes, skipped, failed] (index = target)
+        self.target_stats = []
+        self._tstats_lk = Lock()
 
         # concurrency controls
         self._conc_min = int(min_concurrency)
@@ -41,10 +126,34 @@ class TransferManager:
         for _ in range(self._conc_max - self._target_capacity):
             self._sem.acquire()
 
+        # optional cross-job budget (acquire/release), shared by scheduled jobs
+        self._budget = budget
+
+        # include/exclude rules (graph_client.filters.ItemFilter), set by controller
+        self.filter = None
+
         # DELETE_EXTRAS is set by controller (optional)
         if not hasattr(self, "DELETE_EXTRAS"):
             self.DELETE_EXTRAS = False
 
+        # skip_reason() mode: "hash" (size + quickXorHash) or "mtime" (size + lastModifiedDateTime)
+        self.SKIP_MODE = "hash"
+        # copy the source's fileSystemInfo timestamps onto uploads ("mtime" mode relies on it).
+        # Upload sessions carry them for free; a small upload needs a PATCH, which is only
+        # sent in "mtime" mode, queued and 20 per $batch (_queue_times / _flush_times)
+        self.KEEP_TIMES = True
+        self._times_q = []
+        self._times_lk = Lock()
+        # [SKIP] log volume: "all", "sample" (1 in SKIP_SAMPLE) or "quiet"
+        self.SKIP_LOG = "all"
+        self.SKIP_SAMPLE = 1000
+        # mirror_folders_only: folders queued before a $batch create round
+        self.FOLDER_FLUSH = 200
+        # reconcile_extras: concurrent $batch DELETE requests
+        self.DELETE_WORKERS = 4
+        self._skip_lk = Lock()
+        self._skips = 0
+
     # AIMD hooks 
     def concurrency(self) -> int:
         # report target capacity (what AIMD is steering)
@@ -70,26 +179,186 @@ class TransferManager:
             self._target_capacity -= 1
         return ok
 
+    def set_concurrency(self, n) -> int:
+        """Move the target capacity to n (clamped to min/max); returns where it ended up."""
+        n = max(self._conc_min, min(int(n), self._conc_max))
+        while self._target_capacity < n and self.scale_up():
+            pass
+        while self._target_capacity > n and self.scale_down():
+            pass
+        return self._target_capacity
+
     def shutdown(self):
         self._executor.shutdown(wait=False, cancel_futures=False)
 
+    def _log_skip(self, log, msg):
+        if self.SKIP_LOG == "all":
+            log(msg)
+            return
+        with self._skip_lk:
+            self._skips += 1
+            n = self._skips
+        if self.SKIP_LOG == "sample" and (n - 1) % max(1, self.SKIP_SAMPLE) == 0:
+            log(f"{msg}  [sampled, {n:,} skipped so far]")
+
+    def _dc(self, drive):
+        """What serves a drive id: the DriveClient for Graph, a LocalDrive for "local:/path"."""
+        if not is_local(drive):
+            return self.drive
+        st = self._locals.get(drive)
+        if st is None:
+            with self._locals_lk:
+                st = self._locals.setdefault(drive, LocalDrive(drive))
+        return st
+
+    def _list(self, url):
+        # one page of a children listing (_children_url); local drives answer in one page
+        if isinstance(url, tuple):
+            store, item_id = url
+            return LocalResponse(200, {"value": store.children(item_id)})
+        return self.RH.get(url)
+
+    def _children_url(self, drive, item_id, select):
+        # listing of one source folder; mtime fields only when a filter needs them
+        if is_local(drive):
+            return self._dc(drive), item_id
+        if self.filter is not None and self.filter.needs_mtime:
+            select += ",lastModifiedDateTime" + ("" if "fileSystemInfo" in select else ",fileSystemInfo")
+        return (f"{GRAPH}/drives/{drive}/root/children?$top=200&$select={select}&$orderby=name"
+                if item_id == "root"
+                else f"{GRAPH}/drives/{drive}/items/{item_id}/children?$top=200&$select={select}&$orderby=name")
+
     # ---------- schedule gated copy ----------
-    def _submit_copy(self, *, dest_drive, did, nm, src_drive, item_id, src_size, sid, path, log):
+    def _ledger_ok(self, item_id, etag):
+        rec = self.ledger_get(item_id)
+        return bool(rec) and rec[1] in (LEDGER_DONE, LEDGER_SKIP) and rec[0] == etag
+
+    def _target_note(self, k, col, size=0):
+        if not self.target_stats:
+            return
+        with self._tstats_lk:
+            row = self.target_stats[k]
+            row[col] += 1
+            if col == 0:
+                row[1] += size
+
+    def reset_dedup(self):
+        # per job; shard runs of one job keep adding to the same index
+        with self._dedup_lk:
+            self._dedup = {}
+            self.dedup_stats = [0, 0, 0]
+
+    def _dedup_note(self, drive, size, src_hash, dst):
+        # dst: (id, ...) of a destination file known to hold the source's content
+        if not self.DEDUP or not src_hash or size < self.DEDUP_MIN or not dst:
+            return
+        with self._dedup_lk:
+            self._dedup.setdefault((drive, size, src_hash), dst[0])
+
+    def _dedup_copy(self, drive, parent_id, nm, size, src_hash, fsi, rel, log):
+        """Place a file by server-side copy of a destination item with the same content.
+
+        Returns the new item's (id, size, hash, mtime) record, or None when
+        there is nothing to copy from or the copy failed (the caller uploads
+        as usual; a failed copy source is forgotten).
+        """
+        key = (drive, size, src_hash)
+        with self._dedup_lk:
+            src_id = self._dedup.get(key)
+        if src_id is None:
+            return None
+        dc = self._dc(drive)
+        try:
+            with self.span("copy.dedup"):
+                new_id = dc.copy_item(drive, src_id, parent_id, nm)
+                if fsi and self.KEEP_TIMES:
+                    # a copy keeps the other file's timestamps
+                    rec = _item_rec(dc.set_file_times(drive, new_id, fsi))
+                else:
+                    rec = dc.try_get_dest_file_fast(drive, parent_id, nm)
+        except Exception as e:
+            with self._dedup_lk:
+                if self._dedup.get(key) == src_id:
+                    del self._dedup[key]
+                self.dedup_stats[2] += 1
+            log(f"  [DEDUP] {rel}: server copy failed, uploading instead -> {e}")
+            return None
+        with self._dedup_lk:
+            self.dedup_stats[0] += 1
+            self.dedup_stats[1] += size
+        return rec or (new_id, size, None, None)
+
+    def _submit_copy(self, *, targets, nm, src_drive, item_id, src_size, etag, sid, path, log, fsi=None,
+                     src_hash=None):
+        # targets: [(k, dest_drive, did)]; k is the destination's index in a fan-out job (0 = DEST)
         # acquire a capacity permit before starting
-        self._sem.acquire()
+        with self.span("files.sem_wait"):
+            self._sem.acquire()
+            if self._budget is not None:
+                self._budget.acquire()
+        rel = f"{path+'/'+nm if path else nm}"
+        dedup = self.DEDUP and bool(src_hash) and src_size >= self.DEDUP_MIN
 
         def _job():
             try:
-                self.upload_stream_replace(dest_drive, did, nm, src_drive, item_id, src_size)
-                log(f"  [COPY] {(path+'/'+nm if path else nm)} ({src_size} bytes)")
-                try: self.set_cursor(sid, nm)
-                except Exception: pass
-                try: self.on_file_done(src_size)
-                except Exception: pass
+                # duplicates of content already at a destination: server-side copy there;
+                # the rest (and any copy that fails) are streamed from the source
+                res = [None] * len(targets)
+                recs = {}
+                todo = list(range(len(targets)))
+                if dedup:
+                    todo = []
+                    for i, (_, d, p) in enumerate(targets):
+                        rec = self._dedup_copy(d, p, nm, src_size, src_hash, fsi, rel, log)
+                        if rec is None:
+                            todo.append(i)
+                        else:
+                            recs[i] = rec
+                if todo:
+                    with self.span("copy"):
+                        up = self.upload_stream_fanout([targets[i][1:] for i in todo], nm, src_drive, item_id,
+                                                       src_size, fsi=fsi, etag=etag)
+                    for i, r in zip(todo, up):
+                        res[i] = r
+                ok = True
+                for i, ((k, d, _), r) in enumerate(zip(targets, res)):
+                    tag = f" -> dest {k + 1}" if self.target_stats else ""
+                    if isinstance(r, Exception):
+                        ok = False
+                        log(f"  [FAIL] {rel}{tag} -> {r}")
+                        self._target_note(k, 3)
+                        try: self.ledger_put(_tkey(item_id, k), etag, LEDGER_FAIL)
+                        except Exception: pass
+                        continue
+                    if i in recs:
+                        rec = recs[i]
+                        log(f"  [DEDUP] {rel}{tag} ({src_size} bytes, server copy)")
+                    else:
+                        rec = _item_rec(r)
+                        log(f"  [COPY] {rel}{tag} ({src_size} bytes)")
+                        if dedup:
+                            self._dedup_note(d, src_size, src_hash, rec)
+                        if rec and fsi and src_size <= self.MAX_SINGLE and self._queue_times(d, rec, fsi, item_id, k, etag, sid, rel):
+                            self._target_note(k, 0, src_size)
+                            continue  # recorded once its timestamps are set
+                    self._target_note(k, 0, src_size)
+                    try: self.ledger_put(_tkey(item_id, k), etag, LEDGER_DONE, rec)
+                    except Exception: pass
+                if ok:
+                    try: self.on_file_done(src_size)
+                    except Exception: pass
+                else:
+                    self._failed_dirs.add(sid)
             except Exception as e:
-                log(f"  [FAIL] {(path+'/'+nm if path else nm)} -> {e}")
+                log(f"  [FAIL] {rel} -> {e}")
+                self._failed_dirs.add(sid)
+                for k, _, _ in targets:
+                    try: self.ledger_put(_tkey(item_id, k), etag, LEDGER_FAIL)
+                    except Exception: pass
             finally:
                 # always release so another job can start
+                if self._budget is not None:
+                    self._budget.release()
                 try: self._sem.release()
                 except ValueError: pass
 
@@ -97,45 +366,50 @@ class TransferManager:
 
     # downloads/uploads
     def _download_entire(self, drive, item_id):
+        if is_local(drive):
+            return self._dc(drive).read_all(item_id)
         r = self.RH.get(f"{GRAPH}/drives/{drive}/items/{item_id}/content")
         r.raise_for_status()
         return r.content
 
     def _download_range(self, drive, item_id, start, length):
-        attempts = 0
-        while attempts < 8:
-            try_len = max(self.MIN_CHUNK, min(length, self.CHUNK >> attempts))
-            end = start + try_len - 1
-            r = self.RH.get(
-                f"{GRAPH}/drives/{drive}/items/{item_id}/content",
-                headers={"Range": f"bytes={start}-{end}"}
-            )
-            if r.status_code in (200, 206):
-                return r.content
-            attempts += 1
-        if start == 0 and length <= self.MAX_SINGLE:
-            r = self.RH.get(f"{GRAPH}/drives/{drive}/items/{item_id}/content")
-            if r.status_code == 200:
-                return r.content
-        raise RuntimeError(f"range GET failed: {item_id} bytes {start}-{start+length-1}")
+        # one "download" op: RobustHTTP retries it until the policy's deadline
+        if is_local(drive):
+            return self._dc(drive).read_range(item_id, start, length)  # mmap slice, no copy
+        r = self.RH.get(
+            f"{GRAPH}/drives/{drive}/items/{item_id}/content",
+            headers={"Range": f"bytes={start}-{start+length-1}"}, op="download",
+        )
+        if r.status_code not in (200, 206):
+            raise RuntimeError(f"range GET failed: {item_id} bytes {start}-{start+length-1} (HTTP {r.status_code})")
+        return r.content
 
     def _upload_small_replace(self, dest_drive, dest_parent_id, name, content_bytes):
+        if is_local(dest_drive):
+            return self._dc(dest_drive).put_small(dest_parent_id, name, content_bytes)
         url = f"{GRAPH}/drives/{dest_drive}/items/{dest_parent_id}:/{_enc(name)}:/content"
         r = self.RH.put(url, headers={"Content-Type": "application/octet-stream"}, data=content_bytes)
         if r.status_code not in (200, 201, 202):
             r.raise_for_status()
         return r
 
-    def _create_upload_session(self, dest_drive, dest_parent_id, name):
+    def _create_upload_session(self, dest_drive, dest_parent_id, name, fsi=None):
+        # timestamps ride along as item properties; no PATCH needed afterwards
+        if is_local(dest_drive):
+            return self._dc(dest_drive).create_upload_session(dest_parent_id, name, fsi)
+        body = ({"item": {"@microsoft.graph.conflictBehavior": "replace", "fileSystemInfo": fsi}} if fsi
+                else {"@microsoft.graph.conflictBehavior": "replace"})
         r = self.RH.post(
             f"{GRAPH}/drives/{dest_drive}/items/{dest_parent_id}:/{_enc(name)}:/createUploadSession",
             headers={"Content-Type": "application/json"},
-            data=json.dumps({"@microsoft.graph.conflictBehavior": "replace"})
+            data=json.dumps(body)
         )
         r.raise_for_status()
         return r.json()["uploadUrl"]
 
     def _get_session_status(self, upload_url):
+        if is_local(upload_url):
+            return self._dc(upload_url.split("#", 1)[0]).session_status(upload_url)
         r = self.RH.get(upload_url, ok_extra=(404, 410))
         if r.status_code in (404, 410):
             return None
@@ -152,194 +426,661 @@ class TransferManager:
         except Exception:
             return None
 
-    def _upload_session_put(self, url, chunk, start, total, max_tries=12):
+    def _upload_session_put(self, url, chunk, start, total):
+        if is_local(url):
+            return self._dc(url.split("#", 1)[0]).session_put(url, chunk, start, total)
         hdr = {"Content-Length": str(len(chunk)), "Content-Range": f"bytes {start}-{start+len(chunk)-1}/{total}"}
-        return self.RH.put(url, headers=hdr, data=chunk, max_tries=max_tries)
+        return self.RH.put(url, headers=hdr, data=chunk, op="upload")
+
+    def upload_stream_replace(self, dest_drive, dest_parent_id, name, src_drive, src_item_id, total_size, fsi=None,
+                              etag=None):
+        # fsi: source fileSystemInfo timestamps to carry over (KEEP_TIMES)
+        # etag: the source version; with a spool, downloaded ranges are kept under it
+        r = self.upload_stream_fanout([(dest_drive, dest_parent_id)], name, src_drive, src_item_id, total_size,
+                                      fsi, etag)[0]
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+    def upload_stream_fanout(self, targets, name, src_drive, src_item_id, total_size, fsi=None, etag=None):
+        """Copy one source file into every (dest_drive, dest_parent_id) of targets, reading it once.
+
+        Each downloaded chunk is PUT into every destination's upload session
+        from the same buffer; each session keeps its own offset, so one that
+        falls back (expired session, partial accept) has the missing range
+        fetched again while the others stay ahead. Returns one entry per
+        target: the response carrying the final driveItem (None if Graph
+        didn't send one) or the exception that target failed with; a failing
+        destination never stops the others.
+        """
+        out = self._fanout(targets, name, src_drive, src_item_id, total_size, fsi if self.KEEP_TIMES else None, etag)
+        if self.spool is not None and etag and not any(isinstance(r, Exception) for r in out):
+            self.spool.drop(src_item_id, etag)  # everyone has it; keep the room for files that failed
+        return out
+
+    def _source_range(self, drive, item_id, etag, start, length, whole=False):
+        # one source range; from the spool when an earlier try (or run) already downloaded it
+        sp = self.spool if etag and not is_local(drive) else None
+        if sp is not None:
+            hit = sp.get(item_id, etag, start, length)
+            if hit is not None:
+                return hit
+        with self.span("copy.download"):
+            data = (self._download_entire(drive, item_id) if whole
+                    else self._download_range(drive, item_id, start, length))
+        if sp is not None:
+            with self.span("copy.spool"):
+                sp.put(item_id, etag, start, data)
+        return data
 
-    def upload_stream_replace(self, dest_drive, dest_parent_id, name, src_drive, src_item_id, total_size):
+    def _fanout(self, targets, name, src_drive, src_item_id, total_size, fsi, etag):
+        out = [None] * len(targets)
         if total_size <= self.MAX_SINGLE:
-            blob = self._download_entire(src_drive, src_item_id)
-            return self._upload_small_replace(dest_drive, dest_parent_id, name, blob)
+            blob = self._source_range(src_drive, src_item_id, etag, 0, total_size, whole=True)
+            for k, (dest_drive, dest_parent_id) in enumerate(targets):
+                try:
+                    out[k] = self._put_small(dest_drive, dest_parent_id, name, blob, fsi)
+                except Exception as e:
+                    out[k] = e
+            return out
+
+        live = {}
+        for k, (dest_drive, dest_parent_id) in enumerate(targets):
+            try:
+                live[k] = self._open_session(dest_drive, dest_parent_id, name, fsi)
+            except Exception as e:
+                out[k] = e
+
+        # source side: the range GETs retry on their own, this covers the loop around them
+        policy = self.RH.policy
+        dst = policy.begin("session")
+        while live:
+            cur = min(ses.sent for ses in live.values())
+            try:
+                chunk = self._source_range(src_drive, src_item_id, etag, cur, min(self.CHUNK, total_size - cur))
+                dst.progress()
+            except Exception as e:
+                why = "budget" if isinstance(e, RetryError) and e.reason in ("budget", "auth") else dst.retry("chunk")
+                if why is None:
+                    continue
+                # the source failed: every destination still open fails with it
+                err = e if isinstance(e, RetryError) else policy.give_up(dst, why, f"download of {name!r}: {e}")
+                for k in live:
+                    out[k] = err
+                break
+            for k, ses in list(live.items()):
+                if ses.sent != cur:
+                    continue  # ahead of this chunk
+                try:
+                    r = self._session_step(ses, chunk, cur, total_size, name, fsi)
+                except Exception as e:
+                    out[k] = e
+                    del live[k]
+                    continue
+                if r is not None or ses.sent >= total_size:
+                    out[k] = r
+                    del live[k]
+        return out
+
+    def _put_small(self, dest_drive, dest_parent_id, name, blob, fsi):
+        with self.span("copy.upload"):
+            r = self._upload_small_replace(dest_drive, dest_parent_id, name, blob)
+        # a simple PUT can't carry item properties; a local file takes its times right away,
+        # a Graph one is PATCHed later in a $batch (_queue_times)
+        iid = (r.json() or {}).get("id") if fsi and is_local(dest_drive) and r.status_code in (200, 201) else None
+        if iid:
+            r = self._dc(dest_drive).set_file_times(dest_drive, iid, fsi)
+        return r
 
-        upload_url = self._create_upload_session(dest_drive, dest_parent_id, name)
-        sent = 0
+    def _queue_times(self, drive, rec, fsi, item_id, k, etag, sid, rel):
+        """Queue a small upload's timestamps for _flush_times(); False when none are needed.
 
-        status = self._get_session_status(upload_url)
+        Only "mtime" mode reads them back, so a hash-mode job doesn't spend a
+        request per small file on them. The file's ledger record is written
+        when its PATCH is answered: a run stopped before that probes the
+        file again instead of trusting the upload time.
+        """
+        if not self.KEEP_TIMES or self.SKIP_MODE != "mtime" or is_local(drive):
+            return False
+        with self._times_lk:
+            self._times_q.append((drive, rec, fsi, item_id, k, etag, sid, rel))
+        return True
+
+    def _flush_times(self, log):
+        # the walk calls this once a folder's copies are done, before its AFTER frame is decided
+        with self._times_lk:
+            todo, self._times_q = self._times_q, []
+        by_drive = {}
+        for e in todo:
+            by_drive.setdefault(e[0], []).append(e)
+        for drive, ents in by_drive.items():
+            for n in range(0, len(ents), 20):
+                part = ents[n:n + 20]
+                try:
+                    with self.span("copy.times"):
+                        res = self._dc(drive).set_items_times(drive, [(e[1][0], e[2]) for e in part])
+                except Exception as ex:
+                    log(f"  [TIMES] $batch failed -> {ex}")
+                    res = {}
+                for _, rec, fsi, item_id, k, etag, sid, rel in part:
+                    st, body = res.get(rec[0], (None, None))
+                    if st in (200, 201):
+                        self.ledger_put(_tkey(item_id, k), etag, LEDGER_DONE,
+                                        (rec[0], rec[1], rec[2], _mtime(body or {}) or _mtime({"fileSystemInfo": fsi})))
+                        continue
+                    # uploaded, but with the wrong times: the next run copies it again
+                    log(f"  [FAIL] {rel} (timestamps, HTTP {st})")
+                    self._failed_dirs.add(sid)
+                    try: self.ledger_put(_tkey(item_id, k), etag, LEDGER_FAIL)
+                    except Exception: pass
+
+    def _open_session(self, dest_drive, dest_parent_id, name, fsi):
+        with self.span("copy.session"):
+            ses = _Session(dest_drive, dest_parent_id, self._create_upload_session(dest_drive, dest_parent_id, name, fsi))
+            status = self._get_session_status(ses.url)
         if status:
             nxt = self._parse_next_start(status)
             if nxt is not None:
-                sent = max(sent, nxt)
+                ses.sent = max(ses.sent, nxt)
+        # the chunk PUTs retry on their own; this covers the session around them
+        # and gives up once it makes no progress within its deadline
+        ses.pst = self.RH.policy.begin("session")
+        return ses
 
-        while sent < total_size:
-            try:
-                chunk = self._download_range(src_drive, src_item_id, sent, min(self.CHUNK, total_size - sent))
-                resp = self._upload_session_put(upload_url, chunk, sent, total_size, max_tries=12)
-
-                if resp.status_code in (200, 201):
-                    return resp
-                if resp.status_code == 202:
-                    try:
-                        st = resp.json()
-                    except Exception:
-                        st = None
-                    nxt = self._parse_next_start(st)
-                    if nxt is not None and nxt >= sent:
-                        sent = nxt
-                    else:
-                        sent += len(chunk)
-                    continue
-                if resp.status_code in (404, 410):
-                    upload_url = self._create_upload_session(dest_drive, dest_parent_id, name)
-                    sent = 0
-                    continue
-                resp.raise_for_status()
+    def _session_step(self, ses, chunk, start, total_size, name, fsi):
+        """PUT one chunk into a session; the final response when the file is complete, else None."""
+        span = self.span
+        try:
+            with span("copy.upload"):
+                resp = self._upload_session_put(ses.url, chunk, start, total_size)
 
-            except Exception:
-                st = self._get_session_status(upload_url)
-                if st is None:
-                    upload_url = self._create_upload_session(dest_drive, dest_parent_id, name)
-                    sent = 0
+            if resp.status_code in (200, 201):
+                return resp
+            if resp.status_code == 202:
+                try:
+                    st = resp.json()
+                except Exception:
+                    st = None
+                nxt = self._parse_next_start(st)
+                if nxt is not None and nxt >= start:
+                    ses.sent = nxt
                 else:
-                    nxt = self._parse_next_start(st)
-                    if nxt is not None and nxt >= sent:
-                        sent = nxt
+                    ses.sent = start + len(chunk)
+                ses.pst.progress()
+                return None
+            if resp.status_code in (404, 410):
+                ses.url = self._create_upload_session(ses.drive, ses.parent, name, fsi)
+                ses.sent = 0
+                return None
+            resp.raise_for_status()
+
+        except Exception as e:
+            # budget empty / token refused: another round can't help
+            if isinstance(e, RetryError) and e.reason in ("budget", "auth"):
+                raise
+            why = ses.pst.retry("chunk")
+            if why:
+                if isinstance(e, RetryError):
+                    raise  # already counted where it gave up
+                raise self.RH.policy.give_up(ses.pst, why, f"upload session for {name!r}: {e}") from e
+            with span("copy.session"):
+                st = self._get_session_status(ses.url)
+            if st is None:
+                with span("copy.session"):
+                    ses.url = self._create_upload_session(ses.drive, ses.parent, name, fsi)
+                ses.sent = 0
+            else:
+                nxt = self._parse_next_start(st)
+                if nxt is not None and nxt >= ses.sent:
+                    ses.sent = nxt
+        return None
 
     # mirroring 
-    def mirror_files_exact(self, *, src_drive, src_parent="root", dest_drive, dest_parent, root_name, log):
-        if root_name:
-            dst_root = self.drive.ensure_folder_by_path(dest_drive, dest_parent, root_name)
-            base_path = root_name
-        else:
-            dst_root = dest_parent
-            base_path = ""
+    def _targets(self, dest_drive, dest_parent, root_name, extra_dests):
+        # [(k, dest_drive, root_id, base)]: DEST first, then every extra destination
+        out = []
+        for k, (drive, parent, root) in enumerate([(dest_drive, dest_parent, root_name), *(extra_dests or ())]):
+            if root:
+                out.append((k, drive, self._dc(drive).ensure_folder_by_path(drive, parent, root), root))
+            else:
+                out.append((k, drive, parent, ""))
+        return out
+
+    def mirror_files_exact(self, *, src_drive, src_parent="root", dest_drive, dest_parent, root_name, log,
+                           recursive=True, base_path=None, extra_dests=()):
+        # recursive=False: only the files directly under src_parent (sharded runs)
+        # extra_dests: more (drive, parent, root_name) targets; every file is read
+        # from the source once and uploaded to all of them (fan-out)
+        targets = self._targets(dest_drive, dest_parent, root_name, extra_dests)
+        fan = len(targets) > 1
+        self.target_stats = [[0, 0, 0, 0] for _ in targets] if fan else []
+        if base_path is None:
+            base_path = targets[0][3]
 
-        # frames: ("DIR", sid, did, path) and ("AFTER", parent_sid, child_name)
-        stack = [("DIR", (src_parent or "root"), dst_root, base_path)]
+        # frames: ("DIR", sid, dids, path) and ("AFTER", parent_sid, child_sid, child_etag)
+        # dids holds the folder's id at every target. AFTER pops once the child's
+        # whole subtree is finished; a subtree with no failures is recorded as
+        # done so a resumed run never lists it again
+        stack = [("DIR", (src_parent or "root"), tuple(t[2] for t in targets), base_path)]
+        self._failed_dirs = set()
 
         while stack:
             frame = stack.pop()
 
-            if isinstance(frame, tuple) and frame and frame[0] == "AFTER":
-                _, parent_sid, child_name = frame
-                self.set_cursor(parent_sid, child_name)
+            if frame[0] == "AFTER":
+                _, parent_sid, child_sid, child_etag = frame
+                if child_sid in self._failed_dirs:
+                    self._failed_dirs.add(parent_sid)
+                else:
+                    self.ledger_put(child_sid, child_etag, LEDGER_DONE)
                 continue
 
-            if frame and frame[0] == "DIR" and len(frame) == 4:
-                _, sid, did, path = frame
-            else:
-                sid, did, path = frame
+            _, sid, dids, path = frame
 
             if self.should_cancel():
                 return
 
             log(f"[DIR] {path or '/'}")
 
-            # DELETE_EXTRAS support
-            dest_files = self.drive.list_files_map(dest_drive, did) if self.DELETE_EXTRAS else {}
+            # DELETE_EXTRAS: whatever the source doesn't have is collected, not deleted here
+            dest_maps = []
+            if self.DELETE_EXTRAS:
+                with self.span("files.list_dest"):
+                    for (k, drive, _, _), did in zip(targets, dids):
+                        dest_maps.append(self._dc(drive).list_children_maps(drive, did))
+            seen = set()
+            flt = self.filter
 
-            last = self.get_cursor(sid)
-            url = (
-                f"{GRAPH}/drives/{src_drive}/root/children?$top=200&$select=id,name,folder,file,size,hashes&$orderby=name"
-                if (sid == "root")
-                else f"{GRAPH}/drives/{src_drive}/items/{sid}/children?$top=200&$select=id,name,folder,file,size,hashes&$orderby=name"
-            )
+            url = self._children_url(src_drive, sid, "id,name,eTag,folder,file,size,hashes,fileSystemInfo")
 
             folder_futs = []
 
             while url:
                 if self.should_cancel():
                     return
-                j = self.RH.get(url).json()
+                with self.span("files.list_src"):
+                    r = self._list(url)
+                with self.span("files.json"):
+                    j = r.json()
                 for ch in j.get("value", []):
                     nm = ch["name"]
-
-                    # resume fast
-                    if last is not None and nm <= last:
-                        if self.DELETE_EXTRAS:
-                            dest_files.pop(nm, None)
-                        continue
+                    etag = ch.get("eTag")
+                    if self.DELETE_EXTRAS:
+                        seen.add(nm.casefold()); seen.add(_clean(nm).casefold())
 
                     if "folder" in ch:
-                        ndid = self.drive.ensure_folder_by_path(dest_drive, did, nm)
-                        stack.append(("AFTER", sid, nm))
-                        stack.append(("DIR", ch["id"], ndid, f"{path+'/'+nm if path else nm}"))
+                        if not recursive:
+                            continue
+                        if flt is not None and not flt.want_dir(f"{path+'/'+nm if path else nm}", nm):
+                            continue
+                        # resume: finished subtree, no listing needed
+                        if self._ledger_ok(ch["id"], etag):
+                            continue
+                        with self.span("files.mkdir"):
+                            ndids = tuple(self._dc(t[1]).ensure_folder_by_path(t[1], did, nm) for t, did in zip(targets, dids))
+                        stack.append(("AFTER", sid, ch["id"], etag))
+                        stack.append(("DIR", ch["id"], ndids, f"{path+'/'+nm if path else nm}"))
                         continue
 
                     # file
                     src_size = ch.get("size", 0) or 0
-                    src_hash = (ch.get("hashes") or {}).get("quickXorHash")
+                    src_hash = _qxh(ch)
+                    if flt is not None and not flt.want_file(f"{path+'/'+nm if path else nm}", nm, src_size, ch):
+                        continue
 
                     #try: self.on_discover_file(sr _size)
                     try: self.on_discover_file(1) 
                     except Exception: pass
 
-                    ex = self.drive.try_get_dest_file_fast(dest_drive, did, nm)
-                    if ex:
-                        _, dst_size, dst_hash = ex
-                        same_size = (dst_size == src_size)
-                        hashes_known_and_equal = bool(src_hash) and bool(dst_hash) and (src_hash == dst_hash)
-                        hashes_both_missing = (not src_hash) and (not dst_hash)
-
-                        if same_size and (hashes_known_and_equal or hashes_both_missing):
-                            log(f"  [SKIP] {(path+'/'+nm if path else nm)} (size{' + hash' if hashes_known_and_equal else ' only'})")
-                            try: self.on_file_done(src_size)
-                            except Exception: pass
-                            if self.DELETE_EXTRAS:
-                                dest_files.pop(nm, None)
-                            self.set_cursor(sid, nm); last = nm
+                    # per target: resume (copied/skipped in an earlier run, unchanged
+                    # since -> no probe), else probe and skip a matching copy
+                    pending = []
+                    for (k, drive, _, _), did in zip(targets, dids):
+                        key = _tkey(ch["id"], k)
+                        rec = self.ledger_get(key)
+                        if rec and rec[1] in (LEDGER_DONE, LEDGER_SKIP) and rec[0] == etag:
+                            self._target_note(k, 2)
+                            if len(rec) > 2:
+                                self._dedup_note(drive, src_size, src_hash, rec[2])
+                            continue
+                        with self.span("files.probe"):
+                            ex = self._dc(drive).try_get_dest_file_fast(drive, did, nm)
+                        why = skip_reason(src_size, src_hash, ex, _mtime(ch), self.SKIP_MODE)
+                        if why:
+                            tag = f" -> dest {k + 1}" if fan else ""
+                            self._log_skip(log, f"  [SKIP] {(path+'/'+nm if path else nm)}{tag} ({why})")
+                            self._target_note(k, 2)
+                            with self.span("files.ledger"):
+                                self.ledger_put(key, etag, LEDGER_SKIP, ex)
+                            self._dedup_note(drive, src_size, src_hash, ex)
                             continue
+                        pending.append((k, drive, did))
+
+                    if not pending:
+                        try: self.on_file_done(src_size)
+                        except Exception: pass
+                        continue
 
                     fut = self._submit_copy(
-                        dest_drive=dest_drive, did=did, nm=nm,
-                        src_drive=src_drive, item_id=ch["id"], src_size=src_size,
-                        sid=sid, path=path, log=log
+                        targets=pending, nm=nm,
+                        src_drive=src_drive, item_id=ch["id"], src_size=src_size, etag=etag,
+                        sid=sid, path=path, log=log, fsi=_fsi(ch), src_hash=src_hash
                     )
                     folder_futs.append(fut)
-                    if self.DELETE_EXTRAS:
-                        dest_files.pop(nm, None)
 
                 url = j.get("@odata.nextLink")
 
             if folder_futs:
-                wait(folder_futs, return_when=FIRST_EXCEPTION)  # job logs handle exceptions
+                with self.span("files.folder_wait"):
+                    wait(folder_futs, return_when=FIRST_EXCEPTION)  # job logs handle exceptions
+            if self._times_q:
+                self._flush_times(log)
+
+            if self.DELETE_EXTRAS:
+                # seen has every source child, folders too, even when they aren't walked
+                # here (files-only shards), so the folder map is compared either way
+                for k, (dest_files, dest_dirs) in enumerate(dest_maps):
+                    self._collect_extras(dest_files, dest_dirs, seen, path, log, target=k)
+
+    def _collect_extras(self, dest_files, dest_dirs, seen, path, log, target=0):
+        # names compare case-insensitively like SharePoint does; a case-only
+        # difference is the same item (just overwritten), never an extra.
+        # Items an exclude rule matches are left alone at the destination.
+        for kind, entries in (("file", dest_files), ("folder", dest_dirs)):
+            for nm, ent in entries.items():
+                if nm.casefold() in seen:
+                    continue
+                rel = f"{path+'/'+nm if path else nm}"
+                if self.filter is not None and self.filter.excluded(rel, nm):
+                    continue
+                self.extra_put(ent[0], rel, kind, ent[1], target)
+                log(f"  [EXTRA] {rel}{'/' if kind == 'folder' else ''}{f' (dest {target + 1})' if target else ''}")
+
+    def reconcile_extras(self, *, dest_drive, extras, log, dry_run=False):
+        """Delete collected extras ({item_id: [path, kind, size]}).
+
+        An extra folder goes in one DELETE with its whole subtree (anything
+        recorded below it is dropped); deletes go 20 per $batch on
+        DELETE_WORKERS threads and each success is reported via extra_done()
+        so a resumed run doesn't repeat it. dry_run only reports.
+        """
+        dirs = {v[0] for v in extras.values() if v[1] == "folder"}
+        todo, covered = [], {}
+        for item_id, (path, kind, size) in sorted(extras.items(), key=lambda kv: kv[1][0]):
+            parts = path.split("/")
+            top = next(("/".join(parts[:i]) for i in range(1, len(parts)) if "/".join(parts[:i]) in dirs), None)
+            if top is not None:
+                covered.setdefault(top, []).append(item_id)  # goes with its parent folder
+                continue
+            todo.append((item_id, path, kind, size))
+
+        summary = {"files": sum(1 for t in todo if t[2] == "file"),
+                   "folders": sum(1 for t in todo if t[2] == "folder"),
+                   "bytes": sum(t[3] for t in todo), "deleted": 0, "failed": 0}
+        if dry_run:
+            for _, path, kind, size in todo:
+                log(f"  [EXTRA:DRY-RUN] would delete {kind} {path} ({size:,} bytes)")
+            return summary
+
+        lk = Lock()
+
+        def _run(part):
+            if self.should_cancel():
+                return
+            res = self._dc(dest_drive).delete_items(dest_drive, [t[0] for t in part])
+            for item_id, path, kind, _ in part:
+                st = res.get(item_id)
+                if st in (200, 204, 404):
+                    for cid in [item_id, *covered.get(path, ())]:
+                        self.extra_done(cid)
+                    log(f"  [DELETE] {path}{'/' if kind == 'folder' else ''}")
+                    with lk: summary["deleted"] += 1
+                else:
+                    # left in the list; the next run retries it
+                    log(f"  [DELETE:FAILED] {path} (HTTP {st})")
+                    with lk: summary["failed"] += 1
+
+        parts = [todo[k:k + 20] for k in range(0, len(todo), 20)]
+        with ThreadPoolExecutor(max_workers=max(1, self.DELETE_WORKERS), thread_name_prefix="reconcile") as ex:
+            for f in [ex.submit(_run, part) for part in parts]:
+                f.result()
+        return summary
+
+    # dry run
+    def _probe_folder(self, dest_drive, parent_id, name):
+        return self._dc(dest_drive).try_get_folder(dest_drive, parent_id, name)
+
+    def plan_files_exact(self, *, src_drive, src_parent="root", dest_drive, dest_parent, root_name, log):
+        """Walk source and destination like mirror_files_exact, transferring nothing.
+
+        Folders are listed once per side (no per-file probes) and files go
+        through the same skip_reason(). Returns a plan dict: summary,
+        per-folder breakdown and the copy/delete actions, which
+        execute_plan() can run later without enumerating again.
+        """
+        summary = {"copy_files": 0, "copy_bytes": 0, "skip_files": 0, "skip_bytes": 0,
+                   "delete_files": 0, "delete_folders": 0, "delete_bytes": 0, "mkdir": 0,
+                   "filtered_files": 0, "filtered_bytes": 0}
+        flt = self.filter
+        folders = []
+        actions = []
+
+        if root_name:
+            dst_root = self._probe_folder(dest_drive, dest_parent, root_name)
+        else:
+            dst_root = dest_parent
+        base_path = root_name or ""
+
+        # frames: (sid, did|None, path, name, parent_index)
+        stack = [(src_parent or "root", dst_root, base_path, root_name or "", -1)]
+        while stack:
+            if self.should_cancel():
+                break
+            sid, did, path, name, parent_ix = stack.pop()
+            ix = len(folders)
+            row = {"path": path, "name": name, "parent": parent_ix, "src": sid, "dst": did,
+                   "mkdir": did is None and (parent_ix >= 0 or bool(root_name)),
+                   "copy": 0, "copy_bytes": 0, "skip": 0, "delete": 0}
+            folders.append(row)
+            if row["mkdir"]:
+                summary["mkdir"] += 1
+            log(f"[PLAN] {path or '/'}")
+
+            dest_files, dest_dirs = self._dc(dest_drive).list_children_maps(dest_drive, did) if did else ({}, {})
+            seen = set()
+
+            url = self._children_url(src_drive, sid, "id,name,eTag,folder,file,size,hashes,fileSystemInfo")
+            while url:
+                j = self._list(url).json()
+                for ch in j.get("value", []):
+                    nm = ch["name"]
+                    seen.add(nm.casefold()); seen.add(_clean(nm).casefold())
+                    if "folder" in ch:
+                        if flt is not None and not flt.want_dir(f"{path+'/'+nm if path else nm}", nm):
+                            continue
+                        stack.append((ch["id"], (dest_dirs.get(nm) or (None,))[0],
+                                      f"{path+'/'+nm if path else nm}", nm, ix))
+                        continue
+                    size = ch.get("size", 0) or 0
+                    src_hash = _qxh(ch)
+                    if flt is not None and not flt.want_file(f"{path+'/'+nm if path else nm}", nm, size, ch):
+                        summary["filtered_files"] += 1
+                        summary["filtered_bytes"] += size
+                        continue
+                    ex = dest_files.get(nm)
+                    if skip_reason(size, src_hash, ex, _mtime(ch), self.SKIP_MODE):
+                        row["skip"] += 1
+                        summary["skip_files"] += 1
+                        summary["skip_bytes"] += size
+                        continue
+                    row["copy"] += 1
+                    row["copy_bytes"] += size
+                    summary["copy_files"] += 1
+                    summary["copy_bytes"] += size
+                    actions.append(["copy", ix, ch["id"], nm, size, ch.get("eTag"), _fsi(ch)])
+                url = j.get("@odata.nextLink")
+
+            if self.DELETE_EXTRAS:
+                for kind, entries in (("delete", dest_files), ("rmdir", dest_dirs)):
+                    for nm, ent in entries.items():
+                        if nm.casefold() in seen:
+                            continue
+                        if flt is not None and flt.excluded(f"{path+'/'+nm if path else nm}", nm):
+                            continue
+                        row["delete"] += 1
+                        summary["delete_files" if kind == "delete" else "delete_folders"] += 1
+                        summary["delete_bytes"] += ent[1]
+                        actions.append([kind, ix, ent[0], nm, ent[1], None])
+
+        return {
+            "src_drive": src_drive, "src_parent": src_parent or "root",
+            "dest_drive": dest_drive, "dest_parent": dest_parent, "root_name": root_name or "",
+            "delete_extras": bool(self.DELETE_EXTRAS),
+            "complete": not self.should_cancel(),
+            "summary": summary, "folders": folders, "actions": actions,
+        }
+
+    def execute_plan(self, plan, *, log):
+        """Run the actions of a plan_files_exact() plan (no source enumeration)."""
+        dest_drive = plan["dest_drive"]
+        src_drive = plan["src_drive"]
+        folders = plan["folders"]
+        dst_ids = {ix: row["dst"] for ix, row in enumerate(folders) if row["dst"]}
+
+        # missing folders first, in $batch rounds under the nearest existing ancestor
+        rel = {}
+        for ix, row in enumerate(folders):
+            if row["parent"] < 0:
+                rel[ix] = ""
+                if ix not in dst_ids:
+                    dst_ids[ix] = (self._dc(dest_drive).ensure_folder_by_path(dest_drive, plan["dest_parent"], plan["root_name"])
+                                   if plan["root_name"] else plan["dest_parent"])
+            else:
+                p = rel[row["parent"]]
+                rel[ix] = f"{p+'/'+row['name'] if p else row['name']}"
+        missing = [ix for ix in range(len(folders)) if ix not in dst_ids]
+        if missing:
+            made = self._dc(dest_drive).ensure_folders_by_paths(dest_drive, dst_ids[0], [rel[ix] for ix in missing])
+            for ix in missing:
+                dst_ids[ix] = made[rel[ix]]
 
-            if self.DELETE_EXTRAS and dest_files:
-                for nm, (fid, _, _) in dest_files.items():
-                    d = self.RH.delete(f"{GRAPH}/drives/{dest_drive}/items/{fid}")
-                    if d.status_code not in (200, 204):
-                        d.raise_for_status()
-                    log(f"  [DELETE] {(path+'/'+nm if path else nm)}")
+        def _dst(ix):
+            return dst_ids[ix]
 
-            self.clear_cursor(sid)
+        futs = []
+        extras = {}
+        for kind, ix, item_id, nm, size, etag, *more in plan["actions"]:  # older plans lack fsi
+            if self.should_cancel():
+                break
+            row = folders[ix]
+            if kind == "copy":
+                try: self.on_discover_file(1)
+                except Exception: pass
+                if self._ledger_ok(item_id, etag):
+                    try: self.on_file_done(size)
+                    except Exception: pass
+                    continue
+                futs.append(self._submit_copy(
+                    targets=[(0, dest_drive, _dst(ix))], nm=nm,
+                    src_drive=src_drive, item_id=item_id, src_size=size, etag=etag,
+                    sid=row["src"], path=row["path"], log=log, fsi=more[0] if more else None,
+                ))
+            elif kind in ("delete", "rmdir"):
+                extras[item_id] = [f"{row['path']+'/'+nm if row['path'] else nm}",
+                                   "folder" if kind == "rmdir" else "file", size]
+        if futs:
+            wait(futs)
+        if self._times_q:
+            self._flush_times(log)
+        if extras and not self.should_cancel():
+            self.reconcile_extras(dest_drive=dest_drive, extras=extras, log=log)
 
-    def mirror_folders_only(self, *, src_drive, src_parent="root", dest_drive, dest_parent, root_name, log):
+    def plan_shards(self, *, src_drive, src_parent="root", dest_drive, dest_parent, root_name,
+                    max_shard_bytes, log):
+        """Split the source tree into disjoint shards for sharded runs.
+
+        A folder whose subtree fits in max_shard_bytes (Graph reports folder
+        size as the subtree total) becomes one recursive shard; a bigger one
+        becomes a files-only shard and its subfolders are split further.
+        Destination folders down to the shard boundaries are created here,
+        everything below them by the worker that owns the shard.
+        """
         if root_name:
-            dst_root = self.drive.ensure_folder_by_path(dest_drive, dest_parent, root_name)
+            dst_root = self._dc(dest_drive).ensure_folder_by_path(dest_drive, dest_parent, root_name)
             base_path = root_name
         else:
             dst_root = dest_parent
             base_path = ""
 
+        shards = []
         stack = [(src_parent or "root", dst_root, base_path)]
         while stack:
             if self.should_cancel():
-                return
+                return shards
             sid, did, path = stack.pop()
+            shards.append({"src": sid, "dst": did, "path": path, "recursive": False})
+
+            url = self._children_url(src_drive, sid, "id,name,folder,size")
+            while url:
+                j = self._list(url).json()
+                for ch in j.get("value", []):
+                    if "folder" not in ch:
+                        continue
+                    nm = ch["name"]
+                    rel = f"{path+'/'+nm if path else nm}"
+                    if self.filter is not None and not self.filter.want_dir(rel, nm):
+                        continue
+                    ndid = self._dc(dest_drive).ensure_folder_by_path(dest_drive, did, nm)
+                    if (ch.get("size") or 0) <= max_shard_bytes:
+                        shards.append({"src": ch["id"], "dst": ndid, "path": rel, "recursive": True})
+                    else:
+                        stack.append((ch["id"], ndid, rel))
+                url = j.get("@odata.nextLink")
+
+        log(f"[SHARD] planned {len(shards)} shards (max {max_shard_bytes:,} bytes each)")
+        return shards
+
+    def mirror_folders_only(self, *, src_drive, src_parent="root", dest_drive, dest_parent, root_name, log,
+                            extra_dests=()):
+        targets = self._targets(dest_drive, dest_parent, root_name, extra_dests)
+        base_path = targets[0][3]
+
+        # destination folders are created in $batch rounds as the walk finds them
+        # (one source walk, the same relative paths at every target)
+        made = [{} for _ in targets]
+        todo = []
+
+        def _flush():
+            if todo:
+                for (_, drive, dst_root, _), known in zip(targets, made):
+                    known.update(self._dc(drive).ensure_folders_by_paths(drive, dst_root, todo, known=known))
+                todo.clear()
+
+        stack = [(src_parent or "root", "", base_path)]
+        while stack:
+            if self.should_cancel():
+                _flush()
+                return
+            sid, rel, path = stack.pop()
             log(f"[DIR] {path or '/'}")
 
-            url = (
-                f"{GRAPH}/drives/{src_drive}/root/children?$top=200&$select=id,name,folder&$orderby=name"
-                if sid == "root"
-                else f"{GRAPH}/drives/{src_drive}/items/{sid}/children?$top=200&$select=id,name,folder&$orderby=name"
-            )
+            url = self._children_url(src_drive, sid, "id,name,folder")
+            flt = self.filter
 
             while url:
                 if self.should_cancel():
+                    _flush()
                     return
-                j = self.RH.get(url).json()
+                j = self._list(url).json()
                 for ch in j.get("value", []):
                     if "folder" in ch:
                         nm = ch["name"]
-                        ndid = self.drive.ensure_folder_by_path(dest_drive, did, nm)
-                        stack.append((ch["id"], ndid, f"{path+'/'+nm if path else nm}"))
+                        if flt is not None and not flt.want_dir(f"{path+'/'+nm if path else nm}", nm):
+                            continue
+                        crel = f"{rel+'/'+nm if rel else nm}"
+                        todo.append(crel)
+                        stack.append((ch["id"], crel, f"{path+'/'+nm if path else nm}"))
                 url = j.get("@odata.nextLink")
+            if len(todo) >= self.FOLDER_FLUSH:
+                _flush()
+        _flush()
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import os
+import time
+from threading import Condition, Lock
+
+__all__ = ["AppCredential", "CredentialPool", "pool_from_fields"]
+
+GRAPH_SCOPE = "https://graph.microsoft.com/.default"
+
+
+class AppCredential:
+    """One app registration (client credentials) with its own token cache
+    and throttle state.
+
+    token_url (or SPOD_TOKEN_URL, may contain {tenant}) switches from msal to
+    a plain client-credentials POST, e.g. against tools/token_stub.py.
+    """
+
+    EARLY_REFRESH = 300  # renew this many seconds before expiry
+
+    def __init__(self, tenant, client_id, secret, *, token_url=None, scope=GRAPH_SCOPE):
+        self.tenant = tenant
+        self.client_id = client_id
+        self.secret = secret
+        self.scope = scope
+        self.token_url = token_url or os.environ.get("SPOD_TOKEN_URL") or None
+        self._lk = Lock()
+        self._token = None
+        self._expires_at = 0.0
+        # pool bookkeeping
+        self.inflight = 0
+        self.throttled_until = 0.0
+        self.throttles = 0
+        self.requests = 0
+
+    def __repr__(self):
+        return f"AppCredential({self.client_id[:8]}…)"
+
+    def _fetch(self):
+        if self.token_url:
+            import requests
+            r = requests.post(
+                self.token_url.format(tenant=self.tenant),
+                data={
+                    "grant_type": "client_credentials",
+                    "client_id": self.client_id,
+                    "client_secret": self.secret,
+                    "scope": self.scope,
+                },
+                timeout=(10, 30),
+            )
+            j = r.json()
+        else:
+            import msal  # heavy import; only needed once we authenticate
+            app = msal.ConfidentialClientApplication(
+                self.client_id,
+                authority=f"https://login.microsoftonline.com/{self.tenant}",
+                client_credential=self.secret,
+            )
+            j = app.acquire_token_for_client(scopes=[self.scope])
+        if "access_token" not in j:
+            import json
+            raise RuntimeError(json.dumps(j, indent=2))
+        return j["access_token"], float(j.get("expires_in") or 3600)
+
+    def token(self) -> str:
+        with self._lk:
+            if self._token is None or time.time() >= self._expires_at - self.EARLY_REFRESH:
+                tok, ttl = self._fetch()
+                self._token = tok
+                self._expires_at = time.time() + ttl
+            return self._token
+
+    def reset(self):
+        with self._lk:
+            self._token = None
+
+    def header(self) -> dict:
+        return {"Authorization": f"Bearer {self.token()}"}
+
+
+class CredentialPool:
+    """Spreads requests over several app registrations.
+
+    acquire() hands out the least-busy credential that is not throttled;
+    a credential that gets 429/503 is drained for its Retry-After window
+    and traffic moves to the others. If every one is drained, acquire()
+    waits for the first to come back.
+    """
+
+    DEFAULT_DRAIN = 10.0  # seconds, when the throttle carried no Retry-After
+
+    def __init__(self, creds):
+        if not creds:
+            raise ValueError("CredentialPool needs at least one credential")
+        self.creds = list(creds)
+        self._cv = Condition()
+        self._rr = 0
+
+    def __len__(self):
+        return len(self.creds)
+
+    def available(self) -> int:
+        now = time.time()
+        return sum(1 for c in self.creds if c.throttled_until <= now)
+
+    def acquire(self) -> AppCredential:
+        with self._cv:
+            while True:
+                now = time.time()
+                ready = [c for c in self.creds if c.throttled_until <= now]
+                if ready:
+                    self._rr += 1
+                    # least in-flight first; rotate ties so idle pools still spread
+                    n = len(ready)
+                    best = min(range(n), key=lambda i: (ready[i].inflight, (i - self._rr) % n))
+                    c = ready[best]
+                    c.inflight += 1
+                    c.requests += 1
+                    return c
+                self._cv.wait(timeout=max(0.05, min(c.throttled_until for c in self.creds) - now))
+
+    def release(self, cred: AppCredential):
+        with self._cv:
+            cred.inflight = max(0, cred.inflight - 1)
+            self._cv.notify()
+
+    def on_throttle(self, cred: AppCredential, retry_after=None):
+        with self._cv:
+            cred.throttles += 1
+            cred.throttled_until = max(cred.throttled_until, time.time() + float(retry_after or self.DEFAULT_DRAIN))
+
+    def on_auth_error(self, cred: AppCredential):
+        cred.reset()
+
+    def stats(self):
+        now = time.time()
+        return [{
+            "client": c.client_id,
+            "requests": c.requests,
+            "throttles": c.throttles,
+            "inflight": c.inflight,
+            "drained_for": max(0.0, round(c.throttled_until - now, 1)),
+        } for c in self.creds]
+
+
+def pool_from_fields(tenant, client, secret):
+    """CLIENT/SECRET fields may hold comma-separated lists (same length) for
+    several app registrations. Returns a CredentialPool, or None for one app."""
+    ids = [x.strip() for x in (client or "").split(",") if x.strip()]
+    secrets = [x.strip() for x in (secret or "").split(",") if x.strip()]
+    if len(ids) <= 1:
+        return None
+    if len(ids) != len(secrets):
+        raise ValueError("CLIENT and SECRET lists must have the same length")
+    return CredentialPool([AppCredential(tenant, i, s) for i, s in zip(ids, secrets)])
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from threading import Lock
+
+__all__ = ["Hedger", "endpoint_kind"]
+
+WINDOW = 256          # latencies kept per endpoint kind
+MIN_SAMPLES = 20      # no hedging for a kind until it has this many
+MIN_DELAY = 0.05      # never hedge sooner than this (s)
+MAX_DELAY = 10.0      # ... or later
+QUIET_AFTER_THROTTLE = 15.0   # no hedges for this long after a 429/503
+
+
+def endpoint_kind(url: str):
+    """Latency class of a Graph GET, or None when it must not be hedged (downloads)."""
+    path = url.split("?", 1)[0]
+    if path.endswith("/content"):
+        return None
+    if path.endswith("/children"):
+        return "children"
+    if path.endswith(":"):
+        return "probe"  # path-addressed item: .../items/{id}:/name:
+    if "/items/" in path or path.endswith("/root"):
+        return "item"
+    return "other"
+
+
+class _Lat:
+    """Recent latencies of one kind; p95 recomputed every few samples."""
+    __slots__ = ("buf", "p95", "n")
+
+    def __init__(self):
+        self.buf = deque(maxlen=WINDOW)
+        self.p95 = None
+        self.n = 0
+
+    def add(self, dt):
+        self.buf.append(dt)
+        self.n += 1
+        if len(self.buf) >= MIN_SAMPLES and (self.p95 is None or self.n % 16 == 0):
+            s = sorted(self.buf)
+            self.p95 = s[min(len(s) - 1, int(len(s) * 0.95))]
+
+
+class Hedger:
+    """Duplicate a slow idempotent GET once it outlives its kind's p95.
+
+    call(kind, send) runs send() on a worker (it returns a response, or a
+    tuple with the response first); if it hasn't answered after
+    the p95 of recent latencies for that kind (children listings, path
+    probes, item GETs), a second send() goes out and whichever answers
+    first wins, unless it's a throttle or server error while the other
+    is still out. The loser is cancelled if it hasn't started, else its
+    response is closed when it lands. Hedges are capped at `budget` of
+    all calls (plus a small burst) and paused after a throttle, so they
+    never add much load or feed a 429 storm.
+    """
+
+    def __init__(self, *, budget=0.05, burst=5, workers=64):
+        self.budget = float(budget)
+        self.burst = int(burst)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hedge")
+        self._lk = Lock()
+        self._lat = {}
+        self._quiet_until = 0.0
+        self.calls = self.hedged = self.hedge_wins = 0
+
+    def delay(self, kind):
+        lat = self._lat.get(kind)
+        if lat is None or lat.p95 is None:
+            return None
+        return min(MAX_DELAY, max(MIN_DELAY, lat.p95))
+
+    def note_throttle(self):
+        self._quiet_until = time.monotonic() + QUIET_AFTER_THROTTLE
+
+    def _record(self, kind, dt):
+        with self._lk:
+            lat = self._lat.get(kind)
+            if lat is None:
+                lat = self._lat[kind] = _Lat()
+            lat.add(dt)
+
+    def _may_hedge(self) -> bool:
+        with self._lk:
+            if time.monotonic() < self._quiet_until:
+                return False
+            if self.hedged >= self.calls * self.budget + self.burst:
+                return False
+            self.hedged += 1
+            return True
+
+    def call(self, kind, send, retry=None):
+        # retry(result) -> True for an answer worth retrying (429, 5xx): it only wins
+        # when the other send has nothing better, and its latency stays out of p95
+        with self._lk:
+            self.calls += 1
+        t0 = time.monotonic()
+        first = self._pool.submit(send)
+        d = self.delay(kind)
+        done, _ = wait([first], timeout=d)
+        if done or not self._may_hedge():
+            r = first.result()
+            if retry is None or not retry(r):
+                self._record(kind, time.monotonic() - t0)
+            return r
+
+        second = self._pool.submit(send)
+        pending = {first, second}
+        err = fallback = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is not None:
+                    err = err or f.exception()
+                    continue
+                r = f.result()
+                if retry is not None and retry(r):
+                    if fallback is None:
+                        fallback = r
+                    else:
+                        _close(r)
+                    continue
+                if fallback is not None:
+                    _close(fallback)
+                for other in pending:
+                    if not other.cancel():
+                        other.add_done_callback(_close_result)
+                # a lost primary is at least this slow; keeps p95 honest
+                self._record(kind, time.monotonic() - t0)
+                if f is second:
+                    with self._lk:
+                        self.hedge_wins += 1
+                return r
+        if fallback is not None:
+            return fallback  # both came back bad (or one failed): the caller retries
+        raise err
+
+    def stats(self):
+        with self._lk:
+            return {
+                "hedge_calls": self.calls, "hedged": self.hedged, "hedge_wins": self.hedge_wins,
+                "hedge_p95_ms": {k: round(v.p95 * 1000, 1) for k, v in self._lat.items() if v.p95 is not None},
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _close(r):
+    try:
+        (r[0] if isinstance(r, tuple) else r).close()
+    except Exception:
+        pass
+
+
+def _close_result(f):
+    if f.exception() is None:
+        _close(f.result())
@@ -1,23 +1,21 @@
-import time, random, email.utils, requests
+import email.utils, requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from datetime import datetime, timezone
+from http_utils.hedging import endpoint_kind
+from http_utils.retry_policy import RetryPolicy, op_for
 
 #status class
 CODES = {
     "OK":    {200, 201, 202, 204, 206},
-    "RETRY": {408, 416, 425, 429, 500, 502, 503, 504},
+    "RETRY": {408, 425, 429, 500, 502, 503, 504},
     "AUTH":  {401, 403},
 }
 def is_ok(s): return s in CODES["OK"]
 def is_retry(s): return s in CODES["RETRY"]
 def is_auth(s): return s in CODES["AUTH"]
 
-#Backoff helpers
-def _sleep(attempt: int):
-    # 
-    time.sleep((attempt + 1) * 0.8 + random.random() * 0.3)
-
+#Backoff helpers (the policy itself lives in retry_policy.py)
 def _parse_retry_after(header_val):
     if header_val is None:
         return None
@@ -33,25 +31,22 @@ def _parse_retry_after(header_val):
         except Exception:
             return None
 
-def _sleep_with_retry_after(resp, attempt: int):
-    ra = _parse_retry_after(resp.headers.get("Retry-After"))
-    if ra and ra > 0:
-        time.sleep(ra)
-    else:
-        _sleep(attempt)
-
 # Session factory 
 def new_session():
     s = requests.Session()
-    # AHandle Retry connection/read errors aggressively. logic handles status code retries
+    # retries belong to RobustHTTP's RetryPolicy; urllib3 only reconnects once
+    # at once when a pooled keep-alive connection turns out to be dead
     retry = Retry(
-        total=5,
-        connect=5,
-        read=5,
-        backoff_factor=0.6,
-        allowed_methods=None,   # retry all methods on conn/read err
+        total=1,
+        connect=1,
+        read=0,
+        status=0,
+        other=0,
+        backoff_factor=0,
+        allowed_methods=None,
         raise_on_status=False,  # we handle status ourselves
-        respect_retry_after_header=True,
+        # 429/503 + Retry-After must reach RobustHTTP (throttle stats, credential drain)
+        respect_retry_after_header=False,
     )
     ad = HTTPAdapter(max_retries=retry, pool_connections=50, pool_maxsize=50)
     s.mount("https://", ad); s.mount("http://", ad)
@@ -60,16 +55,26 @@ def new_session():
 
 # wrapper 
 class RobustHTTP:
-    def __init__(self, session, get_auth_hdr, timeout=(10, 300), refresh_cb_default=None,
-                 on_throttle=None):
+    def __init__(self, session, get_auth_hdr=None, timeout=(10, 300), refresh_cb_default=None,
+                 on_throttle=None, credentials=None, hedge=None, policy=None):
         self.S = session
         self.get_auth_hdr = get_auth_hdr
         self.timeout = timeout
         self.refresh_cb_default = refresh_cb_default
         self.on_throttle = on_throttle  
-
-    def _merged_headers(self, headers):
-        base = self.get_auth_hdr() or {}
+        # optional CredentialPool: each attempt goes out under one of several
+        # app registrations; a throttled one is drained and the retry moves on
+        self.credentials = credentials
+        # optional hedging.Hedger: slow metadata GETs get a duplicate past their p95
+        self.hedge = hedge
+        # one retry/backoff policy (deadlines, jitter, shared retry budget) for every call
+        self.policy = policy or RetryPolicy()
+
+    def _merged_headers(self, headers, cred=None):
+        if cred is not None:
+            base = cred.header()
+        else:
+            base = (self.get_auth_hdr() if self.get_auth_hdr else None) or {}
         if headers:
             base.update(headers)
         return base
@@ -78,128 +83,153 @@ class RobustHTTP:
         self, method, url, *,
         headers=None, params=None, data=None, json=None,
         allow_redirects=True, stream=False,
-        max_tries=6, refresh_cb=None,
-        ok_extra: set | tuple = (),
+        max_tries=None, refresh_cb=None,
+        ok_extra: set | tuple = (), op=None,
     ):
         """
-        Two-phase retry:
-          Phase A: try max_tries with current token
-          If AUTH encountered or we exhaust: run refresh_cb once
-          Phase B: try max_tries with refreshed token
-        Retries also on RETRY status set and request exceptions
+        One loop under self.policy (see retry_policy.RetryPolicy):
+          OK / ok_extra        -> return
+          RETRY set, errors    -> back off (Retry-After or jitter) until the op's deadline
+          AUTH                 -> refresh_cb once per credential, then retry; a second AUTH on it gives up
+          anything else        -> give up at once (retrying won't change a 400/404/409)
+        Gives up with RetryError (a RuntimeError) carrying the reason.
+        max_tries, when given, is an extra cap on attempts.
         """
         if refresh_cb is None:
             refresh_cb = self.refresh_cb_default
+        pool = self.credentials
+        policy = self.policy
+        st = policy.begin(op or op_for(method, url, stream))
+
+        kind = endpoint_kind(url) if (self.hedge is not None and method == "GET" and not stream) else None
 
         def _once():
-            return self.S.request(
-                method, url,
-                headers=self._merged_headers(headers),
-                params=params, data=data, json=json,
-                timeout=self.timeout,
-                allow_redirects=allow_redirects,
-                stream=stream,
-            )
-
-        # Phase A
-        for a in range(max_tries):
+            if kind is not None:
+                return self.hedge.call(kind, _send, retry=lambda res: is_retry(res[0].status_code))
+            return _send()
+
+        def _send():
+            # -> (response, the credential it went out under); a hedged GET has two
+            # sends in flight, so whichever answers brings its own credential back
+            cred = pool.acquire() if pool else None
+            if hasattr(data, "seek"):
+                data.seek(0)  # file-like body (local_drive.MmapChunk): every try sends all of it
             try:
-                r = _once()
-                code = r.status_code
-                if is_ok(code) or (ok_extra and code in ok_extra):
-                    return r
-                if is_retry(code):
-                    if self.on_throttle and code in (429, 502, 503, 504):
-                        ra = _parse_retry_after(r.headers.get("Retry-After"))
-                        try: self.on_throttle(code, ra)
-                        except Exception: pass
-                    _sleep_with_retry_after(r, a); continue
-                if is_auth(code):
-                    break  # go refresh once
-                r.raise_for_status()
-                return r  # In case a 2xx not in OK set slipped through
-            except requests.RequestException:
-                _sleep(a)
-
-        # Refresh once (if provided)
-        if refresh_cb:
+                return self.S.request(
+                    method, url,
+                    headers=self._merged_headers(headers, cred),
+                    params=params, data=data, json=json,
+                    timeout=self.timeout,
+                    allow_redirects=allow_redirects,
+                    stream=stream,
+                ), cred
+            finally:
+                if cred is not None:
+                    pool.release(cred)
+
+        def _throttled(r, cred):
+            # -> seconds the server asked for (or 0 to go again now), None when it didn't say
+            code = r.status_code
+            ra = None
+            if code in (429, 502, 503, 504):
+                ra = _parse_retry_after(r.headers.get("Retry-After"))
+                if self.on_throttle:
+                    try: self.on_throttle(code, ra)
+                    except Exception: pass
+                if self.hedge is not None:
+                    self.hedge.note_throttle()
+            if pool and cred is not None and code in (429, 503):
+                pool.on_throttle(cred, ra)
+                if pool.available():
+                    return 0.0  # another identity is ready: retry right away
+            return ra
+
+        def _fail(reason, msg, r=None):
+            if r is not None:
+                try:
+                    msg += f" (last status={r.status_code}, body={r.text[:512].replace(chr(10), ' ')!r})"
+                except Exception:
+                    pass
+            return policy.give_up(st, reason, msg, status=getattr(r, "status_code", None))
+
+        # one refresh per identity: with a pool the retry may go out under another
+        # registration whose token expired too, and that one gets its own refresh
+        refreshed = set()
+        r = None
+        while True:
             try:
-                refresh_cb()
-            except Exception:
-                # If refresh itself fails, fall through to Phase B attempts anyway
-                pass
-
-        # Phase B
-        for b in range(max_tries):
-            try:
-                r = _once()
-                code = r.status_code
-                if is_ok(code) or (ok_extra and code in ok_extra):
-                    return r
-                if is_retry(code):
-                    if self.on_throttle and code in (429, 502, 503, 504):
-                        ra = _parse_retry_after(r.headers.get("Retry-After"))
-                        try: self.on_throttle(code, ra)
-                        except Exception: pass
-                    _sleep_with_retry_after(r, b); continue
-                r.raise_for_status()
-                return r
-            except requests.RequestException:
-                _sleep(b)
-        msg = f"{method} failed after retries: {url}"
-        try:
-            # small safeguard: if r exists, surface a hint
-            if 'r' in locals():
-                snippet = r.text[:512].replace("\n", " ")
-                msg += f" (last status={r.status_code}, body={snippet!r})"
-        except Exception:
-            pass
-        raise RuntimeError(msg)
+                r, cred = _once()
+            except requests.RequestException as e:
+                why = st.retry("timeout" if isinstance(e, requests.Timeout) else "conn", max_tries=max_tries)
+                if why:
+                    raise _fail(why, f"{method} {url}: {type(e).__name__}: {e}") from e
+                continue
+            code = r.status_code
+            if is_ok(code) or (ok_extra and code in ok_extra) or code < 400:
+                policy.on_success(st.tries == 0)
+                return r  # (< 400: a redirect with allow_redirects=False, or an odd 2xx)
+            if is_retry(code):
+                why = st.retry(str(code), _throttled(r, cred), max_tries=max_tries)
+                if why:
+                    raise _fail(why, f"{method} failed: {url}", r)
+                continue
+            if is_auth(code) and cred not in refreshed:
+                refreshed.add(cred)
+                if pool and cred is not None:
+                    pool.on_auth_error(cred)
+                if refresh_cb:
+                    try:
+                        refresh_cb()
+                    except Exception:
+                        pass  # the retry below tells whether the old token still works
+                st.tries += 1
+                continue
+            raise _fail("auth" if is_auth(code) else "status", f"{method} failed: {url}", r)
 
     #public surface kept compatible
-    def get(self, url, headers=None, params=None, allow_redirects=True, max_tries=6,
-            refresh_cb=None, ok_extra: set | tuple = (), stream=False):
+    def get(self, url, headers=None, params=None, allow_redirects=True, max_tries=None,
+            refresh_cb=None, ok_extra: set | tuple = (), stream=False, op=None):
         return self._request(
             "GET", url,
             headers=headers, params=params, allow_redirects=allow_redirects,
-            max_tries=max_tries, refresh_cb=refresh_cb, ok_extra=ok_extra, stream=stream
+            max_tries=max_tries, refresh_cb=refresh_cb, op=op, ok_extra=ok_extra, stream=stream
         )
 
 
     def post(self, url, *, headers=None, data=None, json=None,
-             max_tries=8, refresh_cb=None):
+             max_tries=None, refresh_cb=None, op=None):
         return self._request(
             "POST", url,
             headers=headers, data=data, json=json,
-            max_tries=max_tries, refresh_cb=refresh_cb
+            max_tries=max_tries, refresh_cb=refresh_cb, op=op
         )
 
-    def put(self, url, headers=None, data=None, max_tries=10, refresh_cb=None, stream=False):
+    def put(self, url, headers=None, data=None, max_tries=None, refresh_cb=None, stream=False, op=None):
         return self._request(
             "PUT", url,
             headers=headers, data=data, stream=stream,
-            max_tries=max_tries, refresh_cb=refresh_cb
+            max_tries=max_tries, refresh_cb=refresh_cb, op=op
         )
 
-    def delete(self, url, *, headers=None, max_tries=6, refresh_cb=None):
+    def delete(self, url, *, headers=None, max_tries=None, refresh_cb=None, ok_extra: set | tuple = (), op=None):
         return self._request(
             "DELETE", url,
             headers=headers,
-            max_tries=max_tries, refresh_cb=refresh_cb
+            max_tries=max_tries, refresh_cb=refresh_cb, op=op, ok_extra=ok_extra
         )
 
     # handy extras if needed
     def patch(self, url, *, headers=None, data=None, json=None,
-              max_tries=8, refresh_cb=None):
+              max_tries=None, refresh_cb=None, op=None):
         return self._request(
             "PATCH", url,
             headers=headers, data=data, json=json,
-            max_tries=max_tries, refresh_cb=refresh_cb
+            max_tries=max_tries, refresh_cb=refresh_cb, op=op
         )
 
-    def head(self, url, *, headers=None, max_tries=6, refresh_cb=None):
+    def head(self, url, *, headers=None, max_tries=None, refresh_cb=None, op=None):
         return self._request(
             "HEAD", url,
             headers=headers, allow_redirects=False,
-            max_tries=max_tries, refresh_cb=refresh_cb
+            max_tries=max_tries, refresh_cb=refresh_cb, op=op
         )
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import random
+import time
+from collections import Counter
+from threading import Lock
+
+__all__ = ["RetryPolicy", "RetryError", "op_for"]
+
+
+class RetryError(RuntimeError):
+    """An operation the policy gave up on; raised once, with the reason.
+
+    reason: "deadline" (out of time), "budget" (global retry budget empty),
+    "status" (an answer retrying can't change), "auth" (still 401/403 after
+    a token refresh), "tries" (hit the caller's max_tries).
+    """
+
+    def __init__(self, msg, *, op, reason, status=None, tries=0, elapsed=0.0):
+        super().__init__(msg)
+        self.op = op
+        self.reason = reason
+        self.status = status
+        self.tries = tries
+        self.elapsed = elapsed
+
+
+def op_for(method: str, url: str, stream: bool = False) -> str:
+    """Deadline class of a request when the caller doesn't name one."""
+    if method == "GET":
+        return "download" if (stream or url.split("?", 1)[0].endswith("/content")) else "read"
+    if method == "PUT":
+        return "upload"  # small-file PUT or a chunk to an upload session URL
+    return "write"
+
+
+class _State:
+    """Retry bookkeeping of one operation (one request, or one chunk loop)."""
+    __slots__ = ("policy", "op", "t0", "deadline", "delay", "tries")
+
+    def __init__(self, policy, op):
+        self.policy = policy
+        self.op = op
+        self.t0 = time.monotonic()
+        self.deadline = self.t0 + policy.DEADLINES.get(op, policy.DEADLINES["write"])
+        self.delay = policy.BASE
+        self.tries = 0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.t0
+
+    def progress(self):
+        # long loops (chunked uploads) get a fresh deadline whenever they move forward
+        self.deadline = time.monotonic() + self.policy.DEADLINES.get(self.op, self.policy.DEADLINES["write"])
+        self.delay = self.policy.BASE
+
+    def retry(self, reason, retry_after=None, max_tries=None):
+        """Sleep before the next try; None when it may go ahead, else why not."""
+        p = self.policy
+        if max_tries is not None and self.tries + 1 >= max_tries:
+            return "tries"
+        # a server-directed wait (Retry-After) is free; blind retries spend budget
+        if retry_after is None and not p._spend():
+            return "budget"
+        if retry_after is not None:
+            wait = min(p.MAX_RETRY_AFTER, max(0.0, retry_after))
+        else:
+            # decorrelated jitter: next in [base, 3 * previous], capped
+            self.delay = min(p.CAP, random.uniform(p.BASE, self.delay * 3))
+            wait = self.delay
+        if time.monotonic() + wait > self.deadline:
+            return "deadline"
+        self.tries += 1
+        p._note_retry(self.op, reason)
+        if wait > 0:
+            time.sleep(wait)
+        return None
+
+
+class RetryPolicy:
+    """One backoff policy for every Graph call.
+
+    Each operation gets a deadline by kind (DEADLINES, seconds) instead of
+    nested try counts, so a hopeless chunk frees its worker after minutes,
+    not tens of minutes. Waits between tries use decorrelated jitter
+    (AWS style), or the server's Retry-After when it sends one. Blind
+    retries (timeouts, 5xx without Retry-After, dropped connections) draw
+    from a budget shared by all threads: each first try adds RATIO of a
+    token (up to BURST), each blind retry costs one. When the service is
+    hard down the budget runs dry and requests fail at once, rather than
+    every worker sleeping through its own backoff.
+
+    Retries are counted by (op, reason); give-ups by (op, reason) too, once,
+    where the RetryError is raised.
+    """
+
+    DEADLINES = {
+        "read": 180.0,       # metadata GETs, listings, probes
+        "write": 180.0,      # POST / PATCH / DELETE
+        "download": 600.0,   # one range (or small file) GET
+        "upload": 600.0,     # one chunk / small-file PUT
+        "session": 900.0,    # an upload session without progress
+    }
+    BASE = 0.5
+    CAP = 30.0
+    MAX_RETRY_AFTER = 120.0
+    RATIO = 0.2
+    BURST = 200.0
+
+    def __init__(self, deadlines=None):
+        self.DEADLINES = {**self.DEADLINES, **(deadlines or {})}
+        self._lk = Lock()
+        self._tokens = self.BURST
+        self.retries = Counter()
+        self.failures = Counter()
+
+    def begin(self, op: str) -> _State:
+        return _State(self, op)
+
+    def on_success(self, first_try: bool):
+        if first_try:
+            with self._lk:
+                self._tokens = min(self.BURST, self._tokens + self.RATIO)
+
+    def _spend(self) -> bool:
+        with self._lk:
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+    def _note_retry(self, op, reason):
+        with self._lk:
+            self.retries[f"{op}:{reason}"] += 1
+
+    def give_up(self, st: _State, reason, msg, status=None) -> RetryError:
+        with self._lk:
+            self.failures[f"{st.op}:{reason}"] += 1
+        return RetryError(f"{msg} [{reason} after {st.tries + 1} tries, {st.elapsed:.1f}s]",
+                          op=st.op, reason=reason, status=status, tries=st.tries + 1, elapsed=st.elapsed)
+
+    def stats(self):
+        with self._lk:
+            return {
+                "retries": sum(self.retries.values()), "gave_up": sum(self.failures.values()),
+                "retry_budget": round(self._tokens, 1),
+                "retry_reasons": dict(self.retries), "give_up_reasons": dict(self.failures),
+            }
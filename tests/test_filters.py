@@ -0,0 +1,106 @@
+import pytest
+
+from graph_client.filters import ItemFilter, parse_size
+
+
+def _item(mtime):
+    return {"fileSystemInfo": {"lastModifiedDateTime": mtime}}
+
+
+def test_exclude_name_and_path_rules():
+    f = ItemFilter(exclude=["*.tmp", "~$*", "Archive/Video/**"], root="COPY")
+    assert not f.want_file("COPY/a/b/x.TMP", "x.TMP")           # name rule, any depth, any case
+    assert not f.want_file("COPY/~$doc.docx", "~$doc.docx")
+    assert not f.want_file("COPY/Archive/Video/2020/clip.mp4", "clip.mp4")
+    assert f.want_file("COPY/Archive/Photos/clip.mp4", "clip.mp4")
+    assert f.want_file("COPY/Video/clip.mp4", "clip.mp4")      # the path rule is anchored at the root
+    assert f.excluded_files == 3
+
+
+def test_path_rule_prunes_the_folder_itself():
+    f = ItemFilter(exclude=["Archive/**"], root="COPY")
+    assert not f.want_dir("COPY/Archive", "Archive")
+    assert f.want_dir("COPY/Archived", "Archived")
+    assert f.want_dir("COPY/Data/Archive", "Archive")
+    assert f.pruned_dirs == 1
+
+
+def test_double_star_prefix_matches_at_any_depth():
+    f = ItemFilter(exclude=["**/node_modules/**"])
+    assert not f.want_dir("node_modules", "node_modules")
+    assert not f.want_dir("src/app/node_modules", "node_modules")
+    assert not f.want_file("src/node_modules/x/index.js", "index.js")
+    assert f.want_file("src/node_modules_old.txt", "node_modules_old.txt")
+
+
+def test_char_classes_and_negation():
+    f = ItemFilter(include=["report-[0-9][0-9].xlsx", "draft[!s].docx"])
+    assert f.want_file("report-07.xlsx", "report-07.xlsx")
+    assert not f.want_file("report-7a.xlsx", "report-7a.xlsx")
+    assert f.want_file("draft1.docx", "draft1.docx")
+    assert not f.want_file("drafts.docx", "drafts.docx")
+
+
+def test_include_only_keeps_matching_files_but_walks_every_folder():
+    f = ItemFilter(include=["*.pdf", "Finance/**"], root="COPY")
+    assert f.want_dir("COPY/Other", "Other")
+    assert f.want_file("COPY/Other/a.pdf", "a.pdf")
+    assert f.want_file("COPY/Finance/2024/q1.xlsx", "q1.xlsx")
+    assert not f.want_file("COPY/Other/q1.xlsx", "q1.xlsx")
+
+
+def test_exclude_beats_include():
+    f = ItemFilter(include=["*.pdf"], exclude=["Drafts/**"])
+    assert not f.want_file("Drafts/a.pdf", "a.pdf")
+    assert f.want_file("Final/a.pdf", "a.pdf")
+
+
+def test_regex_rules_search_the_relative_path():
+    f = ItemFilter(exclude=[r"re:(^|/)\.git(/|$)"], root="COPY")
+    assert not f.want_dir("COPY/.git", ".git")
+    assert not f.want_file("COPY/lib/.git/config", "config")
+    assert f.want_file("COPY/lib/.gitignore", ".gitignore")
+    with pytest.raises(ValueError):
+        ItemFilter(exclude=["re:("])
+
+
+def test_extension_lists():
+    f = ItemFilter(extensions=".PDF, docx")                  # one comma string, like the GUI field
+    assert f.want_file("a.pdf", "a.pdf")
+    assert f.want_file("b.DOCX", "b.DOCX")
+    assert not f.want_file("c.xlsx", "c.xlsx")
+    assert not f.want_file("README", "README")
+
+    x = ItemFilter(exclude_extensions=["tmp", "bak"])
+    assert not x.want_file("a.BAK", "a.BAK")
+    assert x.want_file("README", "README")
+    assert x.want_file("a.tmp.pdf", "a.tmp.pdf")
+
+
+def test_sizes():
+    assert parse_size("1.5 GB") == int(1.5 * 1024 ** 3)
+    assert parse_size(500) == 500 and parse_size("") is None
+    with pytest.raises(ValueError):
+        parse_size("12 parsecs")
+    f = ItemFilter(min_size="1KB", max_size="2MB")
+    assert not f.want_file("a", "a", 100)
+    assert f.want_file("b", "b", 4096)
+    assert not f.want_file("c", "c", 3 * 1024 * 1024)
+    assert f.excluded_bytes == 100 + 3 * 1024 * 1024
+
+
+def test_modified_since():
+    f = ItemFilter(modified_since="2024-03-01T12:00:00+02:00")   # compared in UTC
+    assert f.needs_mtime
+    assert f.want_file("a", "a", 1, _item("2024-03-01T10:00:00Z"))
+    assert not f.want_file("b", "b", 1, _item("2024-03-01T09:59:59Z"))
+    assert f.want_file("c", "c", 1, {"lastModifiedDateTime": "2025-01-01T00:00:00Z"})
+    assert f.want_file("d", "d", 1, None)                         # nothing to compare: kept
+
+
+def test_from_spec_and_signature():
+    assert ItemFilter.from_spec({}) is None
+    assert ItemFilter.from_spec({"exclude": [], "min_size": ""}) is None
+    f = ItemFilter.from_spec({"exclude": ["b", "a"], "min_size": "1K", "other": 1})
+    # what resume state is keyed on: sorted rules, normalised values, unused keys left out
+    assert f.signature() == {"exclude": ["a", "b"], "min_size": 1024}
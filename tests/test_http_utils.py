@@ -0,0 +1,133 @@
+import time
+from threading import Lock
+
+import pytest
+
+from http_utils.credentials import AppCredential, CredentialPool
+from http_utils.hedging import Hedger
+from http_utils.http_utils import RobustHTTP
+from http_utils.retry_policy import RetryError
+
+
+class _Cred(AppCredential):
+    def _fetch(self):
+        return self.client_id, 3600.0
+
+
+class _Resp:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ""
+
+    def close(self):
+        pass
+
+
+class _Session:
+    """The first send (the primary) throttles after a while; the hedge behind it
+    answers `hedge_status` later still; anything later answers at once."""
+
+    def __init__(self, hedge_status=503):
+        self._lk = Lock()
+        self.sent = []
+        self.hedge_status = hedge_status
+
+    def request(self, method, url, headers=None, **kw):
+        with self._lk:
+            self.sent.append(headers["Authorization"].split()[-1])
+            n = len(self.sent)
+        if n == 1:
+            time.sleep(0.2)
+            return _Resp(429, {"Retry-After": "30"})
+        if n == 2:
+            time.sleep(1.0)
+            return _Resp(self.hedge_status)
+        return _Resp(200)
+
+
+def test_throttle_is_charged_to_the_credential_that_got_it():
+    a, b = _Cred("t", "A", "s"), _Cred("t", "B", "s")
+    pool = CredentialPool([a, b])
+    hedge = Hedger()
+    for _ in range(20):
+        hedge._record("item", 0.01)   # a p95 to hedge past
+    sess = _Session()
+    rh = RobustHTTP(sess, credentials=pool, hedge=hedge)
+
+    r = rh.get("https://graph.example/v1.0/drives/d/items/x")
+
+    assert r.status_code == 200
+    primary, hedged = sess.sent[:2]
+    assert primary != hedged
+    # both came back bad; the primary's 429 is the one retried on. The hedge,
+    # sent later under the other credential, must not take the blame
+    creds = {"A": a, "B": b}
+    assert creds[primary].throttles == 1
+    assert creds[hedged].throttles == 0
+    hedge.shutdown()
+
+
+def test_a_throttled_primary_does_not_beat_a_healthy_hedge():
+    pool = CredentialPool([_Cred("t", "A", "s"), _Cred("t", "B", "s")])
+    hedge = Hedger()
+    for _ in range(20):
+        hedge._record("item", 0.01)
+    sess = _Session(hedge_status=200)
+    rh = RobustHTTP(sess, credentials=pool, hedge=hedge)
+
+    r = rh.get("https://graph.example/v1.0/drives/d/items/x")
+
+    assert r.status_code == 200
+    assert len(sess.sent) == 2          # the hedge's answer was used; no retry
+    assert hedge.hedge_wins == 1
+    assert all(c.throttles == 0 for c in pool.creds)
+    assert hedge._lat["item"].n == 21   # the 429's latency isn't a sample
+    hedge.shutdown()
+
+
+class _Expiring(AppCredential):
+    # tokens "<client>-<n>"; the first one each credential fetches is already expired
+    def __init__(self, *a, **k):
+        super().__init__(*a, **k)
+        self.fetches = 0
+
+    def _fetch(self):
+        self.fetches += 1
+        return f"{self.client_id}-{self.fetches}", 3600.0
+
+
+class _AuthSession:
+    def __init__(self, accept=lambda tok: not tok.endswith("-1")):
+        self.accept = accept
+        self.sent = []
+
+    def request(self, method, url, headers=None, **kw):
+        tok = headers["Authorization"].split()[-1]
+        self.sent.append(tok)
+        return _Resp(200) if self.accept(tok) else _Resp(401)
+
+
+def test_each_pool_credential_gets_its_own_refresh():
+    a, b = _Expiring("t", "A", "s"), _Expiring("t", "B", "s")
+    a.token(), b.token()            # both cached, both expired together
+    sess = _AuthSession()
+    rh = RobustHTTP(sess, credentials=CredentialPool([a, b]))
+
+    r = rh.get("https://graph.example/v1.0/drives/d/items/x/children")
+
+    assert r.status_code == 200
+    # the retry after A's 401 went out under B's stale token; B was refreshed too
+    assert sorted(sess.sent[:2]) == ["A-1", "B-1"]
+    assert sess.sent[-1].endswith("-2")
+
+
+def test_second_auth_error_on_the_same_credential_gives_up():
+    a = _Expiring("t", "A", "s")
+    sess = _AuthSession(accept=lambda tok: False)
+    rh = RobustHTTP(sess, credentials=CredentialPool([a]))
+
+    with pytest.raises(RetryError) as ei:
+        rh.get("https://graph.example/v1.0/drives/d/items/x")
+    assert ei.value.reason == "auth"
+    assert sess.sent == ["A-1", "A-2"]
@@ -0,0 +1,47 @@
+import threading
+import time
+
+from ui.profiler import Profiler
+
+
+def test_cpu_capture_with_concurrent_spans(tmp_path):
+    # several threads inside spans while cProfile is on: none may fail, depth stays balanced
+    p = Profiler(tmp_path)
+    assert p.start_cpu()
+    errors, depths = [], []
+
+    def work():
+        try:
+            for _ in range(30):
+                with p.span("copy.upload"):
+                    with p.span("copy.session"):
+                        sum(i * i for i in range(500))
+                        time.sleep(0.001)
+        except Exception as e:
+            errors.append(e)
+        depths.append(getattr(p._tls, "depth", 0))
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    path = p.stop_cpu()
+    assert errors == []
+    assert depths == [0, 0, 0, 0]
+    assert path and (tmp_path / "profiles").exists()
+    assert p.spans()["copy.upload"]["count"] == 120
+
+
+def test_span_survives_a_broken_profiler(tmp_path, monkeypatch):
+    p = Profiler(tmp_path)
+    p.start_cpu()
+
+    def boom(t):
+        raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(p, "_cpu_enter", boom)
+    with p.span("files.probe"):
+        pass
+    assert getattr(p._tls, "depth", 0) == 0
+    p.stop_cpu()
@@ -0,0 +1,41 @@
+import pytest
+
+from ui.scheduler import JobScheduler
+
+A = {"SRC_DRIVE": "s", "SRC_PARENT": "p1", "DEST_DRIVE": "d", "DEST_PARENT": "q", "ROOT_NAME": "A"}
+B = {"SRC_DRIVE": "s", "SRC_PARENT": "p2", "DEST_DRIVE": "d", "DEST_PARENT": "q", "ROOT_NAME": "B"}
+
+
+def _sched(tmp_path):
+    s = JobScheduler(tenant="t", client="c", secret="x", state_dir=str(tmp_path), wave_name="w")
+    started = []
+
+    def _start(job_id, spec):
+        started.append(job_id)
+        s._results[job_id] = {"status": "done"}
+        s._wave["jobs"][job_id] = {"status": "done"}
+    s._start = _start
+    return s, started
+
+
+def test_rerun_skips_unnamed_jobs_that_finished(tmp_path):
+    s, started = _sched(tmp_path)
+    a = s.submit(A)
+    s._wave["jobs"][a] = {"status": "done"}   # finished in the first run; B never got to run
+    s._save_wave()
+
+    s2, started = _sched(tmp_path)
+    b = s2.submit(B)                          # a different order than the first run
+    assert s2.submit(A) == a
+    res = s2.run(poll=0)
+    assert started == [b]
+    assert set(res) == {a, b}
+
+
+def test_names_win_and_duplicates_are_refused(tmp_path):
+    s, _ = _sched(tmp_path)
+    assert s.submit({**A, "NAME": "finance"}) == "finance"
+    assert s.submit(A, name="explicit") == "explicit"
+    s.submit(B)
+    with pytest.raises(ValueError):
+        s.submit(dict(B))
@@ -0,0 +1,90 @@
+import multiprocessing as mp
+import time
+
+from ui.work_queue import WorkQueue
+
+
+def _drain(path, owner, out):
+    # claim and finish shards until none are left; report what this process ran
+    q = WorkQueue(path)
+    got = []
+    while True:
+        sh = q.claim(owner, lease_s=30)
+        if sh is None:
+            break
+        time.sleep(0.005)
+        assert q.complete(sh["id"], owner)
+        got.append(sh["key"])
+    q.close()
+    out.put(got)
+
+
+def _claim_and_die(path, ready):
+    # takes a shard under a short lease, then exits without completing it
+    q = WorkQueue(path)
+    sh = q.claim("dead", lease_s=0.3)
+    ready.put(sh["key"])
+
+
+def _mp():
+    return mp.get_context("spawn")
+
+
+def test_each_shard_runs_once_across_processes(tmp_path):
+    path = str(tmp_path / "q.db")
+    q = WorkQueue(path)
+    for n in range(60):
+        q.add(f"s{n}", {"n": n})
+    ctx = _mp()
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_drain, args=(path, f"w{k}", out)) for k in range(4)]
+    for p in procs:
+        p.start()
+    got = [out.get(timeout=60) for _ in procs]
+    for p in procs:
+        p.join(timeout=60)
+        assert p.exitcode == 0
+    keys = [k for g in got for k in g]
+    assert sorted(keys) == sorted(f"s{n}" for n in range(60))
+    assert q.counts() == {"queued": 0, "leased": 0, "done": 60, "failed": 0}
+    q.close()
+
+
+def test_lapsed_lease_is_taken_over_and_old_owner_loses_it(tmp_path):
+    path = str(tmp_path / "q.db")
+    q = WorkQueue(path)
+    q.add("a", {})
+    ctx = _mp()
+    ready = ctx.Queue()
+    p = ctx.Process(target=_claim_and_die, args=(path, ready))
+    p.start()
+    assert ready.get(timeout=60) == "a"
+    p.join(timeout=60)
+
+    assert q.claim("w2") is None            # still leased to the dead worker
+    time.sleep(0.4)
+    sh = q.claim("w2", lease_s=30)
+    assert sh["key"] == "a" and sh["attempts"] == 2
+    # the first owner's heartbeat and completion no longer count
+    assert not q.heartbeat(sh["id"], "dead")
+    assert not q.complete(sh["id"], "dead")
+    assert q.heartbeat(sh["id"], "w2")
+    assert q.complete(sh["id"], "w2")
+    assert q.status("a") == "done"
+    q.close()
+
+
+def test_fail_requeues_until_max_attempts(tmp_path):
+    q = WorkQueue(str(tmp_path / "q.db"))
+    q.add("a", {})
+    for attempt in (1, 2):
+        sh = q.claim("w")
+        assert sh["attempts"] == attempt
+        q.fail(sh["id"], "w", "boom", max_attempts=3)
+        assert q.status("a") == "queued"
+    sh = q.claim("w")
+    q.fail(sh["id"], "w", "boom", max_attempts=3)
+    assert q.status("a") == "failed"
+    assert q.claim("w") is None
+    assert not q.add("a", {})               # planning again doesn't requeue it
+    q.close()
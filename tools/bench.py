@@ -0,0 +1,234 @@
+"""End-to-end throughput benchmark against tools/fake_graph.py.
+
+    python -m tools.bench                                  # all scenarios, defaults
+    python -m tools.bench --scenarios tiny,huge --latency-ms 30 --bandwidth-mbps 400
+    python -m tools.bench --json out.json --compare baseline.json   # exit 1 on regression
+
+Each scenario builds a synthetic source tree in one in-process fake Graph
+and runs a full job (folders, files, audit) through the real Controller in
+a child process, so peak RSS is the tool's own. Reported per scenario:
+files/s, MB/s, wall and per-stage seconds, request counts by kind,
+throttles/401s/stalls injected, hedged GETs and peak RSS.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+__all__ = ["SCENARIOS", "build_tree", "run_scenario"]
+
+KB, MB = 1024, 1024 * 1024
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# name -> (description, builder(fake, root, scale))
+def _tiny(fake, root, scale):
+    for d in range(max(1, int(20 * scale))):
+        f = fake.add_folder(root, f"dir{d:03d}")
+        for i in range(250):
+            fake.add_file(f, f"f{i:04d}.txt", 4 * KB)
+
+
+def _huge(fake, root, scale):
+    for i in range(3):
+        fake.add_file(root, f"huge{i}.bin", int(128 * MB * scale))
+
+
+def _deep(fake, root, scale):
+    depth = max(2, int(8 * min(scale, 1.5)))
+
+    def _grow(parent, level):
+        for i in range(2):
+            fake.add_file(parent, f"leaf{i}.dat", 16 * KB)
+        if level >= depth:
+            return
+        for b in range(2):
+            _grow(fake.add_folder(parent, f"L{level}-{b}"), level + 1)
+    _grow(root, 1)
+
+
+def _mixed(fake, root, scale):
+    _tiny(fake, fake.add_folder(root, "small"), scale / 4)
+    for i in range(4):
+        fake.add_file(root, f"medium{i}.bin", int(24 * MB * scale))
+    _deep(fake, fake.add_folder(root, "tree"), scale / 2)
+
+
+SCENARIOS = {
+    "tiny":  ("many tiny files (5k x 4 KB)", _tiny),
+    "huge":  ("few huge files (3 x 128 MB, chunked sessions)", _huge),
+    "deep":  ("deep binary tree (511 folders, 2 files each)", _deep),
+    "mixed": ("mix of the three", _mixed),
+}
+
+
+def build_tree(fake, name, scale=1.0):
+    src = fake.add_drive(f"src-{name}")
+    dst = fake.add_drive(f"dst-{name}")
+    SCENARIOS[name][1](fake, src, scale)
+    return src, dst
+
+
+def _child(args):
+    # runs inside the child process: env already points graph_common at the fake
+    state_dir = tempfile.mkdtemp(prefix="spod-bench-")
+    try:
+        _child_job(args, state_dir)
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+
+def _child_job(args, state_dir):
+    import resource
+    from ui.controller import Controller
+
+    stages = []
+    c = Controller(
+        timeout=(10, 120),
+        chunk=args.chunk_mb * MB, min_chunk=1 * MB, max_single=args.max_single_mb * MB,
+        delete_extras=False, aimd=not args.no_aimd, state_dir=state_dir,
+    )
+    c.set_callbacks(log=lambda m: None, set_stage=lambda t: stages.append((time.perf_counter(), t)))
+    t0 = time.perf_counter()
+    c.start_job({
+        "SRC_DRIVE": f"src-{args.child}", "SRC_PARENT": "root",
+        "DEST_DRIVE": f"dst-{args.child}", "DEST_PARENT": f"dst-{args.child}-root",
+        "ROOT_NAME": "bench", "TENANT": "bench", "CLIENT": "bench", "SECRET": "bench",
+        "HEDGE": args.hedge,
+    })
+    result = c.wait_job()
+    wall = time.perf_counter() - t0
+
+    # stage_ok() re-sends the same text with a mark; a stage ends when the text changes
+    per_stage, cur, since = {}, None, t0
+    for ts, text in stages + [(t0 + wall, None)]:
+        name = text.split("  ")[0] if text else None
+        if name != cur:
+            if cur:
+                per_stage[cur] = per_stage.get(cur, 0.0) + ts - since
+            cur, since = name, ts
+    snap = c.get_stats()
+    json.dump({
+        "status": (result or {}).get("status"), "audit": (result or {}).get("audit"),
+        "files": snap["files_done"], "bytes": snap["bytes_done"], "wall_s": wall,
+        "hedged": snap.get("hedged", 0), "hedge_wins": snap.get("hedge_wins", 0),
+        "stages_s": {k: round(v, 3) for k, v in per_stage.items()},
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }, sys.stdout)
+
+
+def run_scenario(fake, name, args) -> dict:
+    build_tree(fake, name, args.scale)
+    fake.reset_stats()
+    env = {**os.environ, "SPOD_GRAPH_URL": fake.url, "SPOD_TOKEN_URL": fake.token_url,
+           "PYTHONPATH": os.pathsep.join([_ROOT, os.environ.get("PYTHONPATH", "")])}
+    cmd = [sys.executable, "-m", "tools.bench", "--child", name,
+           "--chunk-mb", str(args.chunk_mb), "--max-single-mb", str(args.max_single_mb), "--hedge", str(args.hedge)]
+    if args.no_aimd:
+        cmd.append("--no-aimd")
+    p = subprocess.run(cmd, cwd=_ROOT, env=env, capture_output=True, text=True, timeout=args.timeout)
+    if p.returncode != 0:
+        raise RuntimeError(f"{name}: child failed ({p.returncode}):\n{p.stderr[-4000:]}")
+    res = json.loads(p.stdout.strip().splitlines()[-1])
+    srv = fake.stats()
+    wall = res["wall_s"] or 1e-9
+    res.update({
+        "scenario": name,
+        "files_per_s": res["files"] / wall,
+        "mb_per_s": res["bytes"] / MB / wall,
+        "http_requests": srv["http_requests"],
+        "requests": {k: v for k, v in sorted(srv["by_kind"].items()) if not k.startswith("!")},
+        "throttled": sum(v for k, v in srv["by_kind"].items() if k.startswith("!throttled")),
+        "expired_401": srv["by_kind"].get("!expired_401", 0),
+        "stalled": srv["by_kind"].get("!slow", 0),
+    })
+    return res
+
+
+def _print(res):
+    print(f"== {res['scenario']}: {SCENARIOS[res['scenario']][0]}  [{res['status']}]")
+    print(f"   {res['files']:,} files, {res['bytes'] / MB:,.1f} MB in {res['wall_s']:.2f}s  ->  "
+          f"{res['files_per_s']:,.1f} files/s, {res['mb_per_s']:,.2f} MB/s, peak RSS {res['peak_rss_mb']:,.0f} MB")
+    print("   stages: " + ", ".join(f"{k} {v:.2f}s" for k, v in res["stages_s"].items()))
+    print(f"   requests: {res['http_requests']:,} http ("
+          + ", ".join(f"{k}={v}" for k, v in res["requests"].items())
+          + f"); throttled={res['throttled']}, 401={res['expired_401']}, stalled={res['stalled']}, "
+          f"hedged={res['hedged']} (won {res['hedge_wins']})")
+
+
+def _compare(results, baseline_path, tolerance) -> bool:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        base = {r["scenario"]: r for r in json.load(f)["results"]}
+    ok = True
+    for r in results:
+        b = base.get(r["scenario"])
+        if not b:
+            continue
+        for key in ("files_per_s", "mb_per_s"):
+            if b[key] > 0 and r[key] < b[key] * (1 - tolerance):
+                ok = False
+                print(f"REGRESSION {r['scenario']} {key}: {r[key]:.2f} vs baseline {b[key]:.2f}")
+        if b["http_requests"] and r["http_requests"] > b["http_requests"] * (1 + tolerance):
+            ok = False
+            print(f"REGRESSION {r['scenario']} http_requests: {r['http_requests']} vs baseline {b['http_requests']}")
+    return ok
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Throughput benchmark against a local fake Graph")
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma list of {', '.join(SCENARIOS)}")
+    ap.add_argument("--scale", type=float, default=1.0, help="multiply tree sizes")
+    ap.add_argument("--latency-ms", type=float, default=20)
+    ap.add_argument("--bandwidth-mbps", type=float, default=0, help="shared link, megabits/s (0 = unlimited)")
+    ap.add_argument("--throttle", type=float, default=0, help="share of requests answered 429")
+    ap.add_argument("--retry-after", default="1")
+    ap.add_argument("--token-ttl", type=float, default=0)
+    ap.add_argument("--slow-rate", type=float, default=0, help="share of metadata GETs that stall")
+    ap.add_argument("--slow-ms", type=float, default=3000)
+    ap.add_argument("--hedge", type=float, default=0, help="hedge slow GETs, extra-request budget in %% (0 = off)")
+    ap.add_argument("--chunk-mb", type=int, default=8)
+    ap.add_argument("--max-single-mb", type=int, default=4)
+    ap.add_argument("--no-aimd", action="store_true", help="run at max concurrency from the start")
+    ap.add_argument("--timeout", type=float, default=3600)
+    ap.add_argument("--json", help="write results here")
+    ap.add_argument("--compare", help="baseline JSON from an earlier --json run")
+    ap.add_argument("--tolerance", type=float, default=0.10)
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.child:
+        _child(args)
+        return 0
+
+    from tools.fake_graph import FakeGraph
+    fake = FakeGraph(latency=args.latency_ms / 1000, bandwidth=args.bandwidth_mbps * 1e6 / 8,
+                     throttle_rate=args.throttle, retry_after=args.retry_after,
+                     token_ttl=args.token_ttl, slow_rate=args.slow_rate, slow=args.slow_ms / 1000).start()
+    results = []
+    try:
+        for name in [s.strip() for s in args.scenarios.split(",") if s.strip()]:
+            if name not in SCENARIOS:
+                ap.error(f"unknown scenario {name!r}")
+            res = run_scenario(fake, name, args)
+            _print(res)
+            results.append(res)
+    finally:
+        fake.stop()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": {k: v for k, v in vars(args).items() if k not in ("child", "json", "compare")},
+                       "results": results}, f, indent=1)
+    if args.compare and not _compare(results, args.compare, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
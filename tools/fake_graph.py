@@ -0,0 +1,666 @@
+"""In-memory stand-in for the Graph drive endpoints this tool uses.
+
+    python -m tools.fake_graph --port 8402 --latency-ms 40 --throttle 0.02
+    export SPOD_GRAPH_URL=http://127.0.0.1:8402/v1.0
+    export SPOD_TOKEN_URL=http://127.0.0.1:8402/{tenant}/oauth2/v2.0/token
+
+Serves children listing (paged), path addressing (items/{id}:/a/b:),
+content GET with Range, simple PUT upload, upload sessions, folder create
+(conflictBehavior), server-side /copy with its monitor URL, PATCH,
+DELETE, /$batch (dependsOn, 424) and a
+client-credentials token endpoint. Latency, shared bandwidth, 429/503
+injection with Retry-After and server-side token expiry (401) are
+configurable. File bodies are generated from the item id, so huge
+synthetic trees cost no memory; uploads keep only size and digest.
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import itertools
+import json
+import random
+import re
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from urllib.parse import parse_qs, unquote, urlsplit
+
+__all__ = ["FakeGraph"]
+
+BLOCK = 64 * 1024
+HASH_LIMIT = 1024 ** 3      # synthetic files above this get no hash (digest would take seconds)
+IO_PIECE = 256 * 1024
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class _Pipe:
+    """Shared link of `bps` bytes/s: every transfer queues behind the others."""
+
+    def __init__(self, bps):
+        self.bps = float(bps or 0)
+        self._lk = Lock()
+        self._free_at = 0.0
+
+    def take(self, n):
+        if self.bps <= 0 or n <= 0:
+            return
+        with self._lk:
+            now = time.monotonic()
+            start = max(now, self._free_at)
+            self._free_at = start + n / self.bps
+            done = self._free_at
+        time.sleep(max(0.0, done - time.monotonic()))
+
+
+class _Item:
+    __slots__ = ("id", "name", "parent", "folder", "size", "digest", "etag_n", "created", "modified", "seed")
+
+    def __init__(self, id, name, parent, folder, size=0, digest=None, seed=None):
+        self.id = id
+        self.name = name
+        self.parent = parent
+        self.folder = folder
+        self.size = size
+        self.digest = digest
+        self.etag_n = 1
+        self.created = self.modified = _now_iso()
+        self.seed = seed  # synthetic content; None once overwritten by an upload
+
+
+def _block(seed: str) -> bytes:
+    h = hashlib.blake2b(seed.encode(), digest_size=64).digest()
+    return (h * (BLOCK // len(h) + 1))[:BLOCK]
+
+
+def _synthetic(seed, start, end):
+    # bytes [start, end) of the repeating per-item block
+    blk = _block(seed)
+    out = bytearray()
+    pos = start
+    while pos < end:
+        off = pos % BLOCK
+        take = min(BLOCK - off, end - pos)
+        out += blk[off:off + take]
+        pos += take
+    return bytes(out)
+
+
+def _digest_synthetic(seed, size):
+    d = hashlib.blake2b(digest_size=20)
+    blk = _block(seed)
+    full, rest = divmod(size, BLOCK)
+    for _ in range(full):
+        d.update(blk)
+    d.update(blk[:rest])
+    return base64.b64encode(d.digest()).decode()
+
+
+class _Resp(Exception):
+    def __init__(self, status, body=None, headers=None):
+        self.status, self.body, self.headers = status, body, headers or {}
+
+
+class FakeGraph:
+    def __init__(self, host="127.0.0.1", port=0, *, latency=0.0, bandwidth=0, throttle_rate=0.0,
+                 throttle_status=429, retry_after=1, token_ttl=0, page_size=200, seed=1, hashes=True,
+                 slow_rate=0.0, slow=0.0):
+        self.latency = float(latency)              # seconds added to every request
+        self.down = _Pipe(bandwidth)               # bytes/s shared by all downloads (0 = unlimited)
+        self.up = _Pipe(bandwidth)                 # ... and uploads
+        self.throttle_rate = float(throttle_rate)  # share of requests answered 429/503
+        self.throttle_status = int(throttle_status)
+        self.slow_rate = float(slow_rate)          # share of metadata GETs that stall (tail latency) ...
+        self.slow = float(slow)                    # ... for this many extra seconds
+        self.retry_after = retry_after
+        self.token_ttl = float(token_ttl)          # server-side token lifetime (0 = never expires)
+        self.page_size = int(page_size)
+        self.hashes = bool(hashes)                 # False: no quickXorHash anywhere (like some libraries)
+
+        self._lk = Lock()
+        self._rng = random.Random(seed)
+        self._ids = itertools.count(1)
+        self.items = {}        # id -> _Item
+        self.children = {}     # folder id -> {casefolded name: id}
+        self.drives = {}       # drive id -> root id
+        self.item_drive = {}   # id -> drive id
+        self.sessions = {}     # upload session id -> dict
+        self.copies = {}       # copy monitor id -> new item id
+        self.tokens = {}       # bearer -> issued at
+        self.counts = Counter()
+        self.bytes_in = self.bytes_out = 0
+
+        fake = self
+
+        class _H(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+            def log_message(self, *_a):
+                pass
+
+            def _serve(self, method):
+                fake._count("http")
+                n = int(self.headers.get("Content-Length") or 0)
+                body = fake._read(self.rfile, n) if n else b""
+                status, headers, payload = fake.dispatch(method, self.path, dict(self.headers), body)
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                if method != "HEAD":
+                    fake._write(self.wfile, payload)
+
+            def do_GET(self): self._serve("GET")
+            def do_POST(self): self._serve("POST")
+            def do_PUT(self): self._serve("PUT")
+            def do_PATCH(self): self._serve("PATCH")
+            def do_DELETE(self): self._serve("DELETE")
+
+        self.server = ThreadingHTTPServer((host, port), _H)
+        self.server.daemon_threads = True
+
+    # ---------- lifecycle ----------
+    @property
+    def base(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def url(self) -> str:
+        return f"{self.base}/v1.0"
+
+    @property
+    def token_url(self) -> str:
+        return f"{self.base}/{{tenant}}/oauth2/v2.0/token"
+
+    def start(self) -> "FakeGraph":
+        Thread(target=self.server.serve_forever, name="fake-graph", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self) -> dict:
+        with self._lk:
+            by_kind = {k: v for k, v in self.counts.items() if k != "http"}
+            return {"http_requests": self.counts.get("http", 0), "by_kind": by_kind,
+                    "bytes_in": self.bytes_in, "bytes_out": self.bytes_out}
+
+    def reset_stats(self):
+        with self._lk:
+            self.counts.clear()
+            self.bytes_in = self.bytes_out = 0
+
+    # ---------- population ----------
+    def add_drive(self, drive_id: str) -> str:
+        with self._lk:
+            root = f"{drive_id}-root"
+            self.items[root] = _Item(root, "root", None, True)
+            self.children[root] = {}
+            self.drives[drive_id] = root
+            self.item_drive[root] = drive_id
+            return root
+
+    def add_folder(self, parent_id: str, name: str) -> str:
+        with self._lk:
+            return self._put_item(parent_id, name, folder=True).id
+
+    def add_file(self, parent_id: str, name: str, size: int, modified: str = None) -> str:
+        with self._lk:
+            it = self._put_item(parent_id, name, folder=False)
+            self._bump(parent_id, int(size) - it.size)
+            it.size, it.seed = int(size), it.id
+            it.digest = _digest_synthetic(it.id, it.size) if size <= HASH_LIMIT else None
+            if modified:
+                it.created = it.modified = modified
+            return it.id
+
+    def _put_item(self, parent_id, name, *, folder):
+        kids = self.children[parent_id]
+        key = name.casefold()
+        if key in kids:
+            it = self.items[kids[key]]
+            it.etag_n += 1
+            it.modified = _now_iso()
+            return it
+        it = _Item(f"i{next(self._ids)}", name, parent_id, folder)
+        self.items[it.id] = it
+        self.item_drive[it.id] = self.item_drive[parent_id]
+        kids[key] = it.id
+        if folder:
+            self.children[it.id] = {}
+        return it
+
+    def _bump(self, folder_id, delta):
+        # keep folder sizes as subtree totals
+        while folder_id is not None and delta:
+            f = self.items[folder_id]
+            f.size += delta
+            folder_id = f.parent
+
+    def _remove(self, item_id, top=True):
+        it = self.items.pop(item_id)
+        if top:
+            self._bump(it.parent, -it.size)
+        self.item_drive.pop(item_id, None)
+        for cid in list(self.children.pop(item_id, {}).values()):
+            self._remove(cid, top=False)
+        if it.parent in self.children:
+            self.children[it.parent].pop(it.name.casefold(), None)
+
+    def tree_size(self, item_id) -> tuple:
+        """(files, bytes) below item_id."""
+        with self._lk:
+            files = total = 0
+            stack = [item_id]
+            while stack:
+                for cid in self.children.get(stack.pop(), {}).values():
+                    it = self.items[cid]
+                    if it.folder:
+                        stack.append(cid)
+                    else:
+                        files += 1
+                        total += it.size
+            return files, total
+
+    # ---------- wire helpers ----------
+    def _read(self, rfile, n):
+        out = bytearray()
+        while len(out) < n:
+            piece = rfile.read(min(IO_PIECE, n - len(out)))
+            if not piece:
+                break
+            self.up.take(len(piece))
+            out += piece
+        with self._lk:
+            self.bytes_in += len(out)
+        return bytes(out)
+
+    def _write(self, wfile, payload):
+        for k in range(0, len(payload), IO_PIECE):
+            piece = payload[k:k + IO_PIECE]
+            self.down.take(len(piece))
+            wfile.write(piece)
+        with self._lk:
+            self.bytes_out += len(payload)
+
+    def _count(self, key):
+        with self._lk:
+            self.counts[key] += 1
+
+    def _item_json(self, it):
+        d = {
+            "id": it.id, "name": it.name, "eTag": f'"{{{it.id}}},{it.etag_n}"',
+            "size": it.size,  # folders: subtree total, like Graph
+            "parentReference": {"driveId": self.item_drive.get(it.id), "id": it.parent},
+            "fileSystemInfo": {"createdDateTime": it.created, "lastModifiedDateTime": it.modified},
+            "lastModifiedDateTime": it.modified,
+        }
+        if it.folder:
+            d["folder"] = {"childCount": len(self.children.get(it.id, {}))}
+        else:
+            d["file"] = {"hashes": {"quickXorHash": it.digest}} if it.digest and self.hashes else {}
+        return d
+
+    # ---------- dispatch ----------
+    def dispatch(self, method, raw_path, headers, body, *, sub=False):
+        """-> (status, headers, payload bytes). Also used for $batch sub-requests."""
+        if self.latency and not sub:
+            time.sleep(self.latency)
+        u = urlsplit(raw_path)
+        path, query = u.path, {k: v[0] for k, v in parse_qs(u.query, keep_blank_values=True).items()}
+        try:
+            if path.endswith("/oauth2/v2.0/token") and method == "POST":
+                return self._token(body)
+            if path.startswith("/upload/"):
+                return self._json(*self._session(method, path.rsplit("/", 1)[1], headers, body))
+            if path.startswith("/monitor/") and method == "GET":
+                return self._monitor(path.rsplit("/", 1)[1])
+            if path.startswith("/v1.0"):
+                path = path[len("/v1.0"):]
+            if not sub:
+                self._auth(headers)  # $batch sub-requests ride on the outer token
+            if self.throttle_rate:
+                with self._lk:
+                    hit = self._rng.random() < self.throttle_rate
+                if hit:
+                    self._count(f"!throttled_{self.throttle_status}")
+                    raise _Resp(self.throttle_status, {"error": {"code": "TooManyRequests"}},
+                                {"Retry-After": str(self.retry_after)})
+            if path == "/$batch" and method == "POST":
+                return self._json(200, self._batch(json.loads(body or b"{}")))
+            if self.slow_rate and method == "GET" and not sub and not path.endswith("/content"):
+                with self._lk:
+                    hit = self._rng.random() < self.slow_rate
+                if hit:
+                    self._count("!slow")
+                    time.sleep(self.slow)
+            return self._drive_route(method, path, query, headers, body)
+        except _Resp as r:
+            return self._json(r.status, r.body, r.headers)
+
+    def _json(self, status, body=None, headers=None):
+        if isinstance(body, (bytes, bytearray)):
+            return status, dict(headers or {}), bytes(body)
+        h = {"Content-Type": "application/json", **(headers or {})}
+        return status, h, (json.dumps(body).encode() if body is not None else b"")
+
+    def _token(self, body):
+        form = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+        if form.get("grant_type") != "client_credentials" or not form.get("client_id"):
+            return self._json(400, {"error": "invalid_request"})
+        self._count("token")
+        tok = f"fake.{form['client_id']}.{next(self._ids)}"
+        with self._lk:
+            self.tokens[tok] = time.time()
+        # advertised lifetime stays long; token_ttl expires it early server-side (401 path)
+        return self._json(200, {"token_type": "Bearer", "expires_in": 3600, "access_token": tok})
+
+    def _auth(self, headers):
+        auth = headers.get("Authorization") or headers.get("authorization") or ""
+        if not auth.startswith("Bearer "):
+            raise _Resp(401, {"error": {"code": "InvalidAuthenticationToken", "message": "missing token"}})
+        tok = auth[7:]
+        with self._lk:
+            issued = self.tokens.setdefault(tok, time.time())
+        if self.token_ttl and time.time() - issued > self.token_ttl:
+            self._count("!expired_401")
+            raise _Resp(401, {"error": {"code": "InvalidAuthenticationToken", "message": "token expired"}})
+
+    def _resolve(self, drive, base, rel):
+        with self._lk:
+            if drive not in self.drives:
+                raise _Resp(404, {"error": {"code": "itemNotFound", "message": "drive"}})
+            cur = self.drives[drive] if base == "root" else base
+            if cur not in self.items:
+                raise _Resp(404, {"error": {"code": "itemNotFound"}})
+            for seg in [s for s in (rel or "").split("/") if s]:
+                nxt = self.children.get(cur, {}).get(unquote(seg).casefold())
+                if nxt is None:
+                    raise _Resp(404, {"error": {"code": "itemNotFound"}})
+                cur = nxt
+            return cur
+
+    _ROUTE = re.compile(r"^/drives/([^/]+)/(root|items/([^/:]+))(?::/(.*?):)?(/[A-Za-z]+)?/?$")
+    # counter key per (method, tail); GET of an item or its content is split below
+    _KINDS = {("PUT", "content"): "upload_small", ("POST", "createUploadSession"): "session_create",
+              ("GET", "children"): "list", ("POST", "children"): "folder_create", ("POST", "copy"): "copy",
+              ("DELETE", ""): "delete", ("PATCH", ""): "patch"}
+
+    def _drive_route(self, method, path, query, headers, body):
+        m = self._ROUTE.match(path)
+        if not m:
+            raise _Resp(400, {"error": {"code": "invalidRequest", "message": f"unsupported path {path}"}})
+        drive, _, item, rel, tail = m.groups()
+        base = item or "root"
+        tail = (tail or "").lstrip("/")
+
+        # counted before the path resolves, so a probe that misses (404) shows up too
+        if method == "GET" and tail == "":
+            kind = "item_path" if rel else "item"
+        elif method == "GET" and tail == "content":
+            kind = "content_range" if (headers.get("Range") or headers.get("range")) else "content"
+        else:
+            kind = self._KINDS.get((method, tail))
+        if kind:
+            self._count(kind)
+
+        # creates/uploads address a parent plus a new name
+        if tail == "content" and method == "PUT":
+            parent_rel, _, name = (rel or "").rpartition("/")
+            pid = self._resolve(drive, base, parent_rel)
+            return self._upload_small(pid, unquote(name), body)
+        if tail == "createUploadSession" and method == "POST":
+            parent_rel, _, name = (rel or "").rpartition("/")
+            pid = self._resolve(drive, base, parent_rel)
+            return self._new_session(pid, unquote(name), body)
+
+        iid = self._resolve(drive, base, rel)
+        if tail == "children" and method == "GET":
+            return self._list(drive, iid, path, query)
+        if tail == "children" and method == "POST":
+            return self._create_folder(iid, json.loads(body or b"{}"))
+        if tail == "content" and method == "GET":
+            return self._content(iid, headers)
+        if tail == "copy" and method == "POST":
+            return self._copy(iid, query, json.loads(body or b"{}"))
+        if tail == "" and method == "GET":
+            with self._lk:
+                return self._json(200, self._item_json(self.items[iid]))
+        if tail == "" and method == "DELETE":
+            with self._lk:
+                if iid == self.drives[drive]:
+                    raise _Resp(403, {"error": {"code": "accessDenied"}})
+                self._remove(iid)
+            return self._json(204)
+        if tail == "" and method == "PATCH":
+            patch = json.loads(body or b"{}")
+            with self._lk:
+                it = self.items[iid]
+                fsi = patch.get("fileSystemInfo") or {}
+                it.created = fsi.get("createdDateTime", it.created)
+                it.modified = fsi.get("lastModifiedDateTime", it.modified)
+                if patch.get("name"):
+                    kids = self.children[it.parent]
+                    kids.pop(it.name.casefold(), None)
+                    it.name = patch["name"]
+                    kids[it.name.casefold()] = it.id
+                it.etag_n += 1
+                return self._json(200, self._item_json(it))
+        raise _Resp(405, {"error": {"code": "invalidRequest", "message": f"{method} {path}"}})
+
+    def _list(self, drive, iid, path, query):
+        top = min(int(query.get("$top") or self.page_size), 999)
+        skip = int(query.get("$skiptoken") or 0)
+        with self._lk:
+            if not self.items[iid].folder:
+                raise _Resp(400, {"error": {"code": "invalidRequest", "message": "not a folder"}})
+            kids = sorted((self.items[c] for c in self.children[iid].values()), key=lambda it: it.name.casefold())
+            page = [self._item_json(it) for it in kids[skip:skip + top]]
+        out = {"value": page}
+        if skip + top < len(kids):
+            q = "&".join(f"{k}={v}" for k, v in query.items() if k != "$skiptoken")
+            out["@odata.nextLink"] = f"{self.url}{path}?{q}&$skiptoken={skip + top}"
+        return self._json(200, out)
+
+    def _create_folder(self, pid, req):
+        name = req.get("name") or ""
+        if not name or "folder" not in req:
+            raise _Resp(400, {"error": {"code": "invalidRequest"}})
+        behavior = req.get("@microsoft.graph.conflictBehavior", "fail")
+        with self._lk:
+            if not self.items[pid].folder:
+                raise _Resp(400, {"error": {"code": "invalidRequest", "message": "parent is a file"}})
+            kids = self.children[pid]
+            if name.casefold() in kids:
+                if behavior == "fail":
+                    raise _Resp(409, {"error": {"code": "nameAlreadyExists"}})
+                if behavior == "rename":
+                    n = 1
+                    while f"{name} {n}".casefold() in kids:
+                        n += 1
+                    name = f"{name} {n}"
+                elif not self.items[kids[name.casefold()]].folder:
+                    raise _Resp(409, {"error": {"code": "nameAlreadyExists"}})
+                else:
+                    return self._json(200, self._item_json(self.items[kids[name.casefold()]]))
+            it = self._put_item(pid, name, folder=True)
+            return self._json(201, self._item_json(it))
+
+    def _content(self, iid, headers):
+        with self._lk:
+            it = self.items[iid]
+            if it.folder:
+                raise _Resp(400, {"error": {"code": "invalidRequest"}})
+            size, seed = it.size, it.seed
+        if seed is None:
+            raise _Resp(501, {"error": {"code": "notImplemented", "message": "uploaded content is not kept"}})
+        rng = headers.get("Range") or headers.get("range")
+        if rng:
+            m = re.match(r"bytes=(\d+)-(\d*)", rng)
+            start = int(m.group(1))
+            end = min(size - 1, int(m.group(2))) if m.group(2) else size - 1
+            if start >= size:
+                raise _Resp(416, {"error": {"code": "invalidRange"}}, {"Content-Range": f"bytes */{size}"})
+            return 206, {"Content-Type": "application/octet-stream",
+                         "Content-Range": f"bytes {start}-{end}/{size}"}, _synthetic(seed, start, end + 1)
+        return 200, {"Content-Type": "application/octet-stream"}, _synthetic(seed, 0, size)
+
+    def _copy(self, iid, query, req):
+        # done at once; the monitor reports it completed on the first poll
+        ref = req.get("parentReference") or {}
+        with self._lk:
+            src = self.items[iid]
+            pid = ref.get("id") or src.parent
+            if src.folder or pid not in self.children:
+                raise _Resp(400, {"error": {"code": "invalidRequest"}})
+            name = req.get("name") or src.name
+            kids = self.children[pid]
+            existing = kids.get(name.casefold())
+            if existing and (self.items[existing].folder or
+                             query.get("@microsoft.graph.conflictBehavior", "fail") != "replace"):
+                raise _Resp(409, {"error": {"code": "nameAlreadyExists"}})
+            it = self._put_item(pid, name, folder=False)
+            self._bump(pid, src.size - it.size)
+            it.size, it.digest, it.seed = src.size, src.digest, src.seed
+            it.created, it.modified = src.created, src.modified
+            mid = f"m{next(self._ids)}"
+            self.copies[mid] = it.id
+        return self._json(202, None, {"Location": f"{self.base}/monitor/{mid}"})
+
+    def _monitor(self, mid):
+        self._count("copy_monitor")
+        with self._lk:
+            iid = self.copies.get(mid)
+        if iid is None:
+            return self._json(404, {"error": {"code": "itemNotFound"}})
+        return self._json(200, {"status": "completed", "percentageComplete": 100.0, "resourceId": iid})
+
+    def _store_upload(self, pid, name, size, digest, fsi=None):
+        with self._lk:
+            kids = self.children[pid]
+            existing = kids.get(name.casefold())
+            if existing and self.items[existing].folder:
+                raise _Resp(409, {"error": {"code": "nameAlreadyExists"}})
+            created = existing is None
+            it = self._put_item(pid, name, folder=False)
+            self._bump(pid, size - it.size)
+            it.size, it.digest, it.seed = size, digest, None
+            fsi = fsi or {}
+            it.created = fsi.get("createdDateTime", it.created)
+            it.modified = fsi.get("lastModifiedDateTime", it.modified)
+            return (201 if created else 200), self._item_json(it)
+
+    def _upload_small(self, pid, name, body):
+        d = hashlib.blake2b(body, digest_size=20).digest()
+        status, j = self._store_upload(pid, name, len(body), base64.b64encode(d).decode())
+        return self._json(status, j)
+
+    def _new_session(self, pid, name, body):
+        sid = f"s{next(self._ids)}"
+        with self._lk:
+            fsi = ((json.loads(body or b"{}").get("item") or {}).get("fileSystemInfo"))
+            self.sessions[sid] = {"parent": pid, "name": name, "received": 0, "total": None, "fsi": fsi,
+                                  "hasher": hashlib.blake2b(digest_size=20), "expires": time.time() + 3600}
+        return self._json(200, {"uploadUrl": f"{self.base}/upload/{sid}",
+                                "expirationDateTime": _now_iso(), "nextExpectedRanges": ["0-"]})
+
+    def _session(self, method, sid, headers, body):
+        with self._lk:
+            s = self.sessions.get(sid)
+        if s is None:
+            self._count("session_missing")
+            return 404, {"error": {"code": "itemNotFound", "message": "upload session"}}
+        if method == "GET":
+            self._count("session_status")
+            return 200, {"nextExpectedRanges": [f"{s['received']}-"], "expirationDateTime": _now_iso()}
+        if method == "DELETE":
+            with self._lk:
+                self.sessions.pop(sid, None)
+            return 204, None
+        if method != "PUT":
+            return 405, {"error": {"code": "invalidRequest"}}
+        self._count("session_put")
+        m = re.match(r"bytes (\d+)-(\d+)/(\d+)", headers.get("Content-Range") or "")
+        if not m:
+            return 400, {"error": {"code": "invalidRequest", "message": "Content-Range"}}
+        start, end, total = (int(x) for x in m.groups())
+        with self._lk:
+            if start != s["received"] or end - start + 1 != len(body):
+                return 416, {"error": {"code": "invalidRange"}, "nextExpectedRanges": [f"{s['received']}-"]}
+            s["hasher"].update(body)
+            s["received"] = end + 1
+            s["total"] = total
+            done = s["received"] >= total
+            if done:
+                self.sessions.pop(sid, None)
+        if done:
+            status, j = self._store_upload(s["parent"], s["name"], total, base64.b64encode(s["hasher"].digest()).decode(),
+                                           s["fsi"])
+            return status, j
+        return 202, {"nextExpectedRanges": [f"{s['received']}-"], "expirationDateTime": _now_iso()}
+
+    def _batch(self, req):
+        subs = req.get("requests") or []
+        if len(subs) > 20:
+            raise _Resp(400, {"error": {"code": "invalidRequest", "message": "more than 20 requests"}})
+        self._count("batch")
+        status_of, out = {}, []
+        for r in subs:
+            rid = str(r.get("id"))
+            if any(status_of.get(str(d), 599) >= 400 for d in r.get("dependsOn") or []):
+                st, hdr, payload = 424, {}, json.dumps({"error": {"code": "failedDependency"}}).encode()
+            else:
+                body = r.get("body")
+                raw = json.dumps(body).encode() if isinstance(body, (dict, list)) else (body or "").encode()
+                st, hdr, payload = self.dispatch(r.get("method", "GET").upper(), "/v1.0" + r["url"],
+                                                 dict(r.get("headers") or {}), raw, sub=True)
+            self._count("batch_sub")
+            status_of[rid] = st
+            try:
+                j = json.loads(payload) if payload else None
+            except ValueError:
+                j = None
+            out.append({"id": rid, "status": st, "headers": hdr, "body": j})
+        return {"responses": out}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Local fake of the Graph drive endpoints")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8402)
+    ap.add_argument("--latency-ms", type=float, default=0)
+    ap.add_argument("--bandwidth-mbps", type=float, default=0, help="shared link, megabits/s (0 = unlimited)")
+    ap.add_argument("--throttle", type=float, default=0, help="share of requests answered 429/503")
+    ap.add_argument("--throttle-status", type=int, default=429, choices=(429, 503))
+    ap.add_argument("--retry-after", default="1")
+    ap.add_argument("--token-ttl", type=float, default=0, help="seconds before a token starts getting 401")
+    ap.add_argument("--slow-rate", type=float, default=0, help="share of metadata GETs that stall")
+    ap.add_argument("--slow-ms", type=float, default=3000, help="how long a stalled GET takes")
+    ap.add_argument("--drive", action="append", default=["src", "dst"], help="drive ids to create")
+    args = ap.parse_args(argv)
+    fake = FakeGraph(args.host, args.port, latency=args.latency_ms / 1000,
+                     bandwidth=args.bandwidth_mbps * 1e6 / 8, throttle_rate=args.throttle,
+                     throttle_status=args.throttle_status, retry_after=args.retry_after,
+                     token_ttl=args.token_ttl, slow_rate=args.slow_rate, slow=args.slow_ms / 1000)
+    for d in dict.fromkeys(args.drive):
+        fake.add_drive(d)
+    print(f"SPOD_GRAPH_URL={fake.url}", flush=True)
+    print(f"SPOD_TOKEN_URL={fake.token_url}", flush=True)
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Local stand-in for the Entra ID client-credentials token endpoint.
+
+    python -m tools.token_stub --port 8401 --expires 600
+    export SPOD_TOKEN_URL=http://127.0.0.1:8401/{tenant}/oauth2/v2.0/token
+
+Issues opaque tokens "stub.<client_id>.<n>" (any secret is accepted unless
+--secrets maps client ids to the expected secret). Pair it with a fake
+Graph that checks the token prefix to test credential pools offline.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.parse import parse_qs
+
+__all__ = ["TokenStub"]
+
+
+class TokenStub:
+    def __init__(self, host="127.0.0.1", port=0, *, expires_in=3600, secrets=None):
+        self.expires_in = int(expires_in)
+        self.secrets = dict(secrets or {})
+        self.issued = {}            # client_id -> count
+        self._seq = itertools.count(1)
+        stub = self
+
+        class _H(BaseHTTPRequestHandler):
+            def log_message(self, *_a):
+                pass
+
+            def do_POST(self):
+                n = int(self.headers.get("Content-Length") or 0)
+                form = {k: v[0] for k, v in parse_qs(self.rfile.read(n).decode()).items()}
+                cid, sec = form.get("client_id", ""), form.get("client_secret", "")
+                if form.get("grant_type") != "client_credentials" or not cid:
+                    return self._send(400, {"error": "invalid_request"})
+                if cid in stub.secrets and stub.secrets[cid] != sec:
+                    return self._send(401, {"error": "invalid_client"})
+                stub.issued[cid] = stub.issued.get(cid, 0) + 1
+                self._send(200, {
+                    "token_type": "Bearer",
+                    "expires_in": stub.expires_in,
+                    "access_token": f"stub.{cid}.{next(stub._seq)}",
+                })
+
+            def _send(self, code, body):
+                raw = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        self.server = ThreadingHTTPServer((host, port), _H)
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/{{tenant}}/oauth2/v2.0/token"
+
+    def start(self) -> "TokenStub":
+        Thread(target=self.server.serve_forever, name="token-stub", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Local client-credentials token endpoint")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8401)
+    ap.add_argument("--expires", type=int, default=3600)
+    ap.add_argument("--secrets", help='JSON object {"client_id": "secret", ...}')
+    args = ap.parse_args(argv)
+    stub = TokenStub(args.host, args.port, expires_in=args.expires,
+                     secrets=json.loads(args.secrets) if args.secrets else None)
+    print(f"SPOD_TOKEN_URL={stub.url}", flush=True)
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
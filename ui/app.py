@@ -1,12 +1,18 @@
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, filedialog
 from tkinter.scrolledtext import ScrolledText
-from queue import Queue
+from queue import Queue, Empty
+from collections import deque
+from ui.ui_executor import UiExecutor
+from pathlib import Path
 
 ENTRY_W   = 40   # left side text entries
 COMBO_W   = 36   # source/dest combo boxes
 LOG_W     = 120  # scrolling text width
 LOG_H     = 22   # Scrolling text height
+LOG_MAX_LINES = 5000  # lines kept in the Output widget (full log goes to file)
+LOG_TICK_MS   = 150   # drain interval
+LOADING       = "loading…"
 
 
 class App:
@@ -28,6 +34,7 @@ class App:
         self.dest_drive_var = tk.StringVar()
         self.dest_parent_var = tk.StringVar()
         self.root_name_var = tk.StringVar(value="SRC_ROOT")
+        self.exclude_var = tk.StringVar()
 
         self.src_site_name_var   = tk.StringVar()
         self.src_lib_name_var    = tk.StringVar()
@@ -47,6 +54,14 @@ class App:
         self.eta_var      = tk.StringVar(value="--:--:--")
         self.workers_var  = tk.StringVar(value="1")
         self.throttle_var = tk.StringVar(value="0")
+        self.verbosity_var = tk.StringVar(value=getattr(controller, "VERBOSITY", "all"))
+        self.skip_mode_var = tk.StringVar(value=getattr(controller, "SKIP_MODE", "hash"))
+        self.audit_var = tk.StringVar(value=getattr(controller, "AUDIT", "full"))
+        self.prof_cpu_var = tk.StringVar(value="CPU profile")
+        self.prof_mem_var = tk.StringVar(value="Mem profile")
+
+        # directory index version last shown in the site combos
+        self._dir_version = 0
 
         # logger
         self.LOGQ = Queue()
@@ -54,6 +69,9 @@ class App:
         # Build UI once
         self._build_ui()
 
+        # Graph lookups triggered from the UI run here, never on the Tk thread
+        self.io = UiExecutor(self.root, log=self.log)
+
         # Wire controller->app callbacks
         self.controller.set_callbacks(log=self.log, set_stage=self.set_stage)
 
@@ -105,6 +123,7 @@ class App:
             ("DEST_DRIVE", self.dest_drive_var),
             ("DEST_PARENT",self.dest_parent_var),
             ("ROOT_NAME",  self.root_name_var),
+            ("EXCLUDE",    self.exclude_var),
         ]
         for i, (label, var) in enumerate(fields):
             ttk.Label(top_fields, text=label).grid(row=i, column=0, sticky="w", padx=6, pady=4)
@@ -123,7 +142,7 @@ class App:
         #source pickers
         r = 0
         ttk.Label(top_source, text="Site").grid(row=r, column=0, sticky="w")
-        self.src_site_combo = ttk.Combobox(top_source, textvariable=self.src_site_name_var, width=COMBO_W, state="readonly")
+        self.src_site_combo = ttk.Combobox(top_source, textvariable=self.src_site_name_var, width=COMBO_W)
         self.src_site_combo.grid(row=r, column=1, sticky="ew", padx=6, pady=2); r += 1
 
         ttk.Label(top_source, text="Library").grid(row=r, column=0, sticky="w")
@@ -146,7 +165,7 @@ class App:
         # Destination: SharePoint subframe
         self.dest_sp = ttk.Frame(top_source)
         ttk.Label(self.dest_sp, text="Site").grid(row=0, column=0, sticky="w")
-        self.dest_site_combo = ttk.Combobox(self.dest_sp, textvariable=self.dest_site_name_var, width=COMBO_W, state="readonly")
+        self.dest_site_combo = ttk.Combobox(self.dest_sp, textvariable=self.dest_site_name_var, width=COMBO_W)
         self.dest_site_combo.grid(row=0, column=1, sticky="ew", padx=6, pady=2)
 
         ttk.Label(self.dest_sp, text="Library").grid(row=1, column=0, sticky="w")
@@ -186,6 +205,20 @@ class App:
         ttk.Label(top_stats, text="Throttles").grid(row=5, column=0, sticky="w")
         ttk.Label(top_stats, textvariable=self.throttle_var).grid(row=5, column=1, sticky="e")
 
+        ttk.Label(top_stats, text="Verbosity").grid(row=6, column=0, sticky="w", pady=(8, 0))
+        self.verbosity_combo = ttk.Combobox(top_stats, textvariable=self.verbosity_var, width=8,
+                                            state="readonly", values=("all", "sample", "quiet"))
+        self.verbosity_combo.grid(row=6, column=1, sticky="e", pady=(8, 0))
+        self.verbosity_combo.bind("<<ComboboxSelected>>", self.on_verbosity_chosen)
+
+        # unchanged-file check, read at Start
+        ttk.Label(top_stats, text="Skip check").grid(row=7, column=0, sticky="w")
+        ttk.Combobox(top_stats, textvariable=self.skip_mode_var, width=8,
+                     state="readonly", values=("hash", "mtime")).grid(row=7, column=1, sticky="e")
+        ttk.Label(top_stats, text="Audit").grid(row=8, column=0, sticky="w")
+        ttk.Combobox(top_stats, textvariable=self.audit_var, width=8,
+                     state="readonly", values=("full", "sample")).grid(row=8, column=1, sticky="e")
+
         # Output (spans all 3 columns)
         out = ttk.LabelFrame(self.root, text="Output", padding=6)
         out.grid(row=1, column=0, columnspan=3, sticky="nsew", padx=6, pady=6)
@@ -200,9 +233,18 @@ class App:
         ttk.Button(self.root, text="Start",   command=self.on_start).grid( row=2, column=0, sticky="ew", padx=6, pady=6)
         ttk.Button(self.root, text="Cancel",  command=self.on_cancel).grid(row=2, column=1, sticky="ew", padx=6, pady=6)
         ttk.Button(self.root, text="Connect", command=self.on_connect).grid(row=2, column=2, sticky="ew", padx=6, pady=6)
+        ttk.Button(self.root, text="Plan (dry run)", command=self.on_plan).grid(row=3, column=0, sticky="ew", padx=6, pady=(0, 6))
+        ttk.Button(self.root, text="Run plan…",      command=self.on_run_plan).grid(row=3, column=1, sticky="ew", padx=6, pady=(0, 6))
+        prof = ttk.Frame(self.root); prof.grid(row=3, column=2, sticky="ew", padx=6, pady=(0, 6))
+        prof.columnconfigure((0, 1), weight=1)
+        ttk.Button(prof, textvariable=self.prof_cpu_var, command=self.on_profile_cpu).grid(row=0, column=0, sticky="ew")
+        ttk.Button(prof, textvariable=self.prof_mem_var, command=self.on_profile_mem).grid(row=0, column=1, sticky="ew", padx=(6, 0))
 
         # Binders
         self.src_site_combo.bind("<<ComboboxSelected>>", self.on_src_site_selected)
+        self.src_site_combo.bind("<KeyRelease>", lambda e: self.on_site_typed(self.src_site_combo, e))
+        self.dest_site_combo.bind("<KeyRelease>", lambda e: self.on_site_typed(self.dest_site_combo, e))
+        self.dest_user_entry.bind("<KeyRelease>", self.on_user_typed)
         self.src_lib_combo.bind("<<ComboboxSelected>>", self.on_src_lib_selected)
         self.src_parent_combo.bind("<<ComboboxSelected>>", self.on_src_parent_chosen)
         # Destination bindings (SP)
@@ -238,6 +280,16 @@ class App:
         self.elapsed_var.set(self._fmt_hms(elapsed))
         self.workers_var.set(str(workers))
         self.throttle_var.set(str(throttles))
+        # captures also end on their own at job end
+        self.prof_cpu_var.set("Stop CPU profile" if self.controller.prof.cpu_on else "CPU profile")
+        self.prof_mem_var.set("Stop mem profile" if self.controller.prof.mem_on else "Mem profile")
+
+        # background index refresh landed: re-filter with whatever is typed
+        v = self.controller.directory_version()
+        if v != self._dir_version:
+            self._dir_version = v
+            self.src_site_combo["values"] = self.controller.site_names(self.src_site_combo.get())
+            self.dest_site_combo["values"] = self.controller.site_names(self.dest_site_combo.get())
 
         # ETA (file-count based)
         if files_done > 0 and files_total > 0 and elapsed > 0:
@@ -251,29 +303,75 @@ class App:
         self.root.after(1000, self._tick_stats)
 
     # GUI handlers
+    # every handler below that needs Graph goes through self.io: the call runs
+    # on a worker, the callback on the Tk thread, superseded picks are dropped
+    def _io_error(self, what):
+        def _cb(e):
+            self.set_stage(f"{what} failed")
+            self.log(f"[ERROR] {what}: {type(e).__name__}: {e}")
+        return _cb
+
+    def _loading(self, *combos):
+        for c in combos:
+            c["values"] = ()
+            c.set(LOADING)
+
     def on_connect(self):
-        names = self.controller.connect(
+        self.set_stage("connecting...")
+        self.io.submit(
+            "connect", self.controller.connect,
             tenant=self.tenant_var.get(),
             client=self.client_var.get(),
             secret=self.secret_var.get(),
+            on_done=self._on_connected, on_error=self._io_error("connect"),
         )
+
+    def _on_connected(self, names):
         self.src_site_combo["values"] = names
         self.dest_site_combo["values"] = names
-        self.log(f"[OK] Connected. Loaded {len(names)} sites. Pick site(s).")
+        self._dir_version = self.controller.directory_version()
+        self.set_stage("connected")
+        self.log(f"[OK] Connected. {len(names)} sites from index; type to search.")
+
+    # type-ahead over the local directory index (no Graph calls)
+    def on_site_typed(self, combo, event=None):
+        if event is not None and event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        combo["values"] = self.controller.site_names(combo.get())
+
+    def on_user_typed(self, _=None):
+        idx = self.controller.dir_index
+        q = self.dest_user_query_var.get().strip()
+        if idx is None or not idx.has_users or len(q) < 2:
+            return
+        self.dest_user_combo["values"] = self.controller.search_users(q)
 
     def on_src_site_selected(self, _=None):
-        libs = self.controller.select_src_site(self.src_site_name_var.get())
+        self.io.cancel("src_lib")
+        self._loading(self.src_lib_combo, self.src_parent_combo)
+        self.io.submit("src_site", self.controller.select_src_site, self.src_site_name_var.get(),
+                       on_done=self._on_src_libs, on_error=self._io_error("source site"))
+
+    def _on_src_libs(self, libs):
         self.src_lib_combo["values"] = libs
+        self.src_lib_combo.set("")
         if libs:
             self.src_lib_combo.current(0)
             self.on_src_lib_selected()
+        else:
+            self.src_parent_combo.set("")
 
     def on_src_lib_selected(self, _=None):
-        res = self.controller.select_src_lib(self.src_lib_name_var.get())
+        self._loading(self.src_parent_combo)
+        self.io.submit("src_lib", self.controller.select_src_lib, self.src_lib_name_var.get(),
+                       on_done=self._on_src_lib, on_error=self._io_error("source library"))
+
+    def _on_src_lib(self, res):
         self.src_drive_var.set(res.get("drive_id") or "")
         self.src_parent_var.set(res.get("default_parent_id") or "root")
         names = res.get("parent_names", [])
         self.src_parent_combo["values"] = names
+        self.src_parent_combo.set("")
         if names:
             self.src_parent_combo.current(0)
 
@@ -281,18 +379,31 @@ class App:
         pass
 
     def on_dest_site_selected(self, _=None):
-        libs = self.controller.select_dst_site(self.dest_site_name_var.get())
+        self.io.cancel("dst_lib")
+        self._loading(self.dest_lib_combo, self.dest_parent_combo)
+        self.io.submit("dst_site", self.controller.select_dst_site, self.dest_site_name_var.get(),
+                       on_done=self._on_dest_libs, on_error=self._io_error("destination site"))
+
+    def _on_dest_libs(self, libs):
         self.dest_lib_combo["values"] = libs
+        self.dest_lib_combo.set("")
         if libs:
             self.dest_lib_combo.current(0)
             self.on_dest_lib_selected()
+        else:
+            self.dest_parent_combo.set("")
 
     def on_dest_lib_selected(self, _=None):
-        res = self.controller.select_dst_lib(self.dest_lib_name_var.get())
+        self._loading(self.dest_parent_combo)
+        self.io.submit("dst_lib", self.controller.select_dst_lib, self.dest_lib_name_var.get(),
+                       on_done=self._on_dest_lib, on_error=self._io_error("destination library"))
+
+    def _on_dest_lib(self, res):
         self.dest_drive_var.set(res.get("drive_id") or "")
         self.dest_parent_var.set(res.get("default_parent_id") or "")
         names = res.get("parent_names", [])
         self.dest_parent_combo["values"] = names
+        self.dest_parent_combo.set("")
         if names:
             self.dest_parent_combo.current(0)
 
@@ -304,8 +415,14 @@ class App:
         if not q:
             self.log("[INFO] Enter a user search (name or UPN).")
             return
-        display = self.controller.search_users(q)
+        self.io.cancel("dst_user")
+        self._loading(self.dest_user_combo)
+        self.io.submit("user_search", self.controller.search_users, q,
+                       on_done=self._on_users, on_error=self._io_error("user search"))
+
+    def _on_users(self, display):
         self.dest_user_combo["values"] = display
+        self.dest_user_combo.set("")
         if display:
             self.dest_user_combo.current(0)
             self.on_dest_user_chosen()
@@ -313,7 +430,12 @@ class App:
 
     def on_dest_user_chosen(self, _=None):
         sel = self.dest_user_name_var.get()
-        res = self.controller.choose_user(sel)
+        self._loading(self.dest_parent_combo)
+        self.io.submit("dst_user", self.controller.choose_user, sel,
+                       on_done=self._on_dest_user, on_error=self._io_error("OneDrive lookup"))
+
+    def _on_dest_user(self, res):
+        self.dest_parent_combo.set("")
         if not res:
             self.log("[DST-OD] OneDrive not provisioned.")
             return
@@ -324,8 +446,8 @@ class App:
             self.dest_parent_combo.current(0)
         self.log(f"[DST-OD] Ready: drive {res['drive_id']}.")
 
-    def on_start(self):
-        cfg = {
+    def _job_cfg(self):
+        return {
             "SRC_DRIVE":   self.src_drive_var.get().strip(),
             "SRC_PARENT":  self.src_parent_var.get().strip(),
             "DEST_DRIVE":  self.dest_drive_var.get().strip(),
@@ -334,12 +456,46 @@ class App:
             "TENANT":      self.tenant_var.get().strip(),
             "CLIENT":      self.client_var.get().strip(),
             "SECRET":      self.secret_var.get().strip(),
+            # comma-separated rules: *.tmp, .DS_Store, Archive/Video/**, re:<regex>
+            "FILTERS":     {"exclude": self.exclude_var.get()} if self.exclude_var.get().strip() else None,
+            "SKIP_MODE":   self.skip_mode_var.get(),
+            "AUDIT":       self.audit_var.get(),
         }
-        self.controller.start_job(cfg)
+
+    def on_start(self):
+        try:
+            self.controller.start_job(self._job_cfg())
+        except ValueError as e:
+            self.log(f"[ERROR] {e}")
+
+    def on_plan(self):
+        try:
+            self.controller.plan_job(self._job_cfg())
+        except ValueError as e:
+            self.log(f"[ERROR] {e}")
+
+    def on_run_plan(self):
+        path = filedialog.askopenfilename(
+            title="Run saved plan",
+            initialdir=str(Path(self.controller.state.base_dir) / "plans"),
+            filetypes=[("Plan", "*.json")],
+        )
+        if path:
+            self.controller.start_job({**self._job_cfg(), "PLAN_FILE": path})
 
     def on_cancel(self):
         self.controller.cancel_job()
 
+    # profiling: stopping a capture writes files to <state>/profiles and may wait on busy threads
+    def on_profile_cpu(self):
+        self.io.submit("prof_cpu", self.controller.toggle_cpu_profile, on_error=self._io_error("CPU profile"))
+
+    def on_profile_mem(self):
+        self.io.submit("prof_mem", self.controller.toggle_mem_profile, on_error=self._io_error("memory profile"))
+
+    def on_verbosity_chosen(self, _=None):
+        self.controller.set_verbosity(self.verbosity_var.get())
+
     def toggle_dest_mode(self):
     # Sub-frame should sit directly UNDER the radio row.
         base_row = self._dest_section_row + 1
@@ -359,18 +515,26 @@ class App:
             self.dest_sp.grid(row=base_row, column=0, columnspan=2,
                             sticky="ew", padx=6, pady=(2, 0))
 
-    # log drain
+    # log drain: one insert per tick, widget keeps only the last LOG_MAX_LINES
     def _drain_log(self):
+        batch = deque(maxlen=LOG_MAX_LINES)
         try:
-            while True:
-                line = self.LOGQ.get_nowait()
+            for _ in range(self.LOGQ.qsize()):
+                batch.append(self.LOGQ.get_nowait())
+        except Empty:
+            pass
+        if batch:
+            try:
                 self.log_box.configure(state="normal")
-                self.log_box.insert("end", line + "\n")
+                self.log_box.insert("end", "\n".join(batch) + "\n")
+                lines = int(self.log_box.index("end-1c").split(".")[0]) - 1
+                if lines > LOG_MAX_LINES:
+                    self.log_box.delete("1.0", f"{lines - LOG_MAX_LINES + 1}.0")
                 self.log_box.see("end")
                 self.log_box.configure(state="disabled")
-        except Exception:
-            pass
-        self.root.after(150, self._drain_log)
+            except Exception:
+                pass
+        self.root.after(LOG_TICK_MS, self._drain_log)
 
     def run(self):
         
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import random
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+__all__ = ["coordinate_search", "load_tuning", "pick_sample", "requests_for", "save_tuning", "score",
+           "SCRATCH_NAME", "WORKERS", "CHUNKS", "SMALL", "MAX_WORKERS"]
+
+TUNING_FILE = "autotune.json"
+# destination folder the calibration uploads into; deleted afterwards
+SCRATCH_NAME = ".spodcopy-autotune"
+
+MB = 1024 * 1024
+# the grid; chunks are multiples of 320 KiB, as Graph wants for upload session ranges
+WORKERS = (2, 4, 8)
+CHUNKS = (5 * MB, 10 * MB, 20 * MB)
+SMALL = (2 * MB, 4 * MB, 16 * MB)
+MAX_WORKERS = max(WORKERS)
+MIN_GAIN = 0.05          # a setting must beat the incumbent by this much (trial noise)
+THROTTLE_PENALTY = 2.0   # score = goodput * (1 - THROTTLE_PENALTY * throttled share of requests)
+
+
+def _path(state_dir) -> Path:
+    return Path(state_dir) / TUNING_FILE
+
+
+def _key(tenant, dest_drive):
+    return f"{tenant or ''}|{dest_drive or ''}"
+
+
+def _load(state_dir) -> Dict[str, Any]:
+    try:
+        with _path(state_dir).open("r", encoding="utf-8") as f:
+            return json.load(f).get("entries", {})
+    except Exception:
+        return {}
+
+
+def load_tuning(state_dir, tenant: str, dest_drive: str, max_age_days: float = 7.0) -> Optional[Dict[str, Any]]:
+    """Settings saved by an earlier calibration for this tenant + destination, unless too old."""
+    ent = _load(state_dir).get(_key(tenant, dest_drive))
+    if not ent or time.time() - ent.get("at", 0) > max_age_days * 86400:
+        return None
+    return ent
+
+
+def save_tuning(state_dir, tenant: str, dest_drive: str, settings: Dict[str, Any]) -> None:
+    entries = _load(state_dir)
+    entries[_key(tenant, dest_drive)] = {**settings, "at": time.time()}
+    p = _path(state_dir)
+    tmp = p.with_suffix(".json.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump({"entries": entries}, f, indent=1)
+    os.replace(tmp, p)
+
+
+def pick_sample(files: List[Tuple[str, str, int]], budget: int, seed=None) -> List[Tuple[str, str, int]]:
+    """A random mix of (id, name, size) files adding up to at most `budget` bytes (at least one file)."""
+    files = [f for f in files if f[2] > 0]
+    if not files:
+        return []
+    pool = list(files)
+    random.Random(seed).shuffle(pool)
+    out, total = [], 0
+    for f in pool:
+        if total + f[2] <= budget:
+            out.append(f)
+            total += f[2]
+    return out or [min(files, key=lambda f: f[2])]
+
+
+def requests_for(size: int, chunk: int, max_single: int) -> int:
+    # what one copy sends: GET + PUT for a small file; session create, status and a GET + PUT per chunk otherwise
+    if size <= max_single:
+        return 2
+    return 2 + 2 * math.ceil(size / chunk)
+
+
+def score(bytes_: int, elapsed: float, throttles: int, requests: int, errors: int = 0) -> Dict[str, float]:
+    goodput = bytes_ / elapsed if elapsed > 0 else 0.0
+    rate = throttles / (throttles + requests) if (throttles + requests) else 0.0
+    s = 0.0 if errors else goodput * max(0.0, 1.0 - THROTTLE_PENALTY * rate)
+    return {"goodput": goodput, "throttle_rate": rate, "score": s}
+
+
+def coordinate_search(start: Dict[str, int], trial: Callable[[Dict[str, int]], Optional[Dict[str, float]]],
+                      sizes: List[int]) -> Tuple[Dict[str, int], Optional[Dict[str, float]]]:
+    """Best {workers, chunk, max_single} found one dimension at a time, from `start`.
+
+    trial(settings) copies the sample once and returns score(), or None to
+    stop (cancelled). Each dimension's grid is tried with the others held at
+    the best so far; a candidate replaces it only when it scores MIN_GAIN
+    better. Dimensions the sample can't tell apart are skipped: chunk size
+    when no file goes through an upload session, the small-file threshold
+    when no file falls inside its range.
+    """
+    best = dict(start)
+    best_res = trial(best)
+    if best_res is None:
+        return best, None
+    tried = {tuple(sorted(best.items()))}
+    for dim, grid in (("workers", WORKERS), ("chunk", CHUNKS), ("max_single", SMALL)):
+        if dim == "chunk" and not any(s > best["max_single"] for s in sizes):
+            continue
+        if dim == "max_single" and not any(min(SMALL) < s <= max(SMALL) for s in sizes):
+            continue
+        for v in grid:
+            cand = {**best, dim: v}
+            if tuple(sorted(cand.items())) in tried:
+                continue
+            tried.add(tuple(sorted(cand.items())))
+            res = trial(cand)
+            if res is None:
+                return best, best_res
+            if res["score"] > best_res["score"] * (1 + MIN_GAIN):
+                best, best_res = cand, res
+    return best, best_res
@@ -2,19 +2,60 @@
 #import os
 import json
 import time
+import logging
+from collections import Counter
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
 from threading import Thread, Event, Lock
-from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from ui.state_store import StateStore, default_state_dir
-import msal
+from ui.directory_index import DirectoryIndex
+from ui.planner import record_throughput, estimate_duration, save_plan, load_plan, summary_lines
+from ui.profiler import Profiler
+from ui.sampling import StratifiedSample, sample_size
+from ui.autotune import (coordinate_search, load_tuning, save_tuning, pick_sample, requests_for, score,
+                         SCRATCH_NAME, MAX_WORKERS)
 
 from http_utils.http_utils import new_session, RobustHTTP
+from http_utils.credentials import AppCredential, pool_from_fields
+from http_utils.hedging import Hedger
 from graph_client import GraphClient
 
-from graph_client.graph_common import GRAPH
+from graph_client.filters import ItemFilter
+from graph_client.local_drive import is_local
+from graph_client.spool import ChunkSpool
+from graph_client.graph_common import _qxh, _mtime
+from graph_client.transfer_manager import skip_reason, SKIP_MODES, LEDGER_DONE, LEDGER_SKIP, _tkey
 
 import time
 from threading import Lock
 
+LOG_FILE_MAX   = 20 * 1024 * 1024   # bytes per rotated log file
+LOG_FILE_COUNT = 10                 # rotated files kept
+VERBOSITY      = ("all", "sample", "quiet")
+AUDIT_MODES    = ("full", "sample")
+AUDIT_WORKERS  = 16                 # parallel listings/probes of a sample audit
+AUTOTUNE_MODES = ("off", "auto", "calibrate")
+AUTOTUNE_LIST  = 2000               # source files listed at most to draw the calibration sample from
+
+
+def _open_file_log(state_dir) -> logging.Logger:
+    # full job log (the UI only keeps a tail of it)
+    log_dir = Path(state_dir) / "logs"
+    log_dir.mkdir(parents=True, exist_ok=True)
+    lg = logging.getLogger("spodcopy.job")
+    lg.setLevel(logging.INFO)
+    lg.propagate = False
+    if not lg.handlers:
+        h = RotatingFileHandler(log_dir / "job.log", maxBytes=LOG_FILE_MAX,
+                                backupCount=LOG_FILE_COUNT, encoding="utf-8")
+        h.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        lg.addHandler(h)
+    return lg
+
+
+def acquire_app_token(tenant, client, secret) -> str:
+    return AppCredential(tenant, client, secret).token()
 
 
 class Stats:
@@ -74,6 +115,7 @@ class Stats:
             return {
                 "files_total": self.files_total,
                 "files_done":  self.files_done,
+                "bytes_done":  self.bytes_done,
                 "elapsed":     elapsed,
                 "rate":        rate,
                 "workers":     self.current_workers,
@@ -106,13 +148,20 @@ class Stats:
             return n
 
 class Controller:
-    def __init__(self, *, timeout, chunk, min_chunk, max_single, delete_extras):
-        
+    def __init__(self, *, timeout, chunk, min_chunk, max_single, delete_extras,
+                 http=None, budget=None, aimd=True, job_name=None, state_dir=None):
+        # http/budget/aimd: set by JobScheduler so several jobs share one
+        # RobustHTTP, one worker budget and one throttle loop
+        self._shared_http = http
+        self._budget = budget
+        self._aimd_enabled = aimd
+        self.JOB_NAME = job_name
         self.TIMEOUT = timeout
         self.CHUNK = chunk
         self.MIN_CHUNK = min_chunk
         self.MAX_SINGLE = max_single
         self.DELETE_EXTRAS = delete_extras
+        self.EXTRAS_DRY_RUN = False  # reconcile phase only reports what it would delete
         #state feilds
         self._state_sig = None
         self._state = None
@@ -123,6 +172,12 @@ class Controller:
         
         self.stats = Stats()
 
+        # job runner + outcome of the last _run_job
+        self._job_thread = None
+        self.last_result = None
+        self._plan = None
+        self.PLAN_FILE = None
+
         # Authentication
         self.TENANT = self.CLIENT = self.SECRET = ""
         self._T = None
@@ -143,6 +198,7 @@ class Controller:
         self.SRC_PARENTS = {}
         self.DST_PARENTS = {}
         self.DST_USERS = {}
+        self.dir_index = None   # DirectoryIndex, opened on connect
 
         # current selection (for convenience)
         self.SRC_DRIVE = None
@@ -150,18 +206,73 @@ class Controller:
         self.DEST_DRIVE = None
         self.DEST_PARENT = None
         self.ROOT_NAME = "SRC_ROOT" #byDefault
-
-        self.state = StateStore(base_dir=default_state_dir("SPODCopyTool"))
+        # fan-out: more [(drive, parent, root_name)] targets fed from the same source reads
+        self.EXTRA_DESTS = []
+        # include/exclude rules (cfg FILTERS), compiled in configure()
+        self.FILTERS = None
+        self.filter = None
+
+        # per-file [SKIP] lines: all | sample | quiet
+        self.VERBOSITY = "all"
+        # unchanged-file check: "hash" (size + quickXorHash) | "mtime" (size + lastModifiedDateTime)
+        self.SKIP_MODE = "hash"
+        # hedged metadata GETs: extra-request budget in percent (0 = off)
+        self.HEDGE = 0.0
+        # post-job audit: "full" walk | "sample" (stratified sample, rates with confidence intervals)
+        self.AUDIT = "full"
+        self.AUDIT_SAMPLE = 0           # files to check; 0 = sized from AUDIT_MARGIN at AUDIT_CONFIDENCE
+        self.AUDIT_MARGIN = 2.0         # +/- percent wanted on the estimated rates
+        self.AUDIT_CONFIDENCE = 95.0    # percent
+        self.AUDIT_ESCALATE = 10        # top folders fully audited at most when their sample fails
+        # check files against the destination item recorded at copy/skip time (False: always ask Graph)
+        self.AUDIT_RECORDS = True
+        # download spool: source ranges kept on disk (MB, 0 = off) so retries don't fetch them again
+        self.SPOOL_MB = 0
+        self.SPOOL_DIR = None           # default <state dir>/spool
+        self._spool = None
+        # duplicate content (same size + quickXorHash) is placed by server-side copy
+        self.DEDUP = False
+        # calibrate CHUNK / MAX_SINGLE / workers at job start: off | auto (saved result if fresh) | calibrate
+        self.AUTOTUNE = "off"
+        self.AUTOTUNE_PATH = None       # source folder id to sample from (default SRC_PARENT)
+        self.AUTOTUNE_MB = 64           # bytes copied per trial
+        self.AUTOTUNE_MAX_AGE = 7.0     # days a saved calibration is used for
+        self._tuning = False            # AIMD stands still while trials run
+        self._workers_cap = None        # AIMD doesn't scale above the tuned worker count
+
+        self.state = StateStore(base_dir=state_dir or default_state_dir("SPODCopyTool"))
+        self._file_log = None
+        try:
+            self._file_log = _open_file_log(self.state.base_dir)
+        except Exception:
+            pass
         self.log(f"[RESUME] Using state dir: {self.state.base_dir}")
+
+        # timed spans + on-demand cProfile/tracemalloc, written to <state>/profiles
+        self.prof = Profiler(self.state.base_dir, log=self.log)
     
     def get_stats(self):
-        return self.stats.snapshot()    
+        snap = self.stats.snapshot()
+        if self.client is not None and self.client.xfer.target_stats:
+            snap["targets"] = [dict(zip(("files", "bytes", "skipped", "failed"), row))
+                               for row in self.client.xfer.target_stats]
+        if self.RH is not None:
+            snap.update(self.RH.policy.stats())
+            if self.RH.hedge is not None:
+                snap.update(self.RH.hedge.stats())
+        if self._spool is not None:
+            snap.update(self._spool.stats())
+        if self.DEDUP and self.client is not None:
+            snap.update(zip(("dedup_copies", "dedup_bytes", "dedup_fallbacks"), self.client.xfer.dedup_stats))
+        return snap
     
-    def _ensure_state(self):
-        sig = self._job_signature()
+    def _ensure_state(self, extra_sig=None):
+        # extra_sig: e.g. {"shard": key} so each shard worker keeps its own ledger
+        sig = {**self._job_signature(), **(extra_sig or {})}
         st = self.state.load(sig)
         if not st:
-            st = {"phase": "folders", "folder_cursors": {}}
+            st = {"phase": "folders", "ledger": {}}
+            self.state.save(sig, st)  # registers the live dict for journaled updates
         self._state_sig = sig
         self._state = st
 
@@ -175,7 +286,7 @@ class Controller:
         self._state = None
 
     def _job_signature(self) -> dict:
-            return {
+            sig = {
                 "tenant": self.TENANT or "",
                 "src_drive": self.SRC_DRIVE or "",
                 "src_parent": (self.SRC_PARENT or "root"),
@@ -183,15 +294,34 @@ class Controller:
                 "dest_parent": self.DEST_PARENT or "",
                 "root_name": self.ROOT_NAME or "",
             }
+            # a subtree recorded done under other rules may be missing files under these
+            if self.filter is not None:
+                sig["filters"] = self.filter.signature()
+            # ... or in a destination that wasn't part of the job then
+            if self.EXTRA_DESTS:
+                sig["extra_dests"] = [list(t) for t in self.EXTRA_DESTS]
+            return sig
 
     def set_callbacks(self, *, log, set_stage):
         self._log = log
         self._set_stage = set_stage
 
     def log(self, msg: str):
+        if self.JOB_NAME:
+            msg = f"[{self.JOB_NAME}] {msg}"
+        if self._file_log:
+            try: self._file_log.info(msg.rstrip("\n"))
+            except Exception: pass
         if self._log:
             self._log(msg)
 
+    def set_verbosity(self, level: str):
+        if level not in VERBOSITY:
+            return
+        self.VERBOSITY = level
+        if self.client is not None:
+            self.client.xfer.SKIP_LOG = level
+
     def stage(self, text: str):
         self._stage_text = text
         if self._set_stage:
@@ -208,17 +338,12 @@ class Controller:
             self._set_stage(self._stage_text)
 
     def token(self):
-        app = msal.ConfidentialClientApplication(
-            self.CLIENT,
-            authority=f"https://login.microsoftonline.com/{self.TENANT}",
-            client_credential=self.SECRET,
-        )
-        r = app.acquire_token_for_client(scopes=["https://graph.microsoft.com/.default"])
-        if "access_token" not in r:
-            raise RuntimeError(json.dumps(r, indent=2))
-        return r["access_token"]
+        return acquire_app_token(self.TENANT, self.CLIENT, self.SECRET)
 
     def get_token(self):
+        pool = self.RH.credentials if self.RH is not None else None
+        if pool:
+            return pool.creds[0].token()
         if self._T is None:
             self._T = self.token()
         return self._T
@@ -229,27 +354,27 @@ class Controller:
     def Hdyn(self):
         return {"Authorization": f"Bearer {self.get_token()}"}
 
-    #cursor + cancel hooks used by TransferManager
-    def _cursor_get(self, folder_id):
-        return (self._state or {}).get("folder_cursors", {}).get(folder_id)
+    #completion ledger + cancel hooks used by TransferManager
+    def _ledger_get(self, item_id):
+        return (self._state or {}).get("ledger", {}).get(item_id)
 
-    def _cursor_set(self, folder_id, name):
+    # called from worker threads: journaled by StateStore, committed ~1s later
+    # dst: destination (id, size, hash, mtime) right after the copy/skip, for the audit
+    def _ledger_put(self, item_id, etag, status, dst=None):
         if self._state is None:
             return
-        fc = self._state.setdefault("folder_cursors", {})
-        prev = fc.get(folder_id)
-        if prev is None or name > prev:             
-            fc[folder_id] = name
-            cnt = getattr(self, "_cursor_updates", 0) + 1
-            if cnt % 50 == 0:
-                self._save_state()
-            self._cursor_updates = cnt
-
-    def _cursor_clear(self, folder_id):
+        self.state.set(self._state_sig, ("ledger", item_id), [etag, status, list(dst)] if dst else [etag, status])
+
+    # DELETE_EXTRAS reconciliation list, also journaled; target: fan-out destination index
+    def _extra_put(self, item_id, path, kind, size, target=0):
         if self._state is None:
             return
-        self._state.get("folder_cursors", {}).pop(folder_id, None)
-        self._save_state()
+        self.state.set(self._state_sig, ("extras", item_id), [path, kind, size, target] if target else [path, kind, size])
+
+    def _extra_done(self, item_id):
+        if self._state is None:
+            return
+        self.state.delete(self._state_sig, ("extras", item_id))
 
     def _should_cancel(self):
         return self.CANCEL_EV.is_set()
@@ -257,14 +382,21 @@ class Controller:
     def lazy_init(self):
         if self.client is not None:
             return
-        self.S = new_session()
-        self.RH = RobustHTTP(
-            self.S,
-            get_auth_hdr=self.Hdyn,
-            timeout=self.TIMEOUT,
-            refresh_cb_default=self.reset_token,
-            on_throttle=self.stats.on_throttle,  
-        )
+        if self._shared_http is not None:
+            self.RH = self._shared_http
+            self.S = self.RH.S
+        else:
+            self.S = new_session()
+            self.RH = RobustHTTP(
+                self.S,
+                get_auth_hdr=self.Hdyn,
+                timeout=self.TIMEOUT,
+                refresh_cb_default=self.reset_token,
+                # stats is replaced per run; always count into the current one
+                on_throttle=lambda *a, **k: self.stats.on_throttle(*a, **k),
+                credentials=pool_from_fields(self.TENANT, self.CLIENT, self.SECRET),
+            )
+            self._apply_hedge()
 
         self.client = GraphClient(
             http=self.RH,
@@ -272,6 +404,8 @@ class Controller:
             timeout=self.TIMEOUT,
             chunk=self.CHUNK, min_chunk=self.MIN_CHUNK, max_single=self.MAX_SINGLE,
             delete_extras=self.DELETE_EXTRAS,
+            budget=self._budget,
+            max_concurrency=MAX_WORKERS if self.AUTOTUNE != "off" else 4,
         )
 
         try:
@@ -281,36 +415,69 @@ class Controller:
             pass
 
         x = self.client.xfer
-        x.get_cursor    = self._cursor_get
-        x.set_cursor    = self._cursor_set
-        x.clear_cursor  = self._cursor_clear
+        x.ledger_get    = self._ledger_get
+        x.ledger_put    = self._ledger_put
         x.should_cancel = self._should_cancel
+        x.extra_put     = self._extra_put
+        x.extra_done    = self._extra_done
         x.DELETE_EXTRAS = self.DELETE_EXTRAS
+        x.SKIP_LOG      = self.VERBOSITY
+        x.span          = self.prof.span
+        x.filter        = self.filter
+        x.SKIP_MODE     = self.SKIP_MODE
+        x.spool         = self._spool
+        x.DEDUP         = self.DEDUP
 
         # stats hooks
         x.on_discover_file = self.stats.on_discover_file
         x.on_file_done     = self.stats.on_file_done
 
+        # scheduler mode: the shared budget governs concurrency, not per-job AIMD
+        if not self._aimd_enabled:
+            while x.scale_up():
+                pass
+
     def connect(self, *, tenant, client, secret):
         self.TENANT, self.CLIENT, self.SECRET = tenant.strip(), client.strip(), secret.strip()
         self._T = None
+        self._refresh_credentials()
         self.lazy_init()
-        sites = self.client.search_sites("*")
-        names = []
-        self.SRC_SITES.clear(); self.DST_SITES.clear()
-        for s in sites:
-            nm = s["name"]
-            self.SRC_SITES[nm] = s["id"]
-            self.DST_SITES[nm] = s["id"]
-            names.append(nm)
-        names.sort(key=str.lower)
-        return names
+        # cached index: returns at once, re-lists stale sites/users in the background
+        self.dir_index = DirectoryIndex(self.state.base_dir, self.TENANT)
+        self.dir_index.refresh_async(
+            list_sites=lambda: self.client.search_sites("*"),
+            list_users=self.client.list_users,
+            log=self.log,
+        )
+        if not self.dir_index.has_sites:
+            self.log("[INDEX] first connect for this tenant: indexing sites in the background...")
+        return self.site_names()
+
+    def directory_version(self):
+        return self.dir_index.version if self.dir_index else 0
+
+    def site_names(self, query: str = "", limit: int = 200):
+        """Type-ahead: index matches (prefix first, then substring), libraries of the top few prefetched."""
+        if self.dir_index is None:
+            return []
+        hits = self.dir_index.find_sites(query, limit)
+        for s in hits:
+            self.SRC_SITES[s["name"]] = s["id"]
+            self.DST_SITES[s["name"]] = s["id"]
+        if query and hits:
+            self.dir_index.prefetch_libs([s["id"] for s in hits[:5]], self.client.list_site_libraries)
+        return [s["name"] for s in hits]
+
+    def _site_libs(self, sid):
+        if self.dir_index is None:
+            return self.client.list_site_libraries(sid)
+        return self.dir_index.libs(sid, self.client.list_site_libraries)
 
     def select_src_site(self, name):
         sid = self.SRC_SITES.get(name)
         if not sid:
             return []
-        libs = self.client.list_site_libraries(sid)
+        libs = self._site_libs(sid)
         self.SRC_LIBS.clear()
         for lib in libs:
             self.SRC_LIBS[lib["name"]] = lib["id"]
@@ -341,7 +508,7 @@ class Controller:
         sid = self.DST_SITES.get(name)
         if not sid:
             return []
-        libs = self.client.list_site_libraries(sid)
+        libs = self._site_libs(sid)
         self.DST_LIBS.clear()
         for lib in libs:
             self.DST_LIBS[lib["name"]] = lib["id"]
@@ -367,7 +534,10 @@ class Controller:
         q = (query or "").strip()
         if not q:
             return []
-        users = self.client.search_users(q, top=25)
+        if self.dir_index is not None and self.dir_index.has_users:
+            users = self.dir_index.find_users(q, 25)
+        else:
+            users = self.client.search_users(q, top=25)
         self.DST_USERS.clear()
         display = []
         for u in users:
@@ -400,18 +570,276 @@ class Controller:
     #---------------------
     #   job lifecycle
     #---------------------
-    def start_job(self, cfg: dict):
+    def configure(self, cfg: dict):
         # cfg keys: SRC_DRIVE, SRC_PARENT, DEST_DRIVE, DEST_PARENT, ROOT_NAME, TENANT, CLIENT, SECRET
         self.SRC_DRIVE  = cfg.get("SRC_DRIVE", "").strip()
         self.SRC_PARENT = (cfg.get("SRC_PARENT") or "root").strip()
         self.DEST_DRIVE = cfg.get("DEST_DRIVE", "").strip()
         self.DEST_PARENT= cfg.get("DEST_PARENT", "").strip()
         self.ROOT_NAME  = cfg.get("ROOT_NAME", "").strip()
+        # saved dry-run plan to execute instead of walking the source again
+        self.PLAN_FILE  = (cfg.get("PLAN_FILE") or "").strip() or None
+        # EXTRA_DESTS: [{DEST_DRIVE, DEST_PARENT, ROOT_NAME (default: this job's)}]
+        self.EXTRA_DESTS = []
+        for d in cfg.get("EXTRA_DESTS") or ():
+            drive, parent = (d.get("DEST_DRIVE") or "").strip(), (d.get("DEST_PARENT") or "").strip()
+            if not drive or not parent:
+                raise ValueError("each EXTRA_DESTS entry needs DEST_DRIVE and DEST_PARENT")
+            root = d.get("ROOT_NAME")
+            self.EXTRA_DESTS.append((drive, parent, self.ROOT_NAME if root is None else root.strip()))
+        if self.EXTRA_DESTS and self.PLAN_FILE:
+            raise ValueError("EXTRA_DESTS can't be combined with PLAN_FILE (a plan is for one destination)")
+        self.EXTRAS_DRY_RUN = bool(cfg.get("EXTRAS_DRY_RUN", self.EXTRAS_DRY_RUN))
+        # FILTERS: {include, exclude, extensions, exclude_extensions, min_size, max_size, modified_since}
+        self.FILTERS = cfg.get("FILTERS") or None
+        self.filter = ItemFilter.from_spec(self.FILTERS, root=self.ROOT_NAME)
+        # local trees have no quickXorHash: unless told otherwise they compare mtimes
+        mode = (cfg.get("SKIP_MODE") or ("mtime" if self._touches_local() else self.SKIP_MODE)).strip().lower()
+        if mode not in SKIP_MODES:
+            raise ValueError(f"SKIP_MODE must be one of {', '.join(SKIP_MODES)}, not {mode!r}")
+        self.SKIP_MODE = mode
+        self.HEDGE = float(cfg.get("HEDGE", self.HEDGE) or 0)
+        self._apply_hedge()
+        audit = (cfg.get("AUDIT") or self.AUDIT).strip().lower()
+        if audit not in AUDIT_MODES:
+            raise ValueError(f"AUDIT must be one of {', '.join(AUDIT_MODES)}, not {audit!r}")
+        self.AUDIT = audit
+        self.AUDIT_SAMPLE = int(cfg.get("AUDIT_SAMPLE") or self.AUDIT_SAMPLE or 0)
+        self.AUDIT_RECORDS = bool(cfg.get("AUDIT_RECORDS", self.AUDIT_RECORDS))
+        self.AUDIT_MARGIN = float(cfg.get("AUDIT_MARGIN") or self.AUDIT_MARGIN)
+        self.AUDIT_CONFIDENCE = float(cfg.get("AUDIT_CONFIDENCE") or self.AUDIT_CONFIDENCE)
+        if not (0 < self.AUDIT_MARGIN < 50 and 50 <= self.AUDIT_CONFIDENCE < 100):
+            raise ValueError("AUDIT_MARGIN must be in (0, 50) and AUDIT_CONFIDENCE in [50, 100) percent")
+        self.SPOOL_MB = int(cfg.get("SPOOL_MB", self.SPOOL_MB) or 0)
+        self.SPOOL_DIR = (cfg.get("SPOOL_DIR") or self.SPOOL_DIR or "").strip() or None
+        if self.SPOOL_MB < 0:
+            raise ValueError("SPOOL_MB must be >= 0")
+        self._apply_spool()
+        self.DEDUP = bool(cfg.get("DEDUP", self.DEDUP))
+        tune = (cfg.get("AUTOTUNE") or self.AUTOTUNE).strip().lower()
+        if tune not in AUTOTUNE_MODES:
+            raise ValueError(f"AUTOTUNE must be one of {', '.join(AUTOTUNE_MODES)}, not {tune!r}")
+        self.AUTOTUNE = tune
+        self.AUTOTUNE_PATH = (cfg.get("AUTOTUNE_PATH") or "").strip() or None
+        self.AUTOTUNE_MB = int(cfg.get("AUTOTUNE_MB") or self.AUTOTUNE_MB)
+        self.AUTOTUNE_MAX_AGE = float(cfg.get("AUTOTUNE_MAX_AGE", self.AUTOTUNE_MAX_AGE))
+        if self.AUTOTUNE_MB <= 0:
+            raise ValueError("AUTOTUNE_MB must be > 0")
+        if self.client is not None:
+            self.client.xfer.filter = self.filter
+            self.client.xfer.SKIP_MODE = self.SKIP_MODE
+            self.client.xfer.spool = self._spool
+            self.client.xfer.DEDUP = self.DEDUP
         self.TENANT     = cfg.get("TENANT", "").strip()
         self.CLIENT     = cfg.get("CLIENT", "").strip()
         self.SECRET     = cfg.get("SECRET", "").strip()
         self._T = None
+        self._refresh_credentials()
+
+    def _apply_spool(self):
+        root = self.SPOOL_DIR or str(Path(self.state.base_dir) / "spool")
+        if self.SPOOL_MB <= 0:
+            self._spool = None
+        elif self._spool is None or self._spool.root != root:
+            self._spool = ChunkSpool(root, self.SPOOL_MB * 1024 * 1024)
+        else:
+            self._spool.max_bytes = self.SPOOL_MB * 1024 * 1024
+
+    def _touches_local(self):
+        return any(is_local(d) for d in (self.SRC_DRIVE, self.DEST_DRIVE, *(t[0] for t in self.EXTRA_DESTS)))
+
+    def _offline(self):
+        # local -> local: no Graph call at all, so no token either
+        return all(is_local(d) for d in (self.SRC_DRIVE, self.DEST_DRIVE, *(t[0] for t in self.EXTRA_DESTS)))
+
+    def _apply_hedge(self):
+        # the scheduler's shared RobustHTTP is configured by the scheduler
+        if self.RH is None or self._shared_http is not None:
+            return
+        if self.HEDGE <= 0:
+            self.RH.hedge = None
+        elif self.RH.hedge is None:
+            self.RH.hedge = Hedger(budget=self.HEDGE / 100)
+        else:
+            self.RH.hedge.budget = self.HEDGE / 100
+
+    def _refresh_credentials(self):
+        # comma-separated CLIENT/SECRET lists -> spread requests over several app registrations
+        if self.RH is not None and self._shared_http is None:
+            self.RH.credentials = pool_from_fields(self.TENANT, self.CLIENT, self.SECRET)
+
+    # autotune
+    def _autotune(self):
+        """Pick CHUNK, MAX_SINGLE and the worker count for this tenant + destination.
+
+        "auto" uses a calibration saved within AUTOTUNE_MAX_AGE days; "calibrate"
+        (or nothing saved) measures: a sample of the source is copied into a
+        scratch folder at the destination once per candidate setting
+        (ui.coordinate_search) and the best goodput, discounted by
+        the share of throttled requests, wins and is saved for later runs.
+        """
+        self._workers_cap = None
+        if self.AUTOTUNE == "off":
+            return
+        if self.AUTOTUNE == "auto":
+            saved = load_tuning(self.state.base_dir, self.TENANT, self.DEST_DRIVE, self.AUTOTUNE_MAX_AGE)
+            if saved:
+                self._apply_tuning(saved, "saved")
+                return
+        self.stage("calibrating transfer settings")
+        with self.prof.span("phase.autotune"):
+            best = self._calibrate()
+        self.stage_ok()
+        if best is None:
+            return
+        try:
+            save_tuning(self.state.base_dir, self.TENANT, self.DEST_DRIVE, best)
+        except Exception as e:
+            self.log(f"[TUNE] could not save the calibration: {e}")
+        self._apply_tuning(best, "calibrated")
+
+    def _apply_tuning(self, t, how):
+        x = self.client.xfer
+        self.CHUNK = x.CHUNK = int(t["chunk"])
+        self.MAX_SINGLE = x.MAX_SINGLE = int(t["max_single"])
+        note = ""
+        # scheduler jobs share one worker budget; there only the sizes apply
+        if self._aimd_enabled:
+            self._target_workers = x.set_concurrency(t["workers"])
+            self._workers_cap = self._target_workers
+            self.stats.set_workers(self._target_workers)
+            if self._target_workers != t["workers"]:
+                note = f" (worker pool allows {self._target_workers})"
+        self.log(f"[TUNE] {how}: workers={t['workers']}{note} chunk={t['chunk'] // 1024 // 1024}MB "
+                 f"small<={t['max_single'] // 1024 // 1024}MB"
+                 + (f" ({t['goodput'] / 1024 / 1024:.1f} MB/s, {t['throttle_rate']:.1%} throttled)"
+                    if "goodput" in t else ""))
+
+    def _throttles(self):
+        # throttled answers so far (429/503 retries, by the shared policy)
+        rs = self.RH.policy.stats()["retry_reasons"]
+        return sum(n for k, n in rs.items() if k.endswith((":429", ":503")))
+
+    def _autotune_files(self):
+        # breadth-first from AUTOTUNE_PATH, up to AUTOTUNE_LIST files: [(id, name, size)]
+        x = self.client.xfer
+        out, todo = [], [self.AUTOTUNE_PATH or self.SRC_PARENT or "root"]
+        while todo and len(out) < AUTOTUNE_LIST and not self.CANCEL_EV.is_set():
+            url = x._children_url(self.SRC_DRIVE, todo.pop(0), "id,name,size,folder,file")
+            while url:
+                j = x._list(url).json()
+                for ch in j.get("value", []):
+                    if "folder" in ch:
+                        todo.append(ch["id"])
+                    else:
+                        out.append((ch["id"], ch["name"], ch.get("size") or 0))
+                url = j.get("@odata.nextLink") if len(out) < AUTOTUNE_LIST else None
+        return out
+
+    def _calibrate(self):
+        x = self.client.xfer
+        sample = pick_sample(self._autotune_files(), self.AUTOTUNE_MB * 1024 * 1024)
+        if not sample:
+            self.log("[TUNE] no files to calibrate with; keeping the configured settings")
+            return None
+        total = sum(f[2] for f in sample)
+        self.log(f"[TUNE] calibrating with {len(sample)} files, {total / 1024 / 1024:.1f} MB per trial")
+        dc = x._dc(self.DEST_DRIVE)
+        scratch = dc.ensure_folder_by_path(self.DEST_DRIVE, self.DEST_PARENT, SCRATCH_NAME)
+        chunk, small = x.CHUNK, x.MAX_SINGLE
+
+        def trial(t):
+            if self.CANCEL_EV.is_set():
+                return None
+            x.CHUNK, x.MAX_SINGLE = t["chunk"], t["max_single"]
+            thr0 = self._throttles()
+            t0 = time.monotonic()
+            with ThreadPoolExecutor(max_workers=t["workers"], thread_name_prefix="tune") as ex:
+                futs = [ex.submit(x.upload_stream_replace, self.DEST_DRIVE, scratch, f"{n}-{nm}", self.SRC_DRIVE,
+                                  iid, size) for n, (iid, nm, size) in enumerate(sample)]
+            errors = sum(1 for f in futs if f.exception() is not None)
+            res = score(total, time.monotonic() - t0, self._throttles() - thr0,
+                                 sum(requests_for(s, t["chunk"], t["max_single"]) for _, _, s in sample),
+                                 errors)
+            self.log(f"[TUNE] workers={t['workers']} chunk={t['chunk'] // 1024 // 1024}MB "
+                     f"small<={t['max_single'] // 1024 // 1024}MB: {res['goodput'] / 1024 / 1024:.1f} MB/s, "
+                     f"{res['throttle_rate']:.1%} throttled" + (f", {errors} failed" if errors else ""))
+            return res
+
+        self._tuning = True
+        try:
+            start = {"workers": x.concurrency(), "chunk": chunk, "max_single": small}
+            best, res = coordinate_search(start, trial, [s for _, _, s in sample])
+        finally:
+            self._tuning = False
+            x.CHUNK, x.MAX_SINGLE = chunk, small
+            try:
+                dc.delete_items(self.DEST_DRIVE, [scratch])
+            except Exception as e:
+                self.log(f"[TUNE] could not remove {SCRATCH_NAME}: {e}")
+        if res is None or not res["score"]:
+            self.log("[TUNE] calibration inconclusive; keeping the configured settings")
+            return None
+        return {**best, "goodput": round(res["goodput"]), "throttle_rate": round(res["throttle_rate"], 4)}
+
+    def _apply_plan_file(self):
+        # the plan pins source/destination; the ledger signature follows it
+        plan = load_plan(self.PLAN_FILE)
+        self.SRC_DRIVE   = plan["src_drive"]
+        self.SRC_PARENT  = plan["src_parent"]
+        self.DEST_DRIVE  = plan["dest_drive"]
+        self.DEST_PARENT = plan["dest_parent"]
+        self.ROOT_NAME   = plan["root_name"]
+        # the walk already applied the plan's rules; the audit still needs them
+        self.FILTERS = plan.get("filters") or None
+        self.filter = ItemFilter.from_spec(self.FILTERS, root=self.ROOT_NAME)
+        if self.client is not None:
+            self.client.xfer.filter = self.filter
+        if not plan.get("complete", True):
+            self.log("[PLAN] warning: plan was cancelled before the walk finished; only its actions will run")
+        return plan
+
+    def plan_job(self, cfg: dict):
+        """Dry run: walk both sides, save the plan under <state>/plans and log
+        what a real run would copy/skip/delete with a duration estimate."""
+        self.configure(cfg)
+        self.last_result = None
+
+        def _runner():
+            try:
+                self.lazy_init()
+                self.CANCEL_EV.clear()
+                self.stage("planning (dry run)")
+                plan = self.client.plan_files_exact(
+                    src_drive=self.SRC_DRIVE,
+                    src_parent=(self.SRC_PARENT or "root"),
+                    dest_drive=self.DEST_DRIVE,
+                    dest_parent=self.DEST_PARENT,
+                    root_name=self.ROOT_NAME,
+                    log=self.log,
+                )
+                path = save_plan(self.state.base_dir, {**plan, "tenant": self.TENANT, "filters": self.FILTERS})
+                sm = plan["summary"]
+                est = estimate_duration(self.state.base_dir, sm["copy_files"], sm["copy_bytes"], tenant=self.TENANT)
+                for line in summary_lines(plan, est):
+                    self.log(line)
+                self.log(f"[PLAN] saved to {path}")
+                self.stage_ok()
+                self.last_result = {"status": "planned", "plan": path, "summary": sm,
+                                    "estimate_s": est["seconds"] if est else None}
+            except Exception as e:
+                self.stage_fail()
+                self.log(f"[FATAL] {type(e).__name__}: {e}")
+                self.last_result = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
 
+        t = Thread(target=_runner, daemon=True)
+        t.start()
+        self._job_thread = t
+        return t
+
+    def start_job(self, cfg: dict):
+        self.configure(cfg)
+        self._plan = self._apply_plan_file() if self.PLAN_FILE else None
         self._ensure_state()
         phase = self._state.get("phase")
         self.log(f"[RESUME] Phase = {phase}")
@@ -421,14 +849,17 @@ class Controller:
         # reset stats fresh for this run
         self.stats = Stats()
         self.stats.set_workers(self._target_workers)
+        self.prof.reset_spans()
 
         # rebind hooks if client already exists
         if self.client is not None:
             x = self.client.xfer
             x.on_discover_file = self.stats.on_discover_file
             x.on_file_done     = self.stats.on_file_done
+            x.reset_dedup()
 
-        self._start_aimd_loop_once()
+        if self._aimd_enabled:
+            self._start_aimd_loop_once()
         job_sig = {
             "src_drive":   cfg.get("SRC_DRIVE"),
             "src_parent":  cfg.get("SRC_PARENT"),
@@ -447,11 +878,24 @@ class Controller:
                 self.lazy_init()
             except Exception as e:
                 self.log(f"[INIT-ERROR] {e}")
+                self.last_result = {"status": "failed", "error": str(e)}
                 return
             self._run_job()
 
-        Thread(target=_runner, daemon=True).start()
-
+        self.last_result = None
+        t = Thread(target=_runner, daemon=True)
+        t.start()
+        self._job_thread = t
+        return t
+
+    def wait_job(self, timeout=None):
+        """Block until the running job finishes; returns last_result (None if still running)."""
+        t = self._job_thread
+        if t is not None:
+            t.join(timeout)
+            if t.is_alive():
+                return None
+        return self.last_result
 
     def _start_aimd_loop_once(self):
         if getattr(self, "_aimd_thread", None) and self._aimd_thread.is_alive():
@@ -461,6 +905,8 @@ class Controller:
         def _aimd():
             while not self._aimd_stop and not self.CANCEL_EV.is_set():
                 time.sleep(20)
+                if self._tuning:
+                    continue
                 snap = self.stats.snapshot()
                 thr = snap.get("throttles_recent", 0)
 
@@ -473,9 +919,10 @@ class Controller:
                         self._target_workers = max(1, self._target_workers - 1)
                         self.stats.set_workers(self._target_workers)
                         self.log("[AIMD] throttle -> scale DOWN")
-                elif thr == 0 and snap["files_done"] < snap["files_total"]:
+                elif (thr == 0 and snap["files_done"] < snap["files_total"]
+                      and (self._workers_cap is None or self._target_workers < self._workers_cap)):
                     if xu():
-                        self._target_workers = min(4, self._target_workers + 1)
+                        self._target_workers = self.client.xfer.concurrency()
                         self.stats.set_workers(self._target_workers)
                         self.log("[AIMD] stable -> scale UP")
 
@@ -501,62 +948,107 @@ class Controller:
     #  the work
     def _run_job(self):
         try:
-            _ = self.get_token()
+            if not self._offline():
+                _ = self.get_token()
             self.CANCEL_EV.clear()
 
+            # a saved plan already knows which folders it needs
+            if self._plan is not None and self._state.get("phase") == "folders":
+                self._state["phase"] = "files"; self._save_state()
+
             if self._state.get("phase") == "folders":
                 self.stage("mirroring folder structure")
                 self.log("########################")
                 self.log("#-FILES MIRROR STARTED-#")
                 self.log("########################")
-                self.client.mirror_folders_only(
-                    src_drive=self.SRC_DRIVE,
-                    src_parent=(self.SRC_PARENT or "root"),
-                    dest_drive=self.DEST_DRIVE,
-                    dest_parent=self.DEST_PARENT,
-                    root_name=self.ROOT_NAME,
-                    log=self.log,
-                )
+                with self.prof.span("phase.folders"):
+                    self.client.mirror_folders_only(
+                        src_drive=self.SRC_DRIVE,
+                        src_parent=(self.SRC_PARENT or "root"),
+                        dest_drive=self.DEST_DRIVE,
+                        dest_parent=self.DEST_PARENT,
+                        root_name=self.ROOT_NAME,
+                        log=self.log,
+                        extra_dests=self.EXTRA_DESTS,
+                    )
                 self.stage_ok()
                 if self.CANCEL_EV.is_set():
                     self.stage("cancelled"); self._save_state()
+                    self.last_result = {"status": "cancelled"}
                     return
 
                 self._state["phase"] = "files"; self._save_state()
 
             if self._state.get("phase") == "files":
+                self._autotune()
+                if self.CANCEL_EV.is_set():
+                    self.stage("cancelled"); self._save_state()
+                    self.last_result = {"status": "cancelled"}
+                    return
                 self.stage("copying files to destination")
-                self.client.mirror_files_exact(
-                    src_drive=self.SRC_DRIVE,
-                    src_parent=(self.SRC_PARENT or "root"),
-                    dest_drive=self.DEST_DRIVE,
-                    dest_parent=self.DEST_PARENT,
-                    root_name=self.ROOT_NAME,
-                    log=self.log,
-                )
+                if self.filter is not None:
+                    self.filter.reset_counts()
+                t0 = time.time()
+                b0, f0 = self.stats.bytes_done, self.stats.files_done
+                with self.prof.span("phase.files"):
+                    if self._plan is not None:
+                        self.log(f"[PLAN] executing {self.PLAN_FILE}")
+                        self.client.execute_plan(self._plan, log=self.log)
+                    else:
+                        self.client.mirror_files_exact(
+                            src_drive=self.SRC_DRIVE,
+                            src_parent=(self.SRC_PARENT or "root"),
+                            dest_drive=self.DEST_DRIVE,
+                            dest_parent=self.DEST_PARENT,
+                            root_name=self.ROOT_NAME,
+                            log=self.log,
+                            extra_dests=self.EXTRA_DESTS,
+                        )
                 self.stage_ok()
+                if self.filter is not None:
+                    self.log(self.filter.summary())
                 if self.CANCEL_EV.is_set():
                     self.stage("cancelled"); self._save_state()
+                    self.last_result = {"status": "cancelled"}
+                    return
+                # calibrates the planner's duration estimate
+                try:
+                    record_throughput(self.state.base_dir,
+                                      files=self.stats.files_done - f0, bytes_=self.stats.bytes_done - b0,
+                                      elapsed=time.time() - t0, tenant=self.TENANT, dest_drive=self.DEST_DRIVE)
+                except Exception:
+                    pass
+
+                self._state["phase"] = "reconcile" if self.DELETE_EXTRAS else "audit"; self._save_state()
+
+            if self._state.get("phase") == "reconcile":
+                self.stage("removing extra destination items")
+                with self.prof.span("phase.reconcile"):
+                    self._reconcile_pass()
+                self.stage_ok()
+                if self.CANCEL_EV.is_set():
+                    self.stage("cancelled"); self._save_state()
+                    self.last_result = {"status": "cancelled"}
                     return
-
                 self._state["phase"] = "audit"; self._save_state()
 
             if self._state.get("phase") == "audit":
                 self.stage("post job audit")
-                self._audit_pass(
-                    src_drive=self.SRC_DRIVE,
-                    src_parent=(self.SRC_PARENT or "root"),
-                    dest_drive=self.DEST_DRIVE,
-                    dest_parent=self.DEST_PARENT,
-                    root_name=self.ROOT_NAME,
-                )
+                with self.prof.span("phase.audit"):
+                    audit = self._audit_targets()
+                if self.CANCEL_EV.is_set():
+                    self.stage("cancelled"); self._save_state()
+                    self.last_result = {"status": "cancelled", "audit": audit}
+                    return
                 self.stage_ok()
                 self.log("FILES MIRRORED")
                 self._clear_state()
+                self.last_result = {"status": "done", "audit": audit}
 
         except Exception as e:
             self.stage_fail()
             self.log(f"[FATAL] {type(e).__name__}: {e}")
+            self.last_result = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
 
         finally:
             # stop AIMD + finish stats no matter what
@@ -570,101 +1062,351 @@ class Controller:
                 self.stats.finish()
             except Exception:
                 pass
+            self._profile_report()
 
-
-    def _audit_pass(self, *, src_drive, src_parent, dest_drive, dest_parent, root_name):
+    def _profile_report(self):
+        # where the time went, per span; any capture still running is written too
+        try:
+            rs = self.RH.policy.stats() if self.RH is not None else None
+            if rs and (rs["retries"] or rs["gave_up"]):
+                self.log(f"[RETRY] {rs['retries']:,} retries {rs['retry_reasons']}; "
+                         f"gave up {rs['gave_up']:,} {rs['give_up_reasons']}")
+            for line in self.prof.summary_lines():
+                self.log(line)
+            self.log(f"[PROF] spans -> {self.prof.dump_spans()}")
+            self.prof.stop_all()
+        except Exception as e:
+            self.log(f"[PROF] report failed: {type(e).__name__}: {e}")
+
+    # runtime profiling toggles (GUI buttons, CLI SIGUSR1/SIGUSR2); each returns True when switched on
+    def toggle_cpu_profile(self, seconds=None):
+        if self.prof.cpu_on:
+            self.prof.stop_cpu()
+            return False
+        return self.prof.start_cpu(seconds)
+
+    def toggle_mem_profile(self):
+        if self.prof.mem_on:
+            self.prof.stop_mem()
+            return False
+        return self.prof.start_mem()
+
+
+    def _reconcile_pass(self):
+        extras = dict((self._state or {}).get("extras") or {})
+        if not extras:
+            self.log("[EXTRA] nothing to remove")
+            return None
+        # fan-out jobs record each extra with the index of its destination
+        by_target = {}
+        for k, v in extras.items():
+            by_target.setdefault(v[3] if len(v) > 3 else 0, {})[k] = v[:3]
+        drives = [self.DEST_DRIVE, *(t[0] for t in self.EXTRA_DESTS)]
+        out = []
+        for target, part in sorted(by_target.items()):
+            if target >= len(drives):
+                continue  # recorded by a job with more destinations
+            out.append(self._reconcile_target(drives[target], part, target))
+        return out[0] if len(out) == 1 else out
+
+    def _reconcile_target(self, dest_drive, extras, target):
+        tag = f" (dest {target + 1})" if target else ""
+        res = self.client.reconcile_extras(
+            dest_drive=dest_drive, extras=extras, log=self.log, dry_run=self.EXTRAS_DRY_RUN,
+        )
+        if self.EXTRAS_DRY_RUN:
+            report = Path(self.state.base_dir) / "reports" / f"extras-{time.strftime('%Y%m%d-%H%M%S')}{f'-{target + 1}' if target else ''}.json"
+            report.parent.mkdir(parents=True, exist_ok=True)
+            with report.open("w", encoding="utf-8") as f:
+                json.dump({"dest_drive": dest_drive, "summary": res,
+                           "extras": [{"id": k, "path": v[0], "kind": v[1], "size": v[2]} for k, v in extras.items()]},
+                          f, ensure_ascii=False, indent=1)
+            self.log(f"[EXTRA:DRY-RUN]{tag} {res['files']:,} files + {res['folders']:,} folders "
+                     f"({res['bytes']:,} bytes) would be deleted; report: {report}")
+        else:
+            self.log(f"[EXTRA:SUMMARY]{tag} deleted={res['deleted']:,}, failed={res['failed']:,}")
+        return res
+
+    def _audit_targets(self):
+        """Audit every destination of the job; fan-out jobs sum the file counts and keep each result under "targets"."""
+        dests = [(self.DEST_DRIVE, self.DEST_PARENT, self.ROOT_NAME), *self.EXTRA_DESTS]
+        results = []
+        for k, (drive, parent, root) in enumerate(dests):
+            if self.CANCEL_EV.is_set():
+                break
+            if len(dests) > 1:
+                self.log(f"[AUDIT] destination {k + 1} of {len(dests)}: {drive}")
+            results.append(self._audit_pass(src_drive=self.SRC_DRIVE, src_parent=(self.SRC_PARENT or "root"),
+                                             dest_drive=drive, dest_parent=parent, root_name=root, target=k))
+        if len(dests) == 1 or not results or results[0] is None:
+            return results[0] if results else None
+        # counts add up over the destinations (src too: each one has its own copy of every
+        # file); a sample's rate estimate and escalations stay per destination, under "targets"
+        res = {"mode": results[0]["mode"]} if "mode" in results[0] else {}
+        for key in ("src", "sampled", "dst", "matched", "mismatched", "missing", "from_records", "probed"):
+            if key in results[0]:
+                res[key] = sum((r or {}).get(key, 0) for r in results)
+        res["targets"] = results
+        return res
+
+    def _audit_pass(self, *, src_drive, src_parent, dest_drive, dest_parent, root_name, target=0):
+        # target: the destination's index in a fan-out job (its copy records are keyed by it)
+        if self.AUDIT == "sample":
+            return self._sample_audit_pass(src_drive=src_drive, src_parent=src_parent, dest_drive=dest_drive,
+                                           dest_parent=dest_parent, root_name=root_name, target=target)
+        dst_root_id = self._audit_dest_root(dest_drive, dest_parent, root_name)
+        res = self._audit_walk(src_drive, dest_drive, src_parent or "root", dst_root_id, root_name or "", target=target)
+        self.log(
+            f"[AUDIT:SUMMARY] src_files={res['src']}, dst_files_seen={res['dst']}, "
+            f"matched={res['matched']}, mismatched={res['mismatched']}, missing={res['missing']} "
+            f"({res['from_records']} from copy records, {res['probed']} looked up)"
+        )
+        return res
+
+    def _audit_shard(self, shard):
+        """Audit one shard of a sharded run (its src/dst/path/recursive payload) against its copy records."""
+        if self.AUDIT == "sample" and shard["recursive"]:
+            return self._sample_audit_pass(src_drive=self.SRC_DRIVE, src_parent=shard["src"], dest_drive=self.DEST_DRIVE,
+                                           dest_parent=shard["dst"], root_name="")
+        # a files-only shard is one folder's files, mostly checked from records; sampling buys nothing
+        res = self._audit_walk(self.SRC_DRIVE, self.DEST_DRIVE, shard["src"], shard["dst"], shard["path"],
+                               recursive=shard["recursive"])
+        self.log(
+            f"[AUDIT:SUMMARY] {shard['path'] or '/'}: src_files={res['src']}, dst_files_seen={res['dst']}, "
+            f"matched={res['matched']}, mismatched={res['mismatched']}, missing={res['missing']} "
+            f"({res['from_records']} from copy records, {res['probed']} looked up)"
+        )
+        return res
+
+    def _audit_dest_root(self, dest_drive, dest_parent, root_name):
+        if not root_name:
+            return dest_parent
+        did = self.client.xfer._probe_folder(dest_drive, dest_parent, root_name)
+        if did is None:
+            self.log("[AUDIT] Destination root missing; all files deemed missing.")
+        return did
+
+    def _audit_walk(self, src_drive, dest_drive, sid, did, path, recursive=True, target=0):
+        """Check every source file below sid against the destination folder did (path: sid's path).
+
+        A file the files phase copied or skipped, unchanged since (same
+        eTag), is checked against the destination item recorded then; only
+        files without such a record are looked up at the destination, by
+        path from did. With did None everything is missing.
+        """
         total_src = total_dst = 0
         matched = mismatched = missing = 0
+        recorded = probed = 0
 
-        
-        if root_name:
-            r = self.RH.get(
-                f"{GRAPH}/drives/{dest_drive}/items/{dest_parent}:/{quote(root_name, safe='')}:",
-                ok_extra=(404,),
-            )
-            if r.status_code == 404:
-                self.log("[AUDIT] Destination root missing; all files deemed missing.")
-                dst_root_id = None
-            else:
-                r.raise_for_status()
-                dst_root_id = r.json()["id"]
-        else:
-            dst_root_id = dest_parent
-
-        stack = [(src_parent or "root", dst_root_id, root_name or "")]
+        flt = self.filter
+        cut = len(path) + 1 if path else 0
+        stack = [(sid, path)]
         while stack and not self.CANCEL_EV.is_set():
-            sid, did, path = stack.pop()
+            sid, path = stack.pop()
             self.log(f"[AUDIT] {path or '/'}")
 
-            # Build dest file map only if dest folder exists 
-            
-            dest_files = {}
-            if did:
-                dest_files = self.client.list_files_map(dest_drive, did)
-
-            url = (
-                f"{GRAPH}/drives/{src_drive}/root/children?$top=200&$select=id,name,folder,file,size,hashes&$orderby=name"
-                if sid == "root" else
-                f"{GRAPH}/drives/{src_drive}/items/{sid}/children?$top=200&$select=id,name,folder,file,size,hashes&$orderby=name"
-            )
-
+            url = self.client.xfer._children_url(src_drive, sid, "id,name,eTag,folder,file,size,hashes,fileSystemInfo")
 
             while url and not self.CANCEL_EV.is_set():
-                j = self.RH.get(url).json()
+                with self.prof.span("audit.list_src"):
+                    r = self.client.xfer._list(url)
+                with self.prof.span("audit.json"):
+                    j = r.json()
                 for ch in j.get("value", []):
                     nm = ch["name"]
                     rel = f"{path+'/'+nm if path else nm}"
 
                     if "folder" in ch:
-                        ndid = None
-                        if did:
-                            r = self.RH.get(
-                                f"{GRAPH}/drives/{dest_drive}/items/{did}:/{quote(nm, safe='')}:?$select=id,folder",
-                                ok_extra=(404,),
-                            )
-                            if r.status_code == 200 and "folder" in r.json():
-                                ndid = r.json()["id"]
-                        stack.append((ch["id"], ndid, rel))
+                        if not recursive or (flt is not None and not flt.want_dir(rel, nm)):
+                            continue
+                        stack.append((ch["id"], rel))
                         continue
 
                     # files
-                    total_src += 1
                     src_size = ch.get("size", 0) or 0
-                    src_hash = (ch.get("hashes") or {}).get("quickXorHash")
+                    src_hash = _qxh(ch)
+                    if flt is not None and not flt.want_file(rel, nm, src_size, ch):
+                        continue
+                    total_src += 1
 
-                    if did:
-                        ex = self.client.try_get_dest_file_fast(dest_drive, did, nm)
+                    ok, ex = self._audit_check(dest_drive, did, rel[cut:], ch["id"], ch.get("eTag"),
+                                               src_size, src_hash, _mtime(ch), target)
+                    if ok is None:
+                        probed += 1
+                        ok = bool(skip_reason(src_size, src_hash, ex, _mtime(ch), self.SKIP_MODE)) if ex else None
                     else:
-                        ex = None
+                        recorded += 1
 
                     if ex:
                         total_dst += 1
-                        _, dst_size, dst_hash = ex
-                        same_size = (dst_size == src_size)
-                        hashes_known_and_equal = bool(src_hash) and bool(dst_hash) and (src_hash == dst_hash)
-                        hashes_both_missing = (not src_hash) and (not dst_hash)
-
-                        if same_size and (hashes_known_and_equal or hashes_both_missing):
+                        if ok:
                             matched += 1
                         else:
                             mismatched += 1
-
-                        """
-                        if dst_size == src_size and (src_hash and dst_hash and src_hash == dst_hash):
-                            matched += 1
-                        else:
-                            mismatched += 1
-                            self.log(f"  [AUDIT:MISMATCH] {rel} (src {src_size}/{src_hash} vs dst {dst_size}/{dst_hash})")
-                        """    
+                            self.log(f"  [AUDIT:MISMATCH] {rel} (src {src_size}/{src_hash} vs dst {ex[1]}/{ex[2]})")
                     else:
                         missing += 1
                         self.log(f"  [AUDIT:MISSING]   {rel}")
 
                 url = j.get("@odata.nextLink")
 
-        summary = (
-            f"[AUDIT:SUMMARY] src_files={total_src}, dst_files_seen={total_dst}, "
-            f"matched={matched}, mismatched={mismatched}, missing={missing}"
+        return {"src": total_src, "dst": total_dst, "matched": matched, "mismatched": mismatched, "missing": missing,
+                "from_records": recorded, "probed": probed}
+
+    def _recorded_dest(self, item_id, etag, target=0):
+        # destination (id, size, hash, mtime) the files phase saw for this very source version
+        if not self.AUDIT_RECORDS:
+            return None
+        rec = self._ledger_get(_tkey(item_id, target))
+        if rec and len(rec) > 2 and rec[2] and rec[0] == etag and rec[1] in (LEDGER_DONE, LEDGER_SKIP):
+            return tuple(rec[2])
+        return None
+
+    def _audit_check(self, dest_drive, did, rel, item_id, etag, src_size, src_hash, src_mtime, target=0):
+        """(True/False, dest) decided from the copy-time record, else (None, dest looked up at Graph)."""
+        ex = self._recorded_dest(item_id, etag, target)
+        if ex is not None:
+            if skip_reason(src_size, src_hash, ex, src_mtime, self.SKIP_MODE):
+                return True, ex
+            if ex[2] or not src_hash:
+                return False, ex
+            # the upload answer had no hash yet (large files): ask Graph
+        if not did:
+            return None, None
+        with self.prof.span("audit.probe"):
+            return None, self.client.try_get_dest_file_by_path(dest_drive, did, rel)
+
+    def _sample_audit_pass(self, *, src_drive, src_parent, dest_drive, dest_parent, root_name, target=0):
+        """Audit a stratified random sample instead of every file.
+
+        1. list the source tree (listings only, AUDIT_WORKERS folders at a
+           time) and feed every file to a StratifiedSample keyed by top
+           folder and size class;
+        2. probe the drawn files at the destination by path;
+        3. estimate the mismatch/missing rates with confidence intervals;
+        4. fully audit (at most AUDIT_ESCALATE) top folders whose sample
+           had a bad file, so the counts for those are exact.
+        """
+        conf = self.AUDIT_CONFIDENCE / 100
+        n_max = self.AUDIT_SAMPLE or sample_size(self.AUDIT_MARGIN / 100, conf)
+        sample = StratifiedSample(cap=n_max)
+        flt = self.filter
+        base = root_name or ""
+        tops = {}   # top folder name -> source id
+
+        def _list(sid):
+            out, url = [], self.client.xfer._children_url(src_drive, sid, "id,name,eTag,folder,file,size,hashes,fileSystemInfo")
+            while url and not self.CANCEL_EV.is_set():
+                with self.prof.span("audit.list_src"):
+                    j = self.client.xfer._list(url).json()
+                out += j.get("value", [])
+                url = j.get("@odata.nextLink")
+            return out
+
+        self.log("[AUDIT] sampling: listing source tree")
+        with ThreadPoolExecutor(max_workers=AUDIT_WORKERS, thread_name_prefix="audit") as pool:
+            futs = {pool.submit(_list, src_parent or "root"): (base, "")}
+            while futs and not self.CANCEL_EV.is_set():
+                done, _ = wait(futs, return_when=FIRST_COMPLETED)
+                for f in done:
+                    path, top = futs.pop(f)
+                    for ch in f.result():
+                        nm = ch["name"]
+                        rel = f"{path+'/'+nm if path else nm}"
+                        if "folder" in ch:
+                            if flt is not None and not flt.want_dir(rel, nm):
+                                continue
+                            if path == base:
+                                tops[nm] = ch["id"]
+                            futs[pool.submit(_list, ch["id"])] = (rel, top or nm)
+                            continue
+                        size = ch.get("size", 0) or 0
+                        if flt is not None and not flt.want_file(rel, nm, size, ch):
+                            continue
+                        sample.add(top, size, (rel, size, _qxh(ch), _mtime(ch), ch["id"], ch.get("eTag")))
+            for f in futs:
+                f.cancel()
+        if self.CANCEL_EV.is_set():
+            return None
+
+        N = sample.total
+        n_want = self.AUDIT_SAMPLE or sample_size(self.AUDIT_MARGIN / 100, conf, N)
+        drawn = sample.draw(n_want)
+        self.log(f"[AUDIT] sampling {len(drawn):,} of {N:,} files over {len(sample.alloc)} strata")
+
+        def _probe(rec):
+            rel, size, qxh, mt, item_id, etag = rec
+            ok, ex = self._audit_check(dest_drive, dest_parent, rel, item_id, etag, size, qxh, mt, target)
+            if ex is None:
+                return "missing"
+            if ok is None:
+                ok = skip_reason(size, qxh, ex, mt, self.SKIP_MODE)
+            return "ok" if ok else "mismatched"
+
+        # per stratum: bad files found; per top folder: how many (escalation order)
+        bad_mis, bad_miss, failed_tops = Counter(), Counter(), Counter()
+        counts = {"matched": 0, "mismatched": 0, "missing": 0}
+        with ThreadPoolExecutor(max_workers=AUDIT_WORKERS, thread_name_prefix="audit") as pool:
+            for (key, rec), res in zip(drawn, pool.map(_probe, [rec for _, rec in drawn])):
+                if res == "ok":
+                    counts["matched"] += 1
+                    continue
+                counts[res] += 1
+                (bad_mis if res == "mismatched" else bad_miss)[key] += 1
+                failed_tops[key[0]] += 1
+                self.log(f"  [AUDIT:{res.upper()}] {rec[0]}")
+        if self.CANCEL_EV.is_set():
+            return None
+
+        est_mis = sample.estimate(bad_mis, conf)
+        est_miss = sample.estimate(bad_miss, conf)
+        pct = lambda e: f"{e['rate']*100:.2f}% [{e['ci'][0]*100:.2f}-{e['ci'][1]*100:.2f}%]"
+        self.log(f"[AUDIT:SAMPLE] {len(drawn):,}/{N:,} files checked; at {self.AUDIT_CONFIDENCE:g}% confidence "
+                 f"mismatched {pct(est_mis)}, missing {pct(est_miss)}")
+
+        result = {
+            "mode": "sample", "src": N, "sampled": len(drawn), "dst": counts["matched"] + counts["mismatched"],
+            **counts,
+            "mismatch_rate": est_mis["rate"], "mismatch_ci": est_mis["ci"],
+            "missing_rate": est_miss["rate"], "missing_ci": est_miss["ci"],
+            "confidence": self.AUDIT_CONFIDENCE, "escalated": [],
+        }
+
+        # escalation: exact counts for the top folders whose sample failed
+        if failed_tops and self.AUDIT_ESCALATE > 0:
+            order = [t for t, _ in failed_tops.most_common()]
+            pick = order[:self.AUDIT_ESCALATE]
+            if len(order) > len(pick):
+                self.log(f"[AUDIT] {len(order) - len(pick)} more failing folders not escalated (AUDIT_ESCALATE)")
+            dst_root_id = self._audit_dest_root(dest_drive, dest_parent, root_name)
+            for top in pick:
+                if self.CANCEL_EV.is_set():
+                    break
+                # sampled counts of this folder are replaced by the full ones
+                for k, m in sample.alloc.items():
+                    if k[0] == top:
+                        result["matched"] -= m - bad_mis[k] - bad_miss[k]
+                        result["mismatched"] -= bad_mis[k]
+                        result["missing"] -= bad_miss[k]
+                        result["dst"] -= m - bad_miss[k]
+                rel = f"{base+'/'+top if base else top}" if top else base
+                self.log(f"[AUDIT] escalating to a full audit of {rel or '/'}")
+                if top:
+                    did = self.client.xfer._probe_folder(dest_drive, dst_root_id, top) if dst_root_id else None
+                    full = self._audit_walk(src_drive, dest_drive, tops[top], did, rel, target=target)
+                else:
+                    # files right under the copied folder
+                    full = self._audit_walk(src_drive, dest_drive, src_parent or "root", dst_root_id, rel,
+                                            recursive=False, target=target)
+                for k in ("matched", "mismatched", "missing", "dst"):
+                    result[k] += full[k]
+                result["escalated"].append({"folder": rel or "/", **full})
+                self.log(f"[AUDIT:ESCALATED] {rel or '/'}: src_files={full['src']}, matched={full['matched']}, "
+                         f"mismatched={full['mismatched']}, missing={full['missing']}")
+
+        self.log(
+            f"[AUDIT:SUMMARY] sampled={len(drawn)}/{N}, matched={result['matched']}, "
+            f"mismatched={result['mismatched']}, missing={result['missing']}"
+            + (f", escalated={len(result['escalated'])} folders" if result["escalated"] else "")
         )
-        self.log(summary)
-        return {"src": total_src, "dst": total_dst, "matched": matched, "mismatched": mismatched, "missing": missing}
+        return result
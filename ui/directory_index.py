@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import re
+import time
+from pathlib import Path
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, List, Optional
+
+__all__ = ["DirectoryIndex"]
+
+DEFAULT_TTL = 24 * 3600      # sites/users are re-listed in the background after this
+LIBS_TTL = 6 * 3600
+
+
+class _Names:
+    """Sorted (lowercase name, item) list: prefix search by bisect, then substring."""
+
+    def __init__(self, items: List[Dict[str, Any]], key="name"):
+        self.rows = sorted(((str(it.get(key) or "").lower(), it) for it in items), key=lambda r: r[0])
+        self.keys = [r[0] for r in self.rows]
+
+    def search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        q = (query or "").strip().lower()
+        if not q:
+            return [it for _, it in self.rows[:limit]]
+        out = []
+        i = bisect.bisect_left(self.keys, q)
+        while i < len(self.keys) and self.keys[i].startswith(q) and len(out) < limit:
+            out.append(self.rows[i][1]); i += 1
+        if len(out) < limit:
+            for k, it in self.rows:
+                if q in k and not k.startswith(q):
+                    out.append(it)
+                    if len(out) >= limit:
+                        break
+        return out
+
+
+class DirectoryIndex:
+    """On-disk cache of a tenant's sites, users and site libraries.
+
+    Loads instantly from <state>/directory/<tenant>.json; refresh_async()
+    re-lists whatever is older than the TTL on a background thread and
+    bumps `version` when new data lands so the UI can re-filter. Searches
+    never touch Graph.
+    """
+
+    def __init__(self, state_dir, tenant: str, *, ttl: float = DEFAULT_TTL, libs_ttl: float = LIBS_TTL):
+        d = Path(state_dir) / "directory"
+        d.mkdir(parents=True, exist_ok=True)
+        self.path = d / f"{re.sub(r'[^A-Za-z0-9._-]', '_', tenant or 'default')}.json"
+        self.ttl = float(ttl)
+        self.libs_ttl = float(libs_ttl)
+        self.version = 0
+        self._lk = Lock()
+        self._io_lk = Lock()
+        self._refreshing = False
+        self._data = {"sites": {"at": 0, "items": []}, "users": {"at": 0, "items": []}, "libs": {}}
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                self._data.update(json.load(f))
+        except Exception:
+            pass
+        self._sites = _Names(self._data["sites"]["items"])
+        self._users = _Names(self._data["users"]["items"])
+        self._users_upn = _Names(self._data["users"]["items"], key="upn")
+
+    def _save(self):
+        with self._lk:
+            raw = json.dumps(self._data, ensure_ascii=False, separators=(",", ":"))
+        with self._io_lk:
+            tmp = self.path.with_suffix(".json.tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                f.write(raw)
+            os.replace(tmp, self.path)
+
+    def _stale(self, part: str) -> bool:
+        return time.time() - self._data[part]["at"] > self.ttl
+
+    @property
+    def has_sites(self) -> bool:
+        return bool(self._data["sites"]["items"])
+
+    @property
+    def has_users(self) -> bool:
+        return bool(self._data["users"]["items"])
+
+    # ---- refresh ----
+    def refresh_async(self, *, list_sites: Callable, list_users: Callable = None, force=False, log=None):
+        """Re-list stale parts on a daemon thread (at most one refresh at a time)."""
+        with self._lk:
+            if self._refreshing:
+                return None
+            self._refreshing = True
+
+        def _run():
+            try:
+                if force or self._stale("sites"):
+                    self._set("sites", list_sites())
+                    if log: log(f"[INDEX] {len(self._data['sites']['items']):,} sites indexed")
+                if list_users and (force or self._stale("users")):
+                    self._set("users", list_users())
+                    if log: log(f"[INDEX] {len(self._data['users']['items']):,} users indexed")
+            except Exception as e:
+                if log: log(f"[INDEX] refresh failed: {type(e).__name__}: {e}")
+            finally:
+                with self._lk:
+                    self._refreshing = False
+
+        t = Thread(target=_run, name="dir-index", daemon=True)
+        t.start()
+        return t
+
+    def _set(self, part: str, items: List[Dict[str, Any]]):
+        names = _Names(items)
+        upns = _Names(items, key="upn") if part == "users" else None
+        with self._lk:
+            self._data[part] = {"at": time.time(), "items": items}
+            if part == "sites":
+                self._sites = names
+            else:
+                self._users, self._users_upn = names, upns
+            self.version += 1
+        self._save()
+
+    # ---- lookups ----
+    def sites(self) -> List[Dict[str, Any]]:
+        return list(self._data["sites"]["items"])
+
+    def find_sites(self, query: str, limit: int = 200) -> List[Dict[str, Any]]:
+        return self._sites.search(query, limit)
+
+    def find_users(self, query: str, limit: int = 25) -> List[Dict[str, Any]]:
+        out = self._users.search(query, limit)
+        if len(out) < limit:
+            seen = {u["id"] for u in out}
+            out += [u for u in self._users_upn.search(query, limit) if u["id"] not in seen][:limit - len(out)]
+        return out
+
+    def libs(self, site_id: str, fetch: Optional[Callable] = None):
+        """Cached libraries of a site; fetch(site_id) fills a miss/stale entry."""
+        ent = self._data["libs"].get(site_id)
+        if ent and time.time() - ent["at"] <= self.libs_ttl:
+            return ent["items"]
+        if fetch is None:
+            return ent["items"] if ent else None
+        items = fetch(site_id)
+        with self._lk:
+            self._data["libs"][site_id] = {"at": time.time(), "items": items}
+        self._save()
+        return items
+
+    def prefetch_libs(self, site_ids, fetch: Callable):
+        """Warm libs() for likely next picks (type-ahead matches) off the UI thread."""
+        todo = [s for s in site_ids
+                if not (self._data["libs"].get(s) and time.time() - self._data["libs"][s]["at"] <= self.libs_ttl)]
+        if not todo:
+            return
+
+        def _run():
+            for sid in todo:
+                try: self.libs(sid, fetch)
+                except Exception: pass
+        Thread(target=_run, name="dir-prefetch", daemon=True).start()
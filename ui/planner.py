@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+__all__ = ["record_throughput", "estimate_duration", "save_plan", "load_plan", "summary_lines"]
+
+HISTORY_FILE = "throughput.json"
+HISTORY_KEEP = 200
+
+
+def _history_path(state_dir) -> Path:
+    return Path(state_dir) / HISTORY_FILE
+
+
+def _load_history(state_dir) -> List[Dict[str, Any]]:
+    try:
+        with _history_path(state_dir).open("r", encoding="utf-8") as f:
+            return json.load(f).get("runs", [])
+    except Exception:
+        return []
+
+
+def record_throughput(state_dir, *, files: int, bytes_: int, elapsed: float, tenant: str = "", dest_drive: str = ""):
+    """Append one finished copy phase to the history used by estimate_duration()."""
+    if elapsed <= 0 or files <= 0:
+        return
+    runs = _load_history(state_dir)
+    runs.append({
+        "utc": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        "files": int(files), "bytes": int(bytes_), "elapsed": float(elapsed),
+        "tenant": tenant, "dest_drive": dest_drive,
+    })
+    p = _history_path(state_dir)
+    tmp = p.with_suffix(".json.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump({"runs": runs[-HISTORY_KEEP:]}, f, separators=(",", ":"))
+    os.replace(tmp, p)
+
+
+def estimate_duration(state_dir, files: int, bytes_: int, *, tenant: str = "") -> Optional[Dict[str, float]]:
+    """Seconds for `files`/`bytes_` from recorded runs, or None without history.
+
+    Fits elapsed ~= a*files + b*bytes over past runs (per-file overhead plus
+    bandwidth) when there are enough distinct runs, else scales by the
+    aggregate rate. Runs of the same tenant are preferred.
+    """
+    runs = _load_history(state_dir)
+    same = [r for r in runs if tenant and r.get("tenant") == tenant]
+    runs = same or runs
+    if not runs:
+        return None
+
+    a = b = None
+    if len(runs) >= 3:
+        # 2x2 normal equations for least squares without intercept
+        sff = sum(r["files"] ** 2 for r in runs)
+        sbb = sum(r["bytes"] ** 2 for r in runs)
+        sfb = sum(r["files"] * r["bytes"] for r in runs)
+        sft = sum(r["files"] * r["elapsed"] for r in runs)
+        sbt = sum(r["bytes"] * r["elapsed"] for r in runs)
+        det = sff * sbb - sfb * sfb
+        if det > 0:
+            a = (sft * sbb - sbt * sfb) / det
+            b = (sbt * sff - sft * sfb) / det
+    if a is None or a < 0 or b is None or b < 0:
+        tot_t = sum(r["elapsed"] for r in runs)
+        tot_f = sum(r["files"] for r in runs)
+        tot_b = sum(r["bytes"] for r in runs)
+        by_files = files * tot_t / tot_f if tot_f else 0.0
+        by_bytes = bytes_ * tot_t / tot_b if tot_b else 0.0
+        seconds = max(by_files, by_bytes)
+    else:
+        seconds = a * files + b * bytes_
+    return {"seconds": seconds, "runs": len(runs)}
+
+
+def save_plan(state_dir, plan: Dict[str, Any]) -> str:
+    d = Path(state_dir) / "plans"
+    d.mkdir(parents=True, exist_ok=True)
+    plan = {**plan, "created_utc": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")}
+    p = d / f"plan-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    tmp = p.with_suffix(".json.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(plan, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, p)
+    return str(p)
+
+
+def load_plan(path) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _fmt_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if abs(n) < 1024 or unit == "TB":
+            return f"{n:,.1f} {unit}" if unit != "B" else f"{int(n):,} B"
+        n /= 1024
+
+
+def _fmt_hms(seconds: float) -> str:
+    s = max(0, int(seconds))
+    h, s = divmod(s, 3600)
+    m, s = divmod(s, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}"
+
+
+def summary_lines(plan: Dict[str, Any], estimate: Optional[Dict[str, float]], top: int = 20) -> List[str]:
+    sm = plan["summary"]
+    out = [
+        f"[PLAN:SUMMARY] copy={sm['copy_files']:,} ({_fmt_bytes(sm['copy_bytes'])}), "
+        f"skip={sm['skip_files']:,} ({_fmt_bytes(sm['skip_bytes'])}), "
+        f"delete={sm['delete_files']:,} files + {sm.get('delete_folders', 0):,} folders ({_fmt_bytes(sm['delete_bytes'])}), "
+        f"new folders={sm['mkdir']:,}"
+        + (f", filtered out={sm['filtered_files']:,} ({_fmt_bytes(sm['filtered_bytes'])})" if sm.get("filtered_files") else "")
+        + ("" if plan.get("complete", True) else "  (INCOMPLETE: cancelled)"),
+    ]
+    if estimate:
+        out.append(f"[PLAN:ESTIMATE] ~{_fmt_hms(estimate['seconds'])} (from {int(estimate['runs'])} recorded runs)")
+    else:
+        out.append("[PLAN:ESTIMATE] no throughput history yet (finish one job to calibrate)")
+    busiest = sorted(plan["folders"], key=lambda r: r["copy_bytes"], reverse=True)[:top]
+    for r in busiest:
+        if not (r["copy"] or r["delete"]):
+            continue
+        out.append(f"  [PLAN] {r['path'] or '/'}: copy {r['copy']:,} ({_fmt_bytes(r['copy_bytes'])}), "
+                   f"skip {r['skip']:,}, delete {r['delete']:,}{' [new]' if r['mkdir'] else ''}")
+    return out
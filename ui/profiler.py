@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional
+
+__all__ = ["Profiler"]
+
+STOP_GRACE = 10.0     # seconds stop_cpu() waits for busy threads to reach a span boundary
+TOP_N = 40            # rows in the text reports
+MEM_FRAMES = 25       # traceback depth kept by tracemalloc
+# 3.12+: cProfile sits on sys.monitoring, which is process-wide; one Profile sees
+# every thread and a second enable() raises, so per-thread profiles don't work there
+SHARED_CPU = sys.version_info >= (3, 12)
+
+
+class _Span:
+    __slots__ = ("prof", "name", "t0")
+
+    def __init__(self, prof, name):
+        self.prof = prof
+        self.name = name
+
+    def __enter__(self):
+        p, t = self.prof, self.prof._tls
+        d = getattr(t, "depth", 0)
+        t.depth = d + 1
+        if not SHARED_CPU and (p._cpu_gen or getattr(t, "prof", None) is not None):
+            try:
+                p._cpu_enter(t)
+            except Exception:
+                pass  # a profiler problem must never fail the work inside the span
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        dt = time.perf_counter() - self.t0
+        p, t = self.prof, self.prof._tls
+        with p._lk:
+            s = p._spans.get(self.name)
+            if s is None:
+                p._spans[self.name] = [1, dt, dt]
+            else:
+                s[0] += 1; s[1] += dt
+                if dt > s[2]: s[2] = dt
+        t.depth -= 1
+        if getattr(t, "prof", None) is not None:
+            try:
+                p._cpu_exit(t)
+            except Exception:
+                pass
+        return False
+
+
+class Profiler:
+    """Timed spans plus on-demand cProfile / tracemalloc captures.
+
+    Spans are always on: `with prof.span("files.probe"):` adds to a
+    count/total/max table (two perf_counter calls and a lock). Names are
+    "<phase>.<step>"; spans nest, so totals of children may add up to more
+    than the parent when threads overlap.
+
+    start_cpu() profiles every thread that is inside a span: each thread
+    gets its own cProfile.Profile, enabled while it is inside its outermost
+    span and handed over at a span boundary once stop_cpu() is called; the
+    per-thread stats are merged into one .pstats file. On 3.12+ (SHARED_CPU)
+    one process-wide profile covers all threads from start to stop, idle
+    ones included, and spans don't touch it. Memory captures run
+    tracemalloc between start_mem() and stop_mem() and write the top
+    allocation sites plus the growth since start. Everything lands in
+    <state>/profiles/.
+    """
+
+    def __init__(self, state_dir, log=None):
+        self.dir = Path(state_dir) / "profiles"
+        self.log = log or (lambda msg: None)
+        self._lk = Lock()
+        self._spans: Dict[str, list] = {}
+        self._tls = threading.local()
+        # cpu capture: generation > 0 while on; threads drop profiles of an older one
+        self._cpu_gen = 0
+        self._cpu_next = 0
+        self._cpu_t0 = 0.0
+        self._cpu_profs = []       # (thread name, profile) of the running capture
+        self._cpu_live = set()     # those currently enabled on their thread
+        self._cpu_shared = None    # SHARED_CPU: the one process-wide profile
+        self._cpu_timer = None
+        self._mem_base = None
+        self._mem_t0 = 0.0
+
+    # ---- spans ----
+    def span(self, name: str) -> _Span:
+        return _Span(self, name)
+
+    def spans(self) -> Dict[str, Dict[str, float]]:
+        with self._lk:
+            rows = {k: list(v) for k, v in self._spans.items()}
+        return {k: {"count": n, "total_s": round(t, 4), "avg_ms": round(t / n * 1000, 3), "max_ms": round(m * 1000, 3)}
+                for k, (n, t, m) in rows.items()}
+
+    def reset_spans(self):
+        with self._lk:
+            self._spans.clear()
+
+    def summary_lines(self, top: int = 15) -> List[str]:
+        rows = sorted(self.spans().items(), key=lambda kv: kv[1]["total_s"], reverse=True)[:top]
+        return [f"[PROF] {k:<22} n={v['count']:<8,} total={v['total_s']:>9.2f}s  "
+                f"avg={v['avg_ms']:>8.2f}ms  max={v['max_ms']:>9.1f}ms" for k, v in rows]
+
+    def dump_spans(self) -> str:
+        return str(self._write("spans", "json", json.dumps(
+            {"utc": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "spans": self.spans()}, indent=1)))
+
+    # ---- cProfile ----
+    @property
+    def cpu_on(self) -> bool:
+        return bool(self._cpu_gen)
+
+    def start_cpu(self, seconds: Optional[float] = None) -> bool:
+        """Begin a capture; with `seconds` it stops (and is written) by itself."""
+        with self._lk:
+            if self._cpu_gen:
+                return False
+            self._cpu_next += 1
+            self._cpu_gen = self._cpu_next  # a new number, so stale per-thread profiles are dropped
+            self._cpu_profs = []
+            self._cpu_t0 = time.time()
+            if SHARED_CPU:
+                pr = cProfile.Profile()
+                try:
+                    pr.enable()
+                except ValueError as e:  # another profiler (or debugger) holds sys.monitoring
+                    self._cpu_gen = 0
+                    self.log(f"[PROF] cProfile not started: {e}")
+                    return False
+                self._cpu_shared = pr
+        self.log(f"[PROF] cProfile on{f' for {seconds:g}s' if seconds else ''}")
+        if seconds:
+            gen = self._cpu_gen
+            self._cpu_timer = threading.Timer(seconds, lambda: self._cpu_gen == gen and self.stop_cpu())
+            self._cpu_timer.daemon = True
+            self._cpu_timer.start()
+        return True
+
+    def stop_cpu(self) -> Optional[str]:
+        """End the capture and write <profiles>/cpu-<ts>.pstats (+ .txt); returns the .pstats path."""
+        with self._lk:
+            if not self._cpu_gen:
+                return None
+            self._cpu_gen = 0
+        if self._cpu_timer is not None:
+            self._cpu_timer.cancel(); self._cpu_timer = None
+        if self._cpu_shared is not None:
+            pr, self._cpu_shared = self._cpu_shared, None
+            pr.disable()
+            done, stuck = [("all threads", pr)], 0
+        else:
+            done, stuck = self._cpu_collect()
+        if not done:
+            self.log("[PROF] cProfile off: no thread entered a span during the capture")
+            return None
+        st = None
+        for _, prof in done:
+            if st is None:
+                st = pstats.Stats(prof)
+            else:
+                st.add(prof)
+        ts = time.strftime("%Y%m%d-%H%M%S")
+        self.dir.mkdir(parents=True, exist_ok=True)
+        path = self.dir / f"cpu-{ts}.pstats"
+        st.dump_stats(str(path))
+        buf = io.StringIO()
+        st.stream = buf
+        buf.write(f"threads: {', '.join(sorted({n for n, _ in done}))}; {time.time() - self._cpu_t0:.1f}s\n")
+        if stuck:
+            buf.write(f"({stuck} thread(s) still busy at stop were left out)\n")
+        st.sort_stats("cumulative").print_stats(TOP_N)
+        st.sort_stats("tottime").print_stats(TOP_N)
+        self._write(f"cpu-{ts}", "txt", buf.getvalue(), stamp=False)
+        self.log(f"[PROF] cProfile off: {len(done)} thread(s) -> {path}")
+        return str(path)
+
+    def _cpu_collect(self):
+        # this thread can let go of its own profile right away; busy ones
+        # switch theirs off at their next span boundary
+        if getattr(self._tls, "prof", None) is not None:
+            self._cpu_drop(self._tls)
+        deadline = time.time() + STOP_GRACE
+        while self._cpu_live and time.time() < deadline:
+            time.sleep(0.05)
+        with self._lk:
+            live = set(self._cpu_live)
+            done = [(n, pr) for n, pr in self._cpu_profs if pr not in live]
+            stuck = len(self._cpu_profs) - len(done)
+            self._cpu_profs = []
+        return done, stuck
+
+    def toggle_cpu(self):
+        return self.stop_cpu() if self.cpu_on else self.start_cpu()
+
+    # per thread (threading.local): prof, gen (capture it belongs to), on (enabled)
+    def _cpu_enter(self, t):
+        if getattr(t, "prof", None) is not None and t.gen != self._cpu_gen:
+            self._cpu_drop(t)  # capture ended (or restarted) since this thread last ran a span
+        if getattr(t, "prof", None) is None:
+            with self._lk:
+                if not self._cpu_gen:
+                    return
+                t.prof, t.gen, t.on = cProfile.Profile(), self._cpu_gen, False
+                self._cpu_profs.append((threading.current_thread().name, t.prof))
+        if not t.on:
+            # under the lock so stop_cpu() never reads a profile that is being enabled
+            with self._lk:
+                if t.gen != self._cpu_gen:
+                    return
+                self._cpu_live.add(t.prof)
+                t.prof.enable(); t.on = True
+
+    def _cpu_exit(self, t):
+        if t.gen != self._cpu_gen:
+            self._cpu_drop(t)
+        elif t.depth == 0 and t.on:
+            self._cpu_off(t)  # idle threads aren't profiled; next outermost span re-enables
+
+    def _cpu_off(self, t):
+        t.prof.disable(); t.on = False
+        with self._lk:
+            self._cpu_live.discard(t.prof)
+
+    def _cpu_drop(self, t):
+        if t.on:
+            self._cpu_off(t)
+        t.prof = None
+
+    # ---- tracemalloc ----
+    @property
+    def mem_on(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start_mem(self) -> bool:
+        if tracemalloc.is_tracing():
+            return False
+        tracemalloc.start(MEM_FRAMES)
+        self._mem_base = tracemalloc.take_snapshot()
+        self._mem_t0 = time.time()
+        self.log("[PROF] tracemalloc on")
+        return True
+
+    def stop_mem(self) -> Optional[str]:
+        """Snapshot, write <profiles>/mem-<ts>.txt (+ .tracemalloc) and stop tracing."""
+        if not tracemalloc.is_tracing():
+            return None
+        snap = tracemalloc.take_snapshot()
+        cur, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        skip = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+        snap = snap.filter_traces(skip)
+        ts = time.strftime("%Y%m%d-%H%M%S")
+        self.dir.mkdir(parents=True, exist_ok=True)
+        snap.dump(str(self.dir / f"mem-{ts}.tracemalloc"))
+        out = [f"traced now {cur / 2**20:,.1f} MB, peak {peak / 2**20:,.1f} MB over {time.time() - self._mem_t0:.1f}s", "",
+               "top allocation sites:"]
+        out += [f"  {s}" for s in snap.statistics("lineno")[:TOP_N]]
+        if self._mem_base is not None:
+            out += ["", "growth since start:"]
+            out += [f"  {s}" for s in snap.compare_to(self._mem_base.filter_traces(skip), "lineno")[:TOP_N]]
+        self._mem_base = None
+        path = self._write(f"mem-{ts}", "txt", "\n".join(out) + "\n", stamp=False)
+        self.log(f"[PROF] tracemalloc off: peak {peak / 2**20:,.1f} MB -> {path}")
+        return str(path)
+
+    def toggle_mem(self):
+        return self.stop_mem() if self.mem_on else self.start_mem()
+
+    def _write(self, stem, ext, text, stamp=True) -> Path:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        p = self.dir / (f"{stem}-{time.strftime('%Y%m%d-%H%M%S')}.{ext}" if stamp else f"{stem}.{ext}")
+        with p.open("w", encoding="utf-8") as f:
+            f.write(text)
+        return p
+
+    def stop_all(self):
+        """Write whatever capture is running (job end / shutdown)."""
+        if self.cpu_on:
+            self.stop_cpu()
+        if self.mem_on:
+            self.stop_mem()
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import math
+import random
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple
+
+__all__ = ["StratifiedSample", "sample_size", "size_class", "wilson"]
+
+# size classes, by the upload path a file takes: small PUT / a few chunks / many chunks
+SIZE_CLASSES = ((4 * 1024 * 1024, "small"), (256 * 1024 * 1024, "medium"), (None, "large"))
+# large files go through long upload sessions and fail more often: sample them harder
+CLASS_WEIGHT = {"small": 1.0, "medium": 2.0, "large": 4.0}
+MIN_PER_STRATUM = 3
+
+
+def size_class(size: int) -> str:
+    for cap, name in SIZE_CLASSES:
+        if cap is None or size < cap:
+            return name
+    return SIZE_CLASSES[-1][1]
+
+
+def _z(confidence: float) -> float:
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def sample_size(margin: float, confidence: float = 0.95, population: Optional[int] = None) -> int:
+    """Files needed for a +/- margin (fraction) on a rate, worst case p = 0.5."""
+    n0 = _z(confidence) ** 2 * 0.25 / (margin ** 2)
+    if population:
+        n0 = n0 / (1 + (n0 - 1) / population)  # finite population correction
+    return max(1, math.ceil(n0))
+
+
+def wilson(p: float, n: float, confidence: float = 0.95) -> Tuple[float, float]:
+    """Wilson score interval for a rate p observed over n (effective) trials."""
+    if n <= 0:
+        return 0.0, 1.0
+    z = _z(confidence)
+    z2n = z * z / n
+    mid = (p + z2n / 2) / (1 + z2n)
+    half = z * math.sqrt(p * (1 - p) / n + z2n / (4 * n)) / (1 + z2n)
+    return max(0.0, mid - half), min(1.0, mid + half)
+
+
+class StratifiedSample:
+    """Random sample of files, stratified by (top folder, size class).
+
+    add() is called once per source file while the tree is listed; each
+    stratum keeps a reservoir (Algorithm R) of up to `cap` files, so
+    memory is strata x cap however big the tree is. draw(n) splits n over
+    the strata in proportion to files x CLASS_WEIGHT (at least
+    MIN_PER_STRATUM each) and returns a simple random sample from each.
+    estimate() weighs each stratum's observed rate by its share of the
+    population, so the oversampling of big files doesn't bias the result.
+    """
+
+    def __init__(self, cap: int, seed=None):
+        self.cap = max(1, int(cap))
+        self._rng = random.Random(seed)
+        self.pop: Dict[tuple, int] = {}
+        self._res: Dict[tuple, list] = {}
+        self.alloc: Dict[tuple, int] = {}
+
+    @property
+    def total(self) -> int:
+        return sum(self.pop.values())
+
+    def add(self, folder: str, size: int, rec) -> None:
+        key = (folder, size_class(size))
+        n = self.pop.get(key, 0) + 1
+        self.pop[key] = n
+        res = self._res.setdefault(key, [])
+        if len(res) < self.cap:
+            res.append(rec)
+        else:
+            j = self._rng.randrange(n)
+            if j < self.cap:
+                res[j] = rec
+
+    def draw(self, n: int) -> List[Tuple[tuple, object]]:
+        """[(stratum, rec)] with about n records overall (every file when n >= total)."""
+        weight = {k: v * CLASS_WEIGHT[k[1]] for k, v in self.pop.items()}
+        wsum = sum(weight.values()) or 1.0
+        self.alloc = {}
+        for k, v in self.pop.items():
+            want = max(MIN_PER_STRATUM, round(n * weight[k] / wsum))
+            self.alloc[k] = min(v, want, len(self._res[k]))
+        out = []
+        for k, m in self.alloc.items():
+            out += [(k, rec) for rec in self._rng.sample(self._res[k], m)]
+        return out
+
+    def estimate(self, bad: Dict[tuple, int], confidence: float = 0.95) -> Dict[str, object]:
+        """Population rate of `bad` (per-stratum counts among the drawn files) with a Wilson interval.
+
+        The interval uses the stratified estimate and its effective sample
+        size (Kish: p(1 - p) / var); with nothing bad found, the plain
+        sample size.
+        """
+        N = self.total
+        if not N:
+            return {"rate": 0.0, "ci": [0.0, 0.0]}
+        p = var = 0.0
+        for k, m in self.alloc.items():
+            if not m:
+                continue
+            w = self.pop[k] / N
+            ph = bad.get(k, 0) / m
+            p += w * ph
+            if m > 1:
+                var += w * w * ph * (1 - ph) / (m - 1) * (1 - m / self.pop[k])
+        n = sum(self.alloc.values())
+        n_eff = p * (1 - p) / var if var > 0 else n
+        lo, hi = wilson(p, n_eff, confidence)
+        return {"rate": round(p, 6), "ci": [round(lo, 6), round(hi, 6)]}
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import hashlib
+import heapq
+import itertools
+import json
+import time
+from threading import Condition, Event, Lock, Thread
+
+from http_utils.http_utils import new_session, RobustHTTP
+from http_utils.credentials import pool_from_fields
+from http_utils.hedging import Hedger
+from ui.controller import Controller, acquire_app_token
+from ui.state_store import StateStore, default_state_dir
+
+__all__ = ["WorkerBudget", "JobScheduler"]
+
+# what an unnamed job copies; its id is derived from these so a rerun of the wave finds it again
+JOB_ID_KEYS = ("SRC_DRIVE", "SRC_PARENT", "DEST_DRIVE", "DEST_PARENT", "ROOT_NAME")
+
+
+def _job_id(spec: dict) -> str:
+    payload = json.dumps([spec.get(k) or "" for k in JOB_ID_KEYS]).encode("utf-8")
+    return f"job-{hashlib.sha1(payload).hexdigest()[:12]}"
+
+
+class WorkerBudget:
+    """Resizable counting gate shared by every TransferManager of a wave.
+
+    capacity is steered by the scheduler's AIMD loop; pause() holds new
+    acquisitions back for a Retry-After window seen by any job.
+    """
+
+    def __init__(self, capacity: int, *, min_capacity: int = 1, max_capacity: int | None = None):
+        self._cv = Condition()
+        self._min = max(1, int(min_capacity))
+        self._max = int(max_capacity or capacity)
+        self._capacity = max(self._min, min(int(capacity), self._max))
+        self._in_use = 0
+        self._paused_until = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    def acquire(self):
+        with self._cv:
+            while True:
+                wait_for = self._paused_until - time.time()
+                if wait_for <= 0 and self._in_use < self._capacity:
+                    self._in_use += 1
+                    return
+                self._cv.wait(timeout=wait_for if wait_for > 0 else None)
+
+    def release(self):
+        with self._cv:
+            self._in_use = max(0, self._in_use - 1)
+            self._cv.notify()
+
+    def resize(self, capacity: int) -> int:
+        with self._cv:
+            self._capacity = max(self._min, min(int(capacity), self._max))
+            self._cv.notify_all()
+            return self._capacity
+
+    def pause(self, seconds: float):
+        with self._cv:
+            self._paused_until = max(self._paused_until, time.time() + float(seconds))
+
+
+class JobScheduler:
+    """Runs a wave of copy jobs over one session/RobustHTTP.
+
+    Jobs are dispatched by priority (lower runs first), at most max_jobs at
+    once. All jobs draw upload/download workers from one WorkerBudget and
+    throttle responses from any job shrink that budget for everyone.
+    Each job keeps its own Controller and per-job state file; the wave
+    itself is checkpointed so a rerun skips jobs that already finished.
+    """
+
+    AIMD_PERIOD = 20  # seconds, same cadence as the single-job loop
+
+    def __init__(self, *, tenant, client, secret,
+                 timeout=(10, 300), chunk=8*1024*1024, min_chunk=1*1024*1024, max_single=4*1024*1024,
+                 delete_extras=False, max_jobs=4, workers=16, min_workers=2,
+                 wave_name="wave", log=None, state_dir=None, hedge=0.0):
+        self.TENANT, self.CLIENT, self.SECRET = tenant, client, secret
+        self.TIMEOUT = timeout
+        self.CHUNK = chunk
+        self.MIN_CHUNK = min_chunk
+        self.MAX_SINGLE = max_single
+        self.DELETE_EXTRAS = delete_extras
+        self.MAX_JOBS = max(1, int(max_jobs))
+        self._log = log
+
+        self.budget = WorkerBudget(workers, min_capacity=min_workers, max_capacity=workers)
+
+        # one token + one session for the whole wave
+        self._T = None
+        self._tok_lk = Lock()
+        self.S = new_session()
+        self.RH = RobustHTTP(
+            self.S,
+            get_auth_hdr=self.Hdyn,
+            timeout=self.TIMEOUT,
+            refresh_cb_default=self.reset_token,
+            on_throttle=self.on_throttle,
+            credentials=pool_from_fields(tenant, client, secret),
+            # hedge: extra-request budget in percent for duplicated slow GETs (0 = off)
+            hedge=Hedger(budget=hedge / 100) if hedge > 0 else None,
+        )
+
+        self._q = []
+        self._seq = itertools.count()
+        self._running = {}
+        self._results = {}
+        self._throttles = 0
+        self._thr_lk = Lock()
+        self.CANCEL_EV = Event()
+
+        self.state = StateStore(base_dir=state_dir or default_state_dir("SPODCopyTool"))
+        self._wave_sig = {"wave": wave_name, "tenant": tenant}
+        self._wave = self.state.load(self._wave_sig) or {"jobs": {}}
+
+    # auth (shared by all jobs)
+    def get_token(self):
+        with self._tok_lk:
+            if self._T is None:
+                self._T = acquire_app_token(self.TENANT, self.CLIENT, self.SECRET)
+            return self._T
+
+    def reset_token(self):
+        with self._tok_lk:
+            self._T = None
+
+    def Hdyn(self):
+        return {"Authorization": f"Bearer {self.get_token()}"}
+
+    def log(self, msg: str):
+        if self._log:
+            self._log(msg)
+
+    # shared throttle feedback
+    def on_throttle(self, code=None, retry_after=None):
+        with self._thr_lk:
+            self._throttles += 1
+        if retry_after:
+            self.budget.pause(retry_after)
+
+    def _drain_throttles(self) -> int:
+        with self._thr_lk:
+            n = self._throttles
+            self._throttles = 0
+            return n
+
+    # queue
+    def submit(self, spec: dict, priority: int = 0, name: str | None = None) -> str:
+        # the id keys the wave checkpoint: NAME, else one derived from source + destination
+        job_id = name or spec.get("NAME") or _job_id(spec)
+        if any(q[2] == job_id for q in self._q):
+            raise ValueError(f"job {job_id!r} is already queued (same NAME, or the same source and destination)")
+        heapq.heappush(self._q, (int(priority), next(self._seq), job_id, dict(spec)))
+        return job_id
+
+    def _save_wave(self):
+        try:
+            self.state.save(self._wave_sig, self._wave)
+        except Exception as e:
+            self.log(f"[WAVE] state save error: {e}")
+
+    def _start(self, job_id: str, spec: dict):
+        c = Controller(
+            timeout=self.TIMEOUT,
+            chunk=self.CHUNK, min_chunk=self.MIN_CHUNK, max_single=self.MAX_SINGLE,
+            delete_extras=bool(spec.get("DELETE_EXTRAS", self.DELETE_EXTRAS)),
+            http=self.RH, budget=self.budget, aimd=False, job_name=job_id,
+            state_dir=str(self.state.base_dir),
+        )
+        c.set_callbacks(log=self._log or (lambda _m: None), set_stage=lambda _t: None)
+        cfg = {**spec, "TENANT": self.TENANT, "CLIENT": self.CLIENT, "SECRET": self.SECRET}
+        c.start_job(cfg)
+        self._running[job_id] = c
+        self._wave["jobs"][job_id] = {"status": "running"}
+        self.log(f"[WAVE] start {job_id} ({len(self._running)}/{self.MAX_JOBS} running)")
+
+    def _aimd(self):
+        while not self.CANCEL_EV.wait(self.AIMD_PERIOD):
+            thr = self._drain_throttles()
+            cap = self.budget.capacity
+            if thr >= 2:
+                new = self.budget.resize(cap - max(1, cap // 4))
+                if new != cap:
+                    self.log(f"[AIMD] {thr} throttles -> workers {cap} -> {new}")
+            elif thr == 0 and self._running:
+                new = self.budget.resize(cap + 1)
+                if new != cap:
+                    self.log(f"[AIMD] stable -> workers {cap} -> {new}")
+
+    def run(self, poll: float = 1.0) -> dict:
+        """Dispatch queued jobs until the queue drains (or cancel()); returns {job_id: result}."""
+        Thread(target=self._aimd, name="_wave_aimd", daemon=True).start()
+        try:
+            while (self._q or self._running) and not self.CANCEL_EV.is_set():
+                while self._q and len(self._running) < self.MAX_JOBS:
+                    _, _, job_id, spec = heapq.heappop(self._q)
+                    if (self._wave["jobs"].get(job_id) or {}).get("status") == "done":
+                        self.log(f"[WAVE] skip {job_id} (already done)")
+                        self._results[job_id] = self._wave["jobs"][job_id]
+                        continue
+                    try:
+                        self._start(job_id, spec)
+                    except Exception as e:
+                        self._results[job_id] = {"status": "failed", "error": str(e)}
+                        self._wave["jobs"][job_id] = self._results[job_id]
+                self._save_wave()
+
+                for job_id, c in list(self._running.items()):
+                    res = c.wait_job(timeout=0)
+                    if res is None and c._job_thread is not None and c._job_thread.is_alive():
+                        continue
+                    res = res or {"status": "failed", "error": "job ended without a result"}
+                    self._results[job_id] = res
+                    self._wave["jobs"][job_id] = {k: v for k, v in res.items() if k in ("status", "audit", "error")}
+                    del self._running[job_id]
+                    self.log(f"[WAVE] {job_id} -> {res.get('status')}")
+                self.CANCEL_EV.wait(poll)
+
+            # cancelled: let running jobs checkpoint and collect what they report
+            for job_id, c in list(self._running.items()):
+                res = c.wait_job(timeout=60) or {"status": "cancelled"}
+                self._results[job_id] = res
+                self._wave["jobs"][job_id] = {k: v for k, v in res.items() if k in ("status", "audit", "error")}
+                del self._running[job_id]
+        finally:
+            self._save_wave()
+        if not self._q and not self._running and not self.CANCEL_EV.is_set():
+            self.CANCEL_EV.set()  # stops the AIMD thread
+        return dict(self._results)
+
+    def cancel(self):
+        """Stop dispatching and cancel running jobs; run() returns once they checkpoint."""
+        self.CANCEL_EV.set()
+        for c in list(self._running.values()):
+            c.cancel_job()
+
+    def get_stats(self) -> dict:
+        snaps = [c.get_stats() for c in self._running.values()]
+        return {
+            "jobs_running": len(snaps),
+            "jobs_queued": len(self._q),
+            "jobs_finished": len(self._results),
+            "files_total": sum(s["files_total"] for s in snaps),
+            "files_done": sum(s["files_done"] for s in snaps),
+            "rate": sum(s["rate"] for s in snaps),
+            "workers": self.budget.capacity,
+            "workers_busy": self.budget.in_use,
+            **self.RH.policy.stats(),
+            **(self.RH.hedge.stats() if self.RH.hedge is not None else {}),
+        }
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import os
+import socket
+import time
+from threading import Event, Thread
+
+from ui.work_queue import WorkQueue
+
+__all__ = ["PLAN_KEY", "run_shard_worker"]
+
+PLAN_KEY = "__plan__"            # the planning step is itself a shard: exactly one worker runs it
+DEFAULT_SHARD_BYTES = 50 * 1024 ** 3
+
+
+class _Heartbeat(Thread):
+    """Renews a shard lease on its own connection while the shard runs."""
+
+    def __init__(self, queue_path, shard_id, owner, lease_s):
+        super().__init__(name="shard-heartbeat", daemon=True)
+        self.queue_path = queue_path
+        self.shard_id = shard_id
+        self.owner = owner
+        self.lease_s = lease_s
+        self.lost = False
+        self._stop_ev = Event()
+
+    def run(self):
+        q = WorkQueue(self.queue_path)
+        try:
+            while not self._stop_ev.wait(self.lease_s / 3):
+                try:
+                    if not q.heartbeat(self.shard_id, self.owner, self.lease_s):
+                        self.lost = True
+                        return
+                except Exception:
+                    pass  # transient lock/IO error on the shared file; retry next beat
+        finally:
+            q.close()
+
+    def stop(self):
+        self._stop_ev.set()
+
+
+def run_shard_worker(controller, cfg: dict, queue_path: str, *, owner: str | None = None,
+                     max_shard_bytes: int = DEFAULT_SHARD_BYTES, lease_s: float = 120.0,
+                     idle_poll: float = 5.0) -> dict:
+    """Claim and run shards from queue_path until the queue is drained.
+
+    Any number of these may run against one queue file, in several
+    processes or on several machines. The first to claim PLAN_KEY walks
+    the top of the tree, creates the destination folders down to the shard
+    boundaries and queues the shards; the others wait for it. Each shard
+    keeps its own ledger state (signature + shard key), so a shard taken
+    over after a lapsed lease resumes from whatever that node recorded,
+    and is audited from those records before it's marked done. "audit"
+    in the result sums the audits of the shards this worker finished.
+    """
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+    q = WorkQueue(queue_path)
+    q.add(PLAN_KEY, {"kind": "plan"})
+
+    controller.configure(cfg)
+    if controller.EXTRA_DESTS:
+        raise ValueError("sharded runs copy to one destination (EXTRA_DESTS isn't supported)")
+    controller.lazy_init()
+    controller.CANCEL_EV.clear()
+    log = controller.log
+    ran = failed = 0
+    audit = {"shards": 0, "src": 0, "dst": 0, "matched": 0, "mismatched": 0, "missing": 0}
+
+    try:
+        while not controller.CANCEL_EV.is_set():
+            sh = q.claim(owner, lease_s)
+            if sh is None:
+                plan = q.status(PLAN_KEY)
+                c = q.counts()
+                if plan in ("done", "failed") and c["queued"] == 0 and c["leased"] == 0:
+                    break
+                time.sleep(idle_poll)
+                continue
+
+            p = sh["payload"]
+            res = None
+            hb = _Heartbeat(queue_path, sh["id"], owner, lease_s)
+            hb.start()
+            try:
+                if p.get("kind") == "plan":
+                    controller.stage("planning shards")
+                    shards = controller.client.plan_shards(
+                        src_drive=controller.SRC_DRIVE,
+                        src_parent=(controller.SRC_PARENT or "root"),
+                        dest_drive=controller.DEST_DRIVE,
+                        dest_parent=controller.DEST_PARENT,
+                        root_name=controller.ROOT_NAME,
+                        max_shard_bytes=max_shard_bytes,
+                        log=log,
+                    )
+                    for s in shards:
+                        q.add(f"{s['src']}:{'tree' if s['recursive'] else 'files'}", {"kind": "files", **s})
+                else:
+                    controller.stage(f"shard {p['path'] or '/'}")
+                    controller._ensure_state({"shard": sh["key"]})
+                    with controller.prof.span("phase.shard"):
+                        controller.client.mirror_files_exact(
+                            src_drive=controller.SRC_DRIVE,
+                            src_parent=p["src"],
+                            dest_drive=controller.DEST_DRIVE,
+                            dest_parent=p["dst"],
+                            root_name="",
+                            log=log,
+                            recursive=p["recursive"],
+                            base_path=p["path"],
+                        )
+                    if controller.DELETE_EXTRAS and not controller.CANCEL_EV.is_set():
+                        controller._reconcile_pass()
+                    if not controller.CANCEL_EV.is_set():
+                        controller.stage(f"audit {p['path'] or '/'}")
+                        with controller.prof.span("phase.audit"):
+                            res = controller._audit_shard(p)
+
+                if controller.CANCEL_EV.is_set():
+                    controller._save_state()
+                    q.fail(sh["id"], owner, "cancelled", max_attempts=sh["attempts"] + 1)
+                elif hb.lost:
+                    log(f"[SHARD] lease lost on {sh['key']}; another worker owns it now")
+                else:
+                    q.complete(sh["id"], owner)
+                    if p.get("kind") != "plan":
+                        controller._clear_state()
+                    if res:
+                        audit["shards"] += 1
+                        for k in ("src", "dst", "matched", "mismatched", "missing"):
+                            audit[k] += res.get(k, 0)
+                    ran += 1
+            except Exception as e:
+                failed += 1
+                log(f"[SHARD] {sh['key']} failed: {type(e).__name__}: {e}")
+                controller._save_state()
+                q.fail(sh["id"], owner, f"{type(e).__name__}: {e}")
+            finally:
+                hb.stop()
+    finally:
+        counts = q.counts()
+        q.close()
+
+    log(f"[SHARD] {owner}: ran {ran}, failed {failed}; queue {counts}")
+    log(f"[AUDIT:SHARDS] {audit['shards']} shards: src_files={audit['src']}, matched={audit['matched']}, "
+        f"mismatched={audit['mismatched']}, missing={audit['missing']}")
+    controller._profile_report()
+    return {"owner": owner, "ran": ran, "failed": failed, "queue": counts, "audit": audit}
@@ -2,7 +2,8 @@ from __future__ import annotations
 import os, sys, json, hashlib
 from pathlib import Path
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any
+from threading import Event, Lock, RLock, Thread
+from typing import Optional, Dict, Any, Sequence
 
 __all__ = ["StateStore", "default_state_dir"]
 
@@ -28,17 +29,70 @@ def default_state_dir(app_name: str = "SPODCopyTool") -> str:
     return str(home / ".local" / "state" / app_name)
 
 
+def _walk(state: Dict[str, Any], path: Sequence[str], create: bool):
+    node = state
+    for k in path[:-1]:
+        nxt = node.get(k)
+        if not isinstance(nxt, dict):
+            if not create:
+                return None
+            nxt = node[k] = {}
+        node = nxt
+    return node
+
+
+def _copy_dicts(node):
+    # snapshot copy: nested dicts are copied, leaves shared (journaled
+    # updates replace values, they never change them in place)
+    return {k: _copy_dicts(v) if isinstance(v, dict) else v for k, v in node.items()}
+
+
+def _apply(state: Dict[str, Any], rec) -> None:
+    op, path = rec[0], rec[1]
+    if op == "s":
+        _walk(state, path, True)[path[-1]] = rec[2]
+    elif op == "d":
+        node = _walk(state, path, False)
+        if node is not None:
+            node.pop(path[-1], None)
+
+
 class StateStore:
     """Minimal persisted state for checkpoint/resume.
     Stores per-job JSON under base_dir using a hashed signature-based filename.
+
+    Small updates go through set()/delete(): they mutate the live dict that
+    load() returned and append a compact record to job-<id>.journal. Records
+    are group-committed (one write + fsync) every COMMIT_INTERVAL seconds by
+    a background thread, which also folds the journal back into the JSON
+    snapshot once it is both past COMPACT_BYTES and COMPACT_RATIO times the
+    last snapshot. Tying it to the snapshot size keeps the total bytes
+    written linear in the number of updates, however big the ledger gets.
+    Snapshots are serialised from a copy taken under the lock, so workers
+    recording updates wait for the copy, not for json.dumps. load() replays
+    the journal on top of the snapshot; save() still writes a full snapshot
+    atomically.
     """
     VERSION = 1
+    COMMIT_INTERVAL = 1.0
+    COMPACT_BYTES = 8 * 1024 * 1024
+    COMPACT_RATIO = 1.0
 
     def __init__(self, base_dir: str = ".state"):
         self.base_dir = Path(base_dir)
         self.base_dir.mkdir(parents=True, exist_ok=True)
         self._current_sig = None
 
+        self._lk = RLock()      # live dicts + pending records
+        self._io_lk = Lock()    # journal/snapshot files
+        self._live: Dict[str, tuple] = {}      # key -> (signature, state)
+        self._pending: Dict[str, list] = {}    # key -> [journal lines]
+        self._journals: Dict[str, Any] = {}    # key -> open append handle
+        self._gen: Dict[str, int] = {}         # key -> journal generation
+        self._snap_bytes: Dict[str, int] = {}  # key -> size of the last snapshot
+        self._stop = Event()
+        self._flusher = None
+
     def _hash_signature(self, signature: Dict[str, Any]) -> str:
         payload = json.dumps(signature, sort_keys=True, separators=(",", ":")).encode("utf-8")
         return hashlib.sha1(payload).hexdigest()  # filename id is fine with sha1
@@ -46,6 +100,12 @@ class StateStore:
     def _path_for(self, signature: Dict[str, Any]) -> Path:
         h = self._hash_signature(signature)[:12]
         return self.base_dir / f"job-{h}.json"
+
+    def _journal_for(self, signature: Dict[str, Any], gen: int) -> Path:
+        # the snapshot names its journal generation, so a crash between
+        # writing a new snapshot and deleting the old journal never replays it
+        p = self._path_for(signature)
+        return p.with_name(f"{p.stem}.{gen}.journal")
     
     def ensure_fresh_state(self, signature: Dict[str, Any]) -> str:
             """
@@ -62,6 +122,7 @@ class StateStore:
         try:
             with p.open("r", encoding="utf-8") as f:
                 data = json.load(f)
+            snap_bytes = p.stat().st_size
         except FileNotFoundError:
             return None
         except Exception:
@@ -70,31 +131,149 @@ class StateStore:
             return None
         if data.get("job") != signature:
             return None
+        gen = int(data.pop("jgen", 0) or 0)
+        try:
+            with self._journal_for(signature, gen).open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        _apply(data, json.loads(line))
+                    except Exception:
+                        break  # torn tail from a crash mid-append
+        except FileNotFoundError:
+            pass
+        with self._lk:
+            key = self._path_for(signature).stem
+            self._live[key] = (signature, data)
+            self._gen[key] = gen
+            self._snap_bytes[key] = snap_bytes
         return data
 
     def save(self, signature: Dict[str, Any], state: Dict[str, Any]) -> None:
-        """Atomic write: write tmp then replace."""
-        p = self._path_for(signature)
-        tmp = p.with_suffix(".json.tmp")
+        """Atomic write: write tmp then replace. Also truncates the journal."""
+        key = self._path_for(signature).stem
+        with self._io_lk:
+            with self._lk:
+                self._live[key] = (signature, state)
+                self._pending.pop(key, None)
+                snap = _copy_dicts(state)
+            self._write_snapshot(signature, self._dump(signature, snap))
+
+    def clear(self, signature: Dict[str, Any]) -> None:
+        key = self._path_for(signature).stem
+        with self._io_lk:
+            with self._lk:
+                self._live.pop(key, None)
+                self._pending.pop(key, None)
+            self._close_journal(key)
+            self._gen.pop(key, None)
+            self._snap_bytes.pop(key, None)
+            p = self._path_for(signature)
+            for q in [p, *self.base_dir.glob(f"{p.stem}.*.journal")]:
+                try:
+                    q.unlink(missing_ok=True)
+                except Exception:
+                    pass
+
+    # journaled updates
+    def set(self, signature: Dict[str, Any], path: Sequence[str], value: Any) -> None:
+        self._record(signature, ["s", list(path), value])
+
+    def delete(self, signature: Dict[str, Any], path: Sequence[str]) -> None:
+        self._record(signature, ["d", list(path)])
+
+    def _record(self, signature, rec) -> None:
+        key = self._path_for(signature).stem
+        with self._lk:
+            live = self._live.get(key)
+            if live is None:
+                return  # not loaded/saved (or cleared): nothing to journal against
+            _apply(live[1], rec)
+            self._pending.setdefault(key, []).append(
+                json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+        if self._flusher is None:
+            self._start_flusher()
+
+    def flush(self) -> None:
+        """Commit pending journal records now (and compact if due)."""
+        with self._io_lk:
+            with self._lk:
+                batch = {k: v for k, v in self._pending.items() if v}
+                self._pending = {}
+            for key, lines in batch.items():
+                self._append(key, lines)
+
+    def close(self) -> None:
+        self._stop.set()
+        self.flush()
+        with self._io_lk:
+            for key in list(self._journals):
+                self._close_journal(key)
+
+    def _start_flusher(self):
+        with self._lk:
+            if self._flusher is not None:
+                return
+            self._flusher = Thread(target=self._flush_loop, name="state-journal", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.COMMIT_INTERVAL):
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def _append(self, key: str, lines) -> None:
+        with self._lk:
+            live = self._live.get(key)
+        if live is None:
+            return
+        signature = live[0]
+        f = self._journals.get(key)
+        if f is None:
+            gen = self._gen.setdefault(key, 0)
+            f = self._journals[key] = self._journal_for(signature, gen).open("a", encoding="utf-8")
+        f.write("\n".join(lines) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+        if f.tell() >= max(self.COMPACT_BYTES, self.COMPACT_RATIO * self._snap_bytes.get(key, 0)):
+            with self._lk:
+                snap = _copy_dicts(live[1])
+            self._write_snapshot(signature, self._dump(signature, snap))
+
+    def _close_journal(self, key: str) -> None:
+        f = self._journals.pop(key, None)
+        if f is not None:
+            try: f.close()
+            except Exception: pass
+
+    # snapshot (callers hold _io_lk and pass a copy taken under _lk)
+    def _dump(self, signature, state) -> str:
+        key = self._path_for(signature).stem
         payload = {
             "version": self.VERSION,
             "job": signature,
             **state,
+            "jgen": self._gen.get(key, 0) + 1,
             "updated_utc": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
         }
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+    def _write_snapshot(self, signature, blob: str) -> None:
+        p = self._path_for(signature)
+        key = p.stem
+        tmp = p.with_suffix(".json.tmp")
         with tmp.open("w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
+            f.write(blob)
             f.flush()
             os.fsync(f.fileno())
+            self._snap_bytes[key] = f.tell()
         os.replace(tmp, p)
-
-    def clear(self, signature: Dict[str, Any]) -> None:
-        p = self._path_for(signature)
+        # snapshot covers every committed record: move on to a fresh journal
+        old = self._gen.get(key, 0)
+        self._gen[key] = old + 1
+        self._close_journal(key)
         try:
-            p.unlink(missing_ok=True)
-        except TypeError:
-            if p.exists():
-                try: p.unlink()
-                except Exception: pass
+            self._journal_for(signature, old).unlink(missing_ok=True)
         except Exception:
             pass
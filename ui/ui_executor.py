@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Empty
+from threading import Lock
+
+__all__ = ["UiExecutor"]
+
+PUMP_MS = 50
+
+
+class UiExecutor:
+    """Runs blocking lookups off the Tk thread; callbacks come back on it.
+
+    Requests are keyed by slot ("src_site", "dst_lib", ...). A new request
+    on a slot supersedes the previous one: if that hasn't started it is
+    cancelled, if it is running its result is dropped. Submitting the same
+    slot+args while it is still pending just keeps the newer callbacks
+    (coalesced, no second Graph call). Results are queued by the workers
+    and delivered from a root.after() pump, so Tk is only touched on its
+    own thread.
+    """
+
+    def __init__(self, root, workers=4, log=None):
+        self.root = root
+        self.log = log or (lambda msg: None)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ui-io")
+        self._lk = Lock()
+        self._slots = {}     # key -> {"gen", "sig", "fut", "on_done", "on_error"}
+        self._gen = 0
+        self._results = Queue()
+        self.root.after(PUMP_MS, self._pump)
+
+    def submit(self, key, fn, *args, on_done=None, on_error=None, **kw):
+        sig = (fn, args, tuple(sorted(kw.items())))
+        with self._lk:
+            cur = self._slots.get(key)
+            if cur and cur["sig"] == sig and not cur["fut"].done():
+                cur["on_done"], cur["on_error"] = on_done, on_error
+                return
+            if cur:
+                cur["fut"].cancel()
+            self._gen += 1
+            gen = self._gen
+            slot = {"gen": gen, "sig": sig, "on_done": on_done, "on_error": on_error}
+            self._slots[key] = slot
+            slot["fut"] = self._pool.submit(self._run, key, gen, fn, args, kw)
+
+    def cancel(self, key):
+        with self._lk:
+            cur = self._slots.pop(key, None)
+        if cur:
+            cur["fut"].cancel()
+
+    def busy(self, key) -> bool:
+        with self._lk:
+            cur = self._slots.get(key)
+            return bool(cur) and not cur["fut"].done()
+
+    def _run(self, key, gen, fn, args, kw):
+        try:
+            self._results.put((key, gen, True, fn(*args, **kw)))
+        except Exception as e:
+            self._results.put((key, gen, False, e))
+
+    def _pump(self):
+        while True:
+            try:
+                key, gen, ok, val = self._results.get_nowait()
+            except Empty:
+                break
+            with self._lk:
+                cur = self._slots.get(key)
+                if not cur or cur["gen"] != gen:
+                    continue  # superseded or cancelled
+                del self._slots[key]
+            cb = cur["on_done"] if ok else cur["on_error"]
+            if cb:
+                try: cb(val)
+                except Exception as e: self.log(f"[UI] {key} callback failed: {type(e).__name__}: {e}")
+        self.root.after(PUMP_MS, self._pump)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
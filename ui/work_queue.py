@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+__all__ = ["WorkQueue"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    key         TEXT UNIQUE NOT NULL,
+    payload     TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'queued',   -- queued | leased | done | failed
+    owner       TEXT,
+    lease_until REAL NOT NULL DEFAULT 0,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    error       TEXT,
+    updated     REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS shards_status ON shards(status, lease_until);
+"""
+
+
+class WorkQueue:
+    """File-backed shard queue (SQLite) shared by worker processes/nodes.
+
+    A worker claim()s a shard and holds it under a lease it must renew with
+    heartbeat(); a shard whose lease lapsed (worker died) is handed out
+    again. Every write runs in a short IMMEDIATE transaction so several
+    processes can use the same file (put it on a path all workers see).
+    One connection per process/thread; don't share an instance across threads.
+    """
+
+    def __init__(self, path: str, *, busy_timeout: float = 30.0):
+        self.path = str(path)
+        self._db = sqlite3.connect(self.path, timeout=busy_timeout, isolation_level=None)
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        try: self._db.close()
+        except Exception: pass
+
+    def _tx(self):
+        self._db.execute("BEGIN IMMEDIATE")
+
+    def add(self, key: str, payload: Dict[str, Any]) -> bool:
+        """Queue a shard; False if the key already exists (planning is idempotent)."""
+        cur = self._db.execute(
+            "INSERT OR IGNORE INTO shards(key, payload, updated) VALUES (?, ?, ?)",
+            (key, json.dumps(payload, separators=(",", ":")), time.time()),
+        )
+        return cur.rowcount == 1
+
+    def claim(self, owner: str, lease_s: float = 120.0) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        self._tx()
+        try:
+            row = self._db.execute(
+                "SELECT id, key, payload, attempts FROM shards "
+                "WHERE status = 'queued' OR (status = 'leased' AND lease_until < ?) "
+                "ORDER BY id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                self._db.execute("COMMIT")
+                return None
+            sid, key, payload, attempts = row
+            self._db.execute(
+                "UPDATE shards SET status='leased', owner=?, lease_until=?, attempts=?, updated=? WHERE id=?",
+                (owner, now + lease_s, attempts + 1, now, sid),
+            )
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+        return {"id": sid, "key": key, "payload": json.loads(payload), "attempts": attempts + 1}
+
+    def heartbeat(self, shard_id: int, owner: str, lease_s: float = 120.0) -> bool:
+        """Extend the lease; False means it was lost (expired and re-claimed)."""
+        cur = self._db.execute(
+            "UPDATE shards SET lease_until=?, updated=? WHERE id=? AND owner=? AND status='leased'",
+            (time.time() + lease_s, time.time(), shard_id, owner),
+        )
+        return cur.rowcount == 1
+
+    def complete(self, shard_id: int, owner: str) -> bool:
+        cur = self._db.execute(
+            "UPDATE shards SET status='done', lease_until=0, updated=? WHERE id=? AND owner=?",
+            (time.time(), shard_id, owner),
+        )
+        return cur.rowcount == 1
+
+    def fail(self, shard_id: int, owner: str, error: str, max_attempts: int = 3) -> None:
+        """Give a shard back (or park it as failed after max_attempts)."""
+        self._db.execute(
+            "UPDATE shards SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "owner=NULL, lease_until=0, error=?, updated=? WHERE id=? AND owner=?",
+            (max_attempts, str(error)[:2000], time.time(), shard_id, owner),
+        )
+
+    def status(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT status FROM shards WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def counts(self) -> Dict[str, int]:
+        out = {"queued": 0, "leased": 0, "done": 0, "failed": 0}
+        for st, n in self._db.execute("SELECT status, COUNT(*) FROM shards GROUP BY status"):
+            out[st] = n
+        return out